@@ -0,0 +1,103 @@
+"""
+Benchmark dos filtros de /api/v1/entidades antes e depois dos índices trigram.
+
+Cria um catálogo sintético (por padrão 1M de tabelas) num schema descartável do
+Postgres apontado por DATABASE_URL, mede a mediana de latência dos filtros de substring
+sem índice e com os índices da migration 71356ab0cc9d, e imprime o comparativo.
+
+    python -m benchmarks.bench_entidades_trgm --rows 1000000 --repeat 7
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import column, create_engine, select, table, text
+
+from infogrid.routers.entidades import contains_filter
+from infogrid.settings import Settings
+
+SCHEMA = "bench_trgm"
+
+# (descrição, termo): termos longos usam o GIN trigram, curtos o btree de prefixo
+TERMS = [
+    ("substring rara", "cliente_fat"),
+    ("substring comum", "venda"),
+    ("sufixo", "_2024"),
+    ("termo curto", "ve"),
+]
+
+WORDS = "ARRAY['venda','cliente','pedido','fatura','estoque','produto','pagamento','entrega','contrato','usuario']"
+
+
+def populate(conn, rows: int):
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.tabelas (id serial PRIMARY KEY, nome varchar(255) NOT NULL, descricao text)"))
+    conn.execute(text(f"""
+        INSERT INTO {SCHEMA}.tabelas (nome, descricao)
+        SELECT ({WORDS})[1 + i % 10] || '_' || ({WORDS})[1 + (i / 10) % 10] || '_' || (2000 + i % 25) || '_' || substr(md5(i::text), 1, 6),
+               'Tabela de ' || ({WORDS})[1 + (i / 7) % 10] || ' do domínio ' || ({WORDS})[1 + (i / 3) % 10]
+        FROM generate_series(1, :rows) AS i
+    """), {"rows": rows})
+    conn.execute(text(f"ANALYZE {SCHEMA}.tabelas"))
+
+
+def create_indexes(conn):
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    conn.execute(text(f"CREATE INDEX ON {SCHEMA}.tabelas USING gin (lower(nome) gin_trgm_ops)"))
+    conn.execute(text(f"CREATE INDEX ON {SCHEMA}.tabelas (lower(nome) text_pattern_ops)"))
+    conn.execute(text(f"ANALYZE {SCHEMA}.tabelas"))
+
+
+def measure(conn, stmt, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(stmt).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def queries(term: str):
+    # Filtro antigo (ILIKE '%termo%' na coluna crua) e o novo (lower(coluna) LIKE ... ESCAPE)
+    tabelas = table("tabelas", column("id"), column("nome"), schema=SCHEMA)
+    base = select(tabelas.c.id)
+    return {
+        "antigo": base.where(tabelas.c.nome.ilike(f"%{term}%")),
+        "novo": base.where(contains_filter(tabelas.c.nome, term)),
+    }
+
+
+def run(rows: int, repeat: int, keep: bool):
+    engine = create_engine(Settings().DATABASE_URL)
+    results = {}
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        print(f"Populando {rows} linhas em {SCHEMA}.tabelas ...")
+        populate(conn, rows)
+
+        for fase in ("sem índice", "com índice"):
+            if fase == "com índice":
+                create_indexes(conn)
+            for label, term in TERMS:
+                for variante, stmt in queries(term).items():
+                    results[(label, variante, fase)] = measure(conn, stmt, repeat)
+
+        if not keep:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+    print(f"\n{'termo':<18}{'filtro':<8}{'sem índice (ms)':>17}{'com índice (ms)':>17}{'ganho':>9}")
+    for label, term in TERMS:
+        for variante in ("antigo", "novo"):
+            antes = results[(label, variante, "sem índice")]
+            depois = results[(label, variante, "com índice")]
+            print(f"{label:<18}{variante:<8}{antes:>17.2f}{depois:>17.2f}{antes / depois:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="não remove o schema sintético ao final")
+    args = parser.parse_args()
+    run(args.rows, args.repeat, args.keep)
@@ -0,0 +1,164 @@
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from infogrid.models import RegistroAcesso
+
+logger = logging.getLogger("app_logger")
+
+# Só registros com este status concedem as permissões listadas
+APPROVED_STATUS = "Aprovado"
+
+# Campos de um registro de acesso que o índice usa (enviados nos avisos entre workers)
+ACL_FIELDS = ("usuario_id", "conjunto_dados", "permissoes_concedidas", "status")
+
+
+def acl_fields(registro: dict) -> dict:
+    return {field: registro[field] for field in ACL_FIELDS}
+
+
+class AccessIndex:
+    """
+    Índice de permissões em memória: usuário -> conjunto de dados -> máscara de bits das
+    permissões concedidas pelos registros de acesso aprovados.
+
+    Cada nome de permissão ganha um bit na primeira vez que aparece. Uma verificação é um
+    acesso a dois dicts e um AND, sem lock: lê uma vez o par (bits, máscaras) e usa só ele.
+    As escritas incrementais (sob lock) só acrescentam bits novos e trocam dicts inteiros por
+    usuário; a recarga, que renumera os bits, troca o par inteiro numa única atribuição.
+    Construído no startup e mantido pelos handlers de criação/atualização/exclusão de
+    registros de acesso.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (permissão -> bit, usuário -> conjunto -> máscara), sempre trocados juntos
+        self._view: Tuple[Dict[str, int], Dict[int, Dict[str, int]]] = ({}, {})
+        # registro -> (usuário, conjunto, máscara), para refazer a máscara do par quando ele sai
+        self._grants: Dict[int, Tuple[int, str, int]] = {}
+        # (usuário, conjunto) -> {registro: máscara}
+        self._grants_by_pair: Dict[Tuple[int, str], Dict[int, int]] = {}
+
+    def __len__(self):
+        return len(self._grants)
+
+    def clear(self):
+        with self._lock:
+            self._view = ({}, {})
+            self._grants = {}
+            self._grants_by_pair = {}
+
+    def _mask_locked(self, permissoes: Iterable[str]) -> int:
+        bits = self._view[0]
+        mask = 0
+        for permissao in permissoes:
+            bit = bits.get(permissao)
+            if bit is None:
+                bit = bits[permissao] = 1 << len(bits)
+            mask |= bit
+        return mask
+
+    def _refresh_pair_locked(self, pair: Tuple[int, str]):
+        usuario_id, conjunto_dados = pair
+        grants = self._grants_by_pair.get(pair)
+        mask = 0
+        for grant in (grants or {}).values():
+            mask |= grant
+        masks = self._view[1]
+        datasets = masks.get(usuario_id, {})
+        if mask:
+            if datasets.get(conjunto_dados) != mask:
+                masks[usuario_id] = {**datasets, conjunto_dados: mask}
+        elif conjunto_dados in datasets:
+            datasets = {name: value for name, value in datasets.items() if name != conjunto_dados}
+            if datasets:
+                masks[usuario_id] = datasets
+            else:
+                masks.pop(usuario_id, None)
+        if not grants:
+            self._grants_by_pair.pop(pair, None)
+
+    def _remove_locked(self, registro_id: int) -> Optional[Tuple[int, str]]:
+        grant = self._grants.pop(registro_id, None)
+        if grant is None:
+            return None
+        pair = grant[:2]
+        self._grants_by_pair.get(pair, {}).pop(registro_id, None)
+        return pair
+
+    def put(self, registro_id: int, usuario_id: Optional[int], conjunto_dados: str, permissoes_concedidas: Sequence[str], status: Optional[str]):
+        """
+        Insere ou atualiza um registro de acesso; se deixou de estar aprovado, sai do índice.
+        """
+        with self._lock:
+            old_pair = self._remove_locked(registro_id)
+            pair = None
+            if status == APPROVED_STATUS and usuario_id is not None and permissoes_concedidas:
+                pair = (usuario_id, conjunto_dados)
+                mask = self._mask_locked(permissoes_concedidas)
+                self._grants[registro_id] = (usuario_id, conjunto_dados, mask)
+                self._grants_by_pair.setdefault(pair, {})[registro_id] = mask
+                self._refresh_pair_locked(pair)
+            if old_pair is not None and old_pair != pair:
+                self._refresh_pair_locked(old_pair)
+
+    def remove(self, registro_id: int):
+        with self._lock:
+            pair = self._remove_locked(registro_id)
+            if pair is not None:
+                self._refresh_pair_locked(pair)
+
+    def replace_all(self, rows: Iterable[tuple]):
+        """
+        Reconstrói o índice a partir de (id, usuario_id, conjunto_dados, permissoes) aprovados.
+        """
+        bits, masks, grants, grants_by_pair = {}, {}, {}, {}
+        for registro_id, usuario_id, conjunto_dados, permissoes in rows:
+            if usuario_id is None:
+                continue
+            mask = 0
+            for permissao in permissoes:
+                mask |= bits.setdefault(permissao, 1 << len(bits))
+            if not mask:
+                continue
+            grants[registro_id] = (usuario_id, conjunto_dados, mask)
+            grants_by_pair.setdefault((usuario_id, conjunto_dados), {})[registro_id] = mask
+            datasets = masks.setdefault(usuario_id, {})
+            datasets[conjunto_dados] = datasets.get(conjunto_dados, 0) | mask
+        with self._lock:
+            self._view = (bits, masks)
+            self._grants = grants
+            self._grants_by_pair = grants_by_pair
+
+    def check(self, usuario_id: int, conjunto_dados: str, permissoes: Sequence[str]) -> bool:
+        """
+        True se o usuário tem todas as `permissoes` no conjunto de dados.
+        """
+        bits, masks = self._view
+        granted = masks.get(usuario_id)
+        if granted is None:
+            return False
+        granted = granted.get(conjunto_dados, 0)
+        for permissao in permissoes:
+            bit = bits.get(permissao)
+            if bit is None or not granted & bit:
+                return False
+        return bool(permissoes)
+
+    def load(self, session: Session, batch_size: int = 10000):
+        """
+        Carrega os registros aprovados (só as colunas do índice, em lotes).
+        """
+        stmt = (
+            select(RegistroAcesso.id, RegistroAcesso.usuario_id, RegistroAcesso.conjunto_dados, RegistroAcesso.permissoes_concedidas)
+            .where(RegistroAcesso.status == APPROVED_STATUS)
+            .execution_options(yield_per=batch_size)
+        )
+        self.replace_all(session.execute(stmt))
+        logger.info(f"Índice de permissões carregado com {len(self)} registros de acesso aprovados")
+
+
+access_index = AccessIndex()
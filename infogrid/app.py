@@ -1,8 +1,13 @@
+from contextlib import asynccontextmanager
 from http import HTTPStatus
 from fastapi import FastAPI, Request
 import logging
 from logging.handlers import RotatingFileHandler
-from infogrid.database import get_session
+from infogrid.acl import access_index
+from infogrid.cache import cache_responses
+from infogrid.changes import change_listener, index_reload, listener_supported
+from infogrid.database import get_session, session_scope
+from infogrid.ingest import access_write_buffer
 from infogrid.routers import (
     responsavel,
     routerdatabase, 
@@ -13,9 +18,14 @@ from infogrid.routers import (
     registroacesso,
     usuario,
     relacionamentos,
-    entidades
+    entidades,
+    admin,
+    search,
+    suggest,
+    acesso
 )
 from infogrid.schemas import Message
+from infogrid.suggest import suggest_index
 
 # Configuração de logs
 LOG_FILE = "app.log"
@@ -26,7 +36,29 @@ formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
 handler.setFormatter(formatter)
 logger.addHandler(handler)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Avisos de escrita dos outros workers (Postgres LISTEN/NOTIFY), ligados antes da carga:
+    # os que chegam durante a carga são guardados por index_reload e refeitos depois da troca
+    if listener_supported():
+        change_listener.start()
+    # Índices em memória construídos uma vez por worker antes de aceitar requisições
+    with index_reload():
+        async with session_scope() as session:
+            await session.run_sync(suggest_index.load)
+            await session.run_sync(access_index.load)
+    access_write_buffer.start()
+    yield
+    # Grava o que ainda está no buffer de ingestão antes de encerrar o worker
+    await access_write_buffer.stop()
+    change_listener.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Registrado antes do log (middlewares posteriores ficam por fora): 304 e hits também são registrados
+app.middleware("http")(cache_responses)
 
 # Middleware global para registrar requisições em todos os routers
 @app.middleware("http")
@@ -47,6 +79,10 @@ app.include_router(registroacesso.router)
 app.include_router(usuario.router)
 app.include_router(relacionamentos.router)
 app.include_router(entidades.router)
+app.include_router(admin.router)
+app.include_router(search.router)
+app.include_router(suggest.router)
+app.include_router(acesso.router)
 
 # app.include_router(routerdatabase.router, prefix="/routerdatabase", tags=["RouterDatabase"])
 # app.include_router(responsavel.router, prefix="/responsavel", tags=["Responsável"])
@@ -0,0 +1,91 @@
+import logging
+from typing import List, Sequence
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from infogrid.upsert import _DIALECT_INSERTS
+
+logger = logging.getLogger("app_logger")
+
+# Limite de linhas por chamada de /bulk (um único INSERT multi-linha por lote)
+BULK_MAX_ROWS = 5000
+
+CREATED = "created"
+DUPLICATE = "duplicate"  # repetida dentro do próprio lote
+EXISTS = "exists"  # (nome, pai) já cadastrado
+PARENT_NOT_FOUND = "parent_not_found"
+INVALID = "invalid"
+
+
+def _column_length(column):
+    return getattr(column.type, "length", None)
+
+
+def insert_children(session: Session, model, parent_model, parent_field: str, rows: Sequence[dict]) -> List[dict]:
+    """
+    Insere colunas (de tabela ou de tópico) em lote numa única transação.
+
+    Roda numa Session síncrona (via `run_sync`): uma passada de validação, uma consulta
+    para os pais e um INSERT multi-linha ... ON CONFLICT (pai, nome) DO NOTHING RETURNING,
+    como em relationships.add_pairs. As linhas em conflito (já cadastradas, inclusive por
+    uma escrita concorrente) voltam como exists, com o id de uma consulta `(nome, pai) IN (...)`
+    feita só se houver conflito. Devolve o resultado de cada linha, na ordem recebida.
+
+    Um pai excluído entre a consulta e o INSERT faz a transação falhar com IntegrityError
+    (chave estrangeira), tratada pelos handlers.
+    """
+    nome_length = _column_length(model.__table__.c.nome)
+    tipo_length = _column_length(model.__table__.c.tipo_dado)
+    results: List[dict] = [{"indice": indice, "status": None, "id": None, "nome": row["nome"], "detalhe": None} for indice, row in enumerate(rows)]
+
+    # Validação em uma passada; só a primeira ocorrência de cada (nome, pai) segue adiante
+    candidates, seen = [], {}
+    for result, row in zip(results, rows):
+        nome = row["nome"].strip()
+        if not nome or (nome_length and len(nome) > nome_length):
+            result.update(status=INVALID, detalhe=f"nome deve ter entre 1 e {nome_length} caracteres")
+        elif not row["tipo_dado"].strip() or (tipo_length and len(row["tipo_dado"]) > tipo_length):
+            result.update(status=INVALID, detalhe=f"tipo_dado deve ter entre 1 e {tipo_length} caracteres")
+        elif (nome, row[parent_field]) in seen:
+            result.update(status=DUPLICATE, detalhe=f"repete a linha {seen[(nome, row[parent_field])]}")
+        else:
+            seen[(nome, row[parent_field])] = result["indice"]
+            candidates.append((result, {**row, "nome": nome}))
+
+    parent_ids = {row[parent_field] for _, row in candidates}
+    existing_parents = set(session.scalars(select(parent_model.id).where(parent_model.id.in_(parent_ids)))) if parent_ids else set()
+
+    to_insert = []
+    for result, row in candidates:
+        if row[parent_field] not in existing_parents:
+            result.update(status=PARENT_NOT_FOUND, detalhe=f"{parent_field} {row[parent_field]} não encontrado")
+        else:
+            to_insert.append((result, row))
+
+    created = 0
+    if to_insert:
+        parent_column = getattr(model, parent_field)
+        insert = _DIALECT_INSERTS[session.get_bind().dialect.name]
+        stmt = (
+            insert(model)
+            .on_conflict_do_nothing(index_elements=[parent_column, model.nome])
+            .returning(model.nome, parent_column, model.id)
+        )
+        written = {(nome, parent_id): entity_id for nome, parent_id, entity_id in session.execute(stmt, [row for _, row in to_insert])}
+        conflicts = [key for key in ((row["nome"], row[parent_field]) for _, row in to_insert) if key not in written]
+        existing = {}
+        if conflicts:
+            stmt = select(model.nome, parent_column, model.id).where(tuple_(model.nome, parent_column).in_(conflicts))
+            existing = {(nome, parent_id): entity_id for nome, parent_id, entity_id in session.execute(stmt)}
+        for result, row in to_insert:
+            key = (row["nome"], row[parent_field])
+            if key in written:
+                result.update(status=CREATED, id=written[key], nome=row["nome"])
+                created += 1
+            else:
+                result.update(status=EXISTS, id=existing.get(key))
+    session.commit()
+
+    logger.info(f"Inserção em lote em {model.__tablename__}: {created} de {len(rows)} linhas criadas")
+    return results
@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import Request, Response
+
+from infogrid.database import settings
+from infogrid.export import export_format
+
+logger = logging.getLogger("app_logger")
+
+# Prefixo de rota -> tipos de entidade cujo conteúdo aparece na resposta.
+# database/tabela/topicokafka embutem os responsáveis, então dependem também de "responsavel".
+ROUTE_DEPENDENCIES = {
+    "/api/v1/database": ("database", "responsavel"),
+    "/api/v1/tabela": ("tabela", "responsavel"),
+    "/api/v1/coluna": ("coluna",),
+    "/api/v1/topicokafka": ("topicokafka", "responsavel"),
+    "/api/v1/colunatopicokafka": ("colunatopicokafka",),
+    "/api/v1/responsavel": ("responsavel",),
+    "/api/v1/usuario": ("usuario",),
+    "/api/v1/registroacesso": ("registroacesso",),
+    "/api/v1/relacionamentos": ("database", "tabela", "topicokafka", "responsavel"),
+    "/api/v1/entidades": ("responsavel", "database", "tabela", "topicokafka"),
+    "/api/v1/search": ("database", "tabela", "coluna", "topicokafka", "colunatopicokafka", "responsavel"),
+}
+
+# Headers que não fazem sentido repetir a partir do cache
+_SKIPPED_HEADERS = {"content-length", "etag", "cache-control"}
+
+
+def route_dependencies(path: str) -> Optional[Tuple[str, ...]]:
+    for prefix, tipos in ROUTE_DEPENDENCIES.items():
+        if path == prefix or path.startswith(prefix + "/"):
+            return tipos
+    return None
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class ResponseCache:
+    """
+    Cache das respostas JSON dos GETs do catálogo, invalidado por versão.
+
+    Cada tipo de entidade tem um contador que os handlers de escrita incrementam após o
+    commit. O ETag de uma resposta é derivado da rota, da query, do Accept e das versões
+    das entidades de que ela depende — por isso um `If-None-Match` pode ser respondido
+    com 304 sem executar o handler. Entradas antigas nunca são servidas (o ETag muda) e
+    saem do LRU naturalmente.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._versions: dict = {}
+        self._entries: OrderedDict = OrderedDict()
+        # Muda a cada processo: contadores reiniciados não podem repetir ETags de antes do restart
+        self._epoch = uuid.uuid4().hex
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def bump(self, *tipos: str):
+        with self._lock:
+            for tipo in tipos:
+                self._versions[tipo] = self._versions.get(tipo, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._versions = {}
+            self._entries.clear()
+            self.hits = self.misses = self.not_modified = 0
+
+    def etag(self, key: tuple, tipos: Tuple[str, ...]) -> str:
+        with self._lock:
+            versions = ",".join(f"{tipo}:{self._versions.get(tipo, 0)}" for tipo in tipos)
+        digest = hashlib.sha1(f"{self._epoch}|{key}|{versions}".encode()).hexdigest()
+        return f'"{digest[:32]}"'
+
+    def get(self, key: tuple, etag: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def put(self, key: tuple, etag: str, body: bytes, headers: dict):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (etag, body, headers)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "versions": dict(self._versions),
+            }
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ENTRIES)
+
+
+async def cache_responses(request: Request, call_next):
+    """
+    Middleware: 304 para If-None-Match com o ETag atual, resposta guardada quando houver,
+    e só então o handler. Exportações NDJSON/CSV (streaming) passam direto.
+    """
+    tipos = route_dependencies(request.url.path) if request.method == "GET" else None
+    if tipos is None or export_format(request):
+        return await call_next(request)
+
+    key = (request.url.path, request.url.query, request.headers.get("accept", ""))
+    # Calculado antes do handler: uma escrita concorrente muda a versão e a entrada fica órfã
+    etag = response_cache.etag(key, tipos)
+    cache_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers=cache_headers)
+
+    cached = response_cache.get(key, etag)
+    if cached is not None:
+        _, body, headers = cached
+        return Response(content=body, headers={**headers, **cache_headers})
+
+    response = await call_next(request)
+    if response.status_code != 200 or not response.headers.get("content-type", "").startswith("application/json"):
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = {name: value for name, value in response.headers.items() if name not in _SKIPPED_HEADERS}
+    response_cache.put(key, etag, body, headers)
+    return Response(content=body, headers={**headers, **cache_headers})
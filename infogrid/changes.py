@@ -0,0 +1,278 @@
+import json
+import logging
+import select as select_module
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from infogrid import database
+from infogrid.acl import access_index
+from infogrid.cache import ROUTE_DEPENDENCIES, response_cache
+from infogrid.suggest import SUGGEST_TARGETS, suggest_index
+
+logger = logging.getLogger("app_logger")
+
+# Canal do Postgres usado para avisar os outros workers de cada escrita
+CHANGES_CHANNEL = "infogrid_changes"
+
+# Identifica este processo no payload, para o listener ignorar os próprios avisos
+ORIGIN = uuid.uuid4().hex
+
+# O payload do NOTIFY é limitado a 8000 bytes: avisos em lote são divididos abaixo disso
+NOTIFY_PAYLOAD_LIMIT = 7500
+
+ENTITY_TYPES = tuple(dict.fromkeys(tipo for tipos in ROUTE_DEPENDENCIES.values() for tipo in tipos))
+
+# Alterações aplicadas enquanto há uma carga de índices em andamento, refeitas depois da troca
+_reload_lock = threading.Lock()
+_reloads_in_progress = 0
+_changes_during_reload: List[Tuple[Callable, tuple]] = []
+
+
+@contextmanager
+def index_reload():
+    """
+    Envolve uma carga completa dos índices em memória (suggest_index/access_index.load).
+
+    A carga troca o índice inteiro pelo que leu do banco, então uma alteração aplicada no índice
+    antigo durante a leitura, mas commitada depois do que a leitura enxergou, some na troca.
+    Enquanto houver carga em andamento, apply_change/apply_changes aplicam normalmente e também
+    guardam a alteração; ao fim de cada carga as guardadas são refeitas em ordem sobre o índice
+    novo (aplicar de novo o que a leitura já viu não muda nada).
+    """
+    global _reloads_in_progress
+    with _reload_lock:
+        _reloads_in_progress += 1
+    try:
+        yield
+    finally:
+        with _reload_lock:
+            _reloads_in_progress -= 1
+            for apply, args in _changes_during_reload:
+                apply(*args)
+            # Outra carga ainda pode trocar o índice: as alterações ficam guardadas até a última
+            if not _reloads_in_progress:
+                _changes_during_reload.clear()
+
+
+def apply_change(tipo: str, entity_id: Optional[int] = None, nome: Optional[str] = None, deleted: bool = False, acesso: Optional[dict] = None):
+    """
+    Invalida o que este worker mantém em memória para uma entidade alterada.
+    `acesso` traz os campos de um registro de acesso (infogrid.acl.ACL_FIELDS) para o índice de permissões.
+    """
+    with _reload_lock:
+        if _reloads_in_progress:
+            _changes_during_reload.append((_apply_change, (tipo, entity_id, nome, deleted, acesso)))
+        _apply_change(tipo, entity_id, nome, deleted, acesso)
+
+
+def apply_changes(tipo: str, items: Sequence[tuple], deleted: bool = False):
+    """
+    Itens (id, nome); os de registroacesso são (id, None, acesso), como em apply_change.
+    """
+    with _reload_lock:
+        if _reloads_in_progress:
+            _changes_during_reload.append((_apply_changes, (tipo, items, deleted)))
+        _apply_changes(tipo, items, deleted)
+
+
+def _apply_change(tipo: str, entity_id: Optional[int], nome: Optional[str], deleted: bool, acesso: Optional[dict]):
+    response_cache.bump(tipo)
+    if tipo == "registroacesso" and entity_id is not None:
+        if deleted:
+            access_index.remove(entity_id)
+        elif acesso is not None:
+            access_index.put(entity_id, **acesso)
+    if tipo in SUGGEST_TARGETS and entity_id is not None:
+        if deleted:
+            suggest_index.remove(tipo, entity_id)
+        elif nome is not None:
+            suggest_index.add(tipo, entity_id, nome)
+
+
+def _apply_changes(tipo: str, items: Sequence[tuple], deleted: bool):
+    response_cache.bump(tipo)
+    if tipo == "registroacesso":
+        for entity_id, _, *acesso in items:
+            if deleted:
+                access_index.remove(entity_id)
+            elif acesso:
+                access_index.put(entity_id, **acesso[0])
+    if tipo in SUGGEST_TARGETS:
+        for entity_id, nome, *_ in items:
+            if deleted:
+                suggest_index.remove(tipo, entity_id)
+            elif nome is not None:
+                suggest_index.add(tipo, entity_id, nome)
+
+
+def invalidate_all():
+    """
+    Invalidação completa, usada quando avisos podem ter sido perdidos (reconexão do listener).
+    """
+    response_cache.bump(*ENTITY_TYPES)
+    with index_reload(), Session(database.engine) as session:
+        suggest_index.load(session)
+        access_index.load(session)
+
+
+async def publish_change(session, tipo: str, entity_id: Optional[int] = None, nome: Optional[str] = None, deleted: bool = False, acesso: Optional[dict] = None):
+    """
+    Chamado pelos handlers logo após o commit de uma escrita: invalida localmente e,
+    no Postgres, faz `pg_notify` para que os demais workers façam o mesmo.
+    """
+    apply_change(tipo, entity_id, nome, deleted, acesso)
+    payload = {"origin": ORIGIN, "tipo": tipo, "id": entity_id, "nome": nome, "deleted": deleted}
+    if acesso is not None:
+        payload["acesso"] = acesso
+    await _notify(session, [payload])
+
+
+async def publish_changes(session, tipo: str, items: Sequence[tuple], deleted: bool = False):
+    """
+    Versão em lote de publish_change para (id, nome) criados/atualizados de uma vez:
+    um único incremento de versão e poucos avisos, cada um com vários itens.
+    """
+    apply_changes(tipo, items, deleted)
+    await _notify(session, _bulk_payloads(tipo, items, deleted))
+
+
+def publish_changes_sync(session: Session, tipo: str, items: Sequence[tuple], deleted: bool = False):
+    """
+    publish_changes para jobs fora da API (harvester, importadores) com Session síncrona.
+    """
+    apply_changes(tipo, items, deleted)
+    if not _notifications_enabled(session):
+        return
+    for payload in _bulk_payloads(tipo, items, deleted):
+        session.execute(select(func.pg_notify(CHANGES_CHANNEL, json.dumps(payload, ensure_ascii=False))))
+    session.commit()
+
+
+def publish_reload_sync(session: Session):
+    """
+    Pede a todos os workers uma invalidação completa, para trocas do catálogo inteiro
+    (importação de snapshot) em que avisar entidade por entidade não compensa.
+    """
+    invalidate_all()
+    if not _notifications_enabled(session):
+        return
+    session.execute(select(func.pg_notify(CHANGES_CHANNEL, json.dumps({"origin": ORIGIN, "reload": True}))))
+    session.commit()
+
+
+def _bulk_payloads(tipo: str, items: Sequence[tuple], deleted: bool = False) -> List[dict]:
+    payloads, chunk, size = [], [], 0
+    for item in items:
+        item_size = len(json.dumps(list(item), ensure_ascii=False).encode())
+        if chunk and size + item_size > NOTIFY_PAYLOAD_LIMIT:
+            payloads.append({"origin": ORIGIN, "tipo": tipo, "items": chunk, "deleted": deleted})
+            chunk, size = [], 0
+        chunk.append(list(item))
+        size += item_size + 1
+    if chunk or not payloads:
+        payloads.append({"origin": ORIGIN, "tipo": tipo, "items": chunk, "deleted": deleted})
+    return payloads
+
+
+def _notifications_enabled(session) -> bool:
+    return session.get_bind().dialect.name == "postgresql" and database.settings.CHANGE_NOTIFICATIONS
+
+
+async def _notify(session, payloads: List[dict]):
+    if not _notifications_enabled(session):
+        return
+    for payload in payloads:
+        await session.execute(select(func.pg_notify(CHANGES_CHANNEL, json.dumps(payload, ensure_ascii=False))))
+    await session.commit()
+
+
+def handle_notification(payload: str):
+    try:
+        change = json.loads(payload)
+    except ValueError:
+        logger.warning(f"Aviso de alteração inválido ignorado: {payload}")
+        return
+    if change.get("origin") == ORIGIN:
+        return
+    if change.get("reload"):
+        invalidate_all()
+        return
+    if "items" in change:
+        apply_changes(change["tipo"], change["items"], change.get("deleted", False))
+        return
+    apply_change(change["tipo"], change.get("id"), change.get("nome"), change.get("deleted", False), change.get("acesso"))
+
+
+class ChangeListener:
+    """
+    Thread de cada worker que faz LISTEN em infogrid_changes numa conexão psycopg2 dedicada
+    (fora do pool) e aplica os avisos dos outros workers nos caches e índices locais.
+    """
+
+    def __init__(self, poll_interval: float = 5.0, reconnect_delay: float = 2.0):
+        self.poll_interval = poll_interval
+        self.reconnect_delay = reconnect_delay
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _connect(self):
+        engine = database.engine
+        cargs, cparams = engine.dialect.create_connect_args(engine.url)
+        connection = engine.dialect.connect(*cargs, **cparams)
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANGES_CHANNEL}")
+        return connection
+
+    def _listen(self, connection):
+        while not self._stop.is_set():
+            readable, _, _ = select_module.select([connection], [], [], self.poll_interval)
+            if not readable:
+                continue
+            connection.poll()
+            while connection.notifies:
+                handle_notification(connection.notifies.pop(0).payload)
+
+    def run(self):
+        first = True
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = self._connect()
+                if not first:
+                    invalidate_all()
+                first = False
+                logger.info(f"Escutando alterações no canal {CHANGES_CHANNEL}")
+                self._listen(connection)
+            except Exception:
+                logger.error("Listener de alterações perdeu a conexão; reconectando", exc_info=True)
+                first = False
+                self._stop.wait(self.reconnect_delay)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="infogrid-change-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+
+
+change_listener = ChangeListener()
+
+
+def listener_supported() -> bool:
+    return database.settings.CHANGE_NOTIFICATIONS and database.engine.dialect.driver == "psycopg2"
@@ -0,0 +1,105 @@
+import logging
+from typing import Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from infogrid.models import Responsavel
+
+logger = logging.getLogger("app_logger")
+
+# SQLSTATE do Postgres (psycopg2 expõe em pgcode; o adaptador do asyncpg também)
+UNIQUE_VIOLATION = "23505"
+FOREIGN_KEY_VIOLATION = "23503"
+
+
+def _sqlstate(error: IntegrityError) -> Optional[str]:
+    return getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+
+
+def is_unique_violation(error: IntegrityError) -> bool:
+    """
+    A escrita foi recusada por uma constraint única (o registro já existe).
+    """
+    return _sqlstate(error) == UNIQUE_VIOLATION or "UNIQUE constraint failed" in str(error.orig)
+
+
+def is_foreign_key_violation(error: IntegrityError) -> bool:
+    return _sqlstate(error) == FOREIGN_KEY_VIOLATION or "FOREIGN KEY constraint failed" in str(error.orig)
+
+
+def _responsaveis(session: Session, model, entity_id: int) -> list:
+    """
+    Responsáveis de um Database/Tabela/TopicoKafka para a resposta (um SELECT por EXISTS).
+    """
+    relationship = model.__mapper__.relationships["responsaveis"]
+    backref = getattr(Responsavel, relationship.back_populates)
+    columns = (Responsavel.nome, Responsavel.email, Responsavel.cargo, Responsavel.telefone)
+    stmt = select(*columns).where(backref.any(model.id == entity_id)).order_by(Responsavel.id)
+    return [dict(row) for row in session.execute(stmt).mappings()]
+
+
+def _with_responsaveis(session: Session, model, row: dict, loaded: bool) -> dict:
+    if "responsaveis" in model.__mapper__.relationships:
+        row["responsaveis"] = _responsaveis(session, model, row["id"]) if loaded else []
+    return row
+
+
+def _run(session: Session, stmt, model=None, load_responsaveis: bool = False) -> Optional[dict]:
+    try:
+        row = session.execute(stmt).mappings().one_or_none()
+        if row is None:
+            session.rollback()
+            return None
+        row = dict(row)
+        if model is not None:
+            row = _with_responsaveis(session, model, row, load_responsaveis)
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise
+    return row
+
+
+def insert_returning(session: Session, model, values: dict) -> dict:
+    """
+    INSERT ... RETURNING e commit: a linha criada volta no mesmo comando, sem SELECT
+    antes (a constraint única decide se já existe) nem refresh depois.
+
+    Roda numa Session síncrona (via `run_sync`). IntegrityError é propagado após o
+    rollback; use is_unique_violation para separar "já existe" das demais falhas.
+    Entidades com responsáveis voltam com a lista vazia, como no POST.
+    """
+    table = model.__table__
+    return _run(session, insert(table).values(**values).returning(*table.columns), model)
+
+
+def update_returning(session: Session, model, entity_id: int, values: dict) -> Optional[dict]:
+    """
+    UPDATE ... WHERE id = :id RETURNING e commit; None quando o id não existe.
+    Para Database/Tabela/TopicoKafka os responsáveis são lidos na mesma transação.
+    """
+    table = model.__table__
+    stmt = update(table).where(table.c.id == entity_id).values(**values).returning(*table.columns)
+    return _run(session, stmt, model, load_responsaveis=True)
+
+
+def delete_returning(session: Session, model, entity_id: int) -> Optional[dict]:
+    """
+    DELETE ... WHERE id = :id RETURNING id, nome (quando houver) e commit; None quando o id
+    não existe. As associações com responsáveis saem junto (ON DELETE CASCADE).
+    """
+    table = model.__table__
+    columns = [table.c.id] + ([table.c.nome] if "nome" in table.c else [])
+    return _run(session, delete(table).where(table.c.id == entity_id).returning(*columns))
+
+
+def patch_returning(session: Session, model, entity_id: int, values: dict) -> Optional[dict]:
+    """
+    UPDATE ... SET <só as colunas enviadas> WHERE id = :id RETURNING e commit, para o PATCH;
+    None quando o id não existe. Não lê relacionamentos: a resposta é a linha da tabela.
+    """
+    table = model.__table__
+    stmt = update(table).where(table.c.id == entity_id).values(**values).returning(*table.columns)
+    return _run(session, stmt)
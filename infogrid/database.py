@@ -1,11 +1,136 @@
+from contextlib import asynccontextmanager
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 
+from infogrid.pool import pool_options
 from infogrid.settings import Settings
 
-engine = create_engine(Settings().DATABASE_URL)
+settings = Settings()
+
+# Driver assíncrono usado para cada backend quando ASYNC_DATABASE está ligado
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """
+    Converte a URL síncrona (ex.: postgresql+psycopg2) para o driver assíncrono equivalente.
+    """
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"Backend sem driver assíncrono configurado: {parsed.get_backend_name()}")
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+engine = create_engine(settings.DATABASE_URL, **pool_options(settings))
+
+async_engine = (
+    create_async_engine(
+        settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL),
+        **pool_options(settings, is_async=True),
+    )
+    if settings.ASYNC_DATABASE
+    else None
+)
+
+
+class ThreadedSession:
+    """
+    Expõe uma Session síncrona com a mesma interface aguardável da AsyncSession.
+
+    Usada enquanto ASYNC_DATABASE está desligado: os handlers são sempre `async def`
+    e cada ida ao banco roda no threadpool, como acontecia com os handlers síncronos.
+    """
+
+    def __init__(self, sync_session: Session):
+        self.sync_session = sync_session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def get_bind(self):
+        return self.sync_session.get_bind()
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, *args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance, attribute_names=None):
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def stream(self, statement, *args, **kwargs):
+        result = await run_in_threadpool(self.sync_session.execute, statement, *args, **kwargs)
+        return ThreadedStreamResult(result)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class ThreadedStreamResult:
+    """
+    Equivalente a AsyncResult para ThreadedSession: cada lote é buscado no threadpool.
+    """
+
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size=None):
+        async for partition in iterate_in_threadpool(self.result.partitions(size)):
+            yield partition
+
+
+@asynccontextmanager
+async def session_scope():
+    """
+    Abre uma sessão no modo configurado (AsyncSession ou Session síncrona no threadpool).
+    """
+    if async_engine is not None:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+    else:
+        async with ThreadedSession(Session(engine, expire_on_commit=False)) as session:
+            yield session
 
 
-def get_session():
-    with Session(engine) as session:
+async def get_session():
+    async with session_scope() as session:
         yield session
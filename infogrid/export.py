@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+import logging
+from typing import Optional, Sequence
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from infogrid.database import session_scope
+
+logger = logging.getLogger("app_logger")
+
+NDJSON = "application/x-ndjson"
+CSV = "text/csv"
+
+# Linhas buscadas por ida ao banco (yield_per / cursor do lado do servidor)
+EXPORT_BATCH_SIZE = 1000
+
+
+def export_format(request: Request) -> Optional[str]:
+    """
+    Devolve o formato de exportação pedido no header Accept, ou None para a resposta JSON normal.
+    """
+    accept = request.headers.get("accept", "")
+    for media_type in (NDJSON, CSV):
+        if media_type in accept:
+            return media_type
+    return None
+
+
+def _ndjson_chunk(keys, rows) -> str:
+    return "".join(json.dumps(dict(zip(keys, row)), default=str, ensure_ascii=False) + "\n" for row in rows)
+
+
+def _csv_chunk(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(json.dumps(value, ensure_ascii=False) if isinstance(value, (list, dict)) else value for value in row)
+    return buffer.getvalue()
+
+
+async def iter_export(stmt, media_type: str, batch_size: Optional[int] = None):
+    """
+    Serializa o resultado em lotes a partir de um cursor do lado do servidor.
+
+    A sessão é aberta aqui, e não recebida do handler: o get_session do handler já foi
+    fechado quando o StreamingResponse começa a enviar o corpo.
+    """
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+    keys = [column.name for column in stmt.selected_columns]
+    if media_type == CSV:
+        yield _csv_chunk([keys])
+
+    total = 0
+    async with session_scope() as session:
+        result = await session.stream(stmt.execution_options(yield_per=batch_size))
+        async for rows in result.partitions(batch_size):
+            total += len(rows)
+            yield _csv_chunk(rows) if media_type == CSV else _ndjson_chunk(keys, rows)
+    logger.info(f"Exportação concluída: {total} linhas em {media_type}")
+
+
+def stream_export(model, media_type: str, filename: Optional[str] = None, where: Sequence = ()) -> StreamingResponse:
+    """
+    Exporta as colunas da tabela do model (sem relacionamentos) como NDJSON ou CSV, em ordem de id.
+    `where` recebe filtros opcionais aplicados ao select.
+    """
+    stmt = select(*model.__table__.columns).where(*where).order_by(model.__table__.c.id)
+    headers = {}
+    if media_type == CSV:
+        headers["Content-Disposition"] = f'attachment; filename="{filename or model.__tablename__}.csv"'
+    return StreamingResponse(iter_export(stmt, media_type), media_type=media_type, headers=headers)
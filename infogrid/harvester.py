@@ -0,0 +1,237 @@
+"""
+Coletor de schemas: introspecta os bancos cadastrados e grava tabelas e colunas no catálogo.
+
+Cada Database é associado a uma URL de conexão pelo nome (as URLs não ficam no catálogo).
+A introspecção roda em paralelo num pool de threads limitado; a escrita no catálogo é
+feita por um único escritor à medida que cada banco termina, aplicando só o delta
+calculado por infogrid/schema_sync.py.
+
+    python -m infogrid.harvester --url vendas=postgresql://leitor@vendas-db/vendas --workers 8
+    python -m infogrid.harvester --urls-file bancos.json --json
+"""
+import argparse
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine, inspect, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from infogrid import database
+from infogrid.models import Database
+from infogrid.schema_sync import TableSnapshot, sync_schema
+
+logger = logging.getLogger("app_logger")
+
+DEFAULT_WORKERS = 4
+
+# Limites das colunas do catálogo (String(255) para nomes, String(50) para tipo_dado)
+NOME_MAX = 255
+TIPO_DADO_MAX = 50
+
+
+@dataclass
+class DatabaseHarvest:
+    nome: str
+    database_id: Optional[int] = None
+    tabelas: int = 0
+    colunas: int = 0
+    tabelas_criadas: int = 0
+    tabelas_alteradas: int = 0
+    tabelas_removidas: int = 0
+    tabelas_inalteradas: int = 0
+    colunas_criadas: int = 0
+    colunas_atualizadas: int = 0
+    colunas_removidas: int = 0
+    introspeccao_s: float = 0.0
+    escrita_s: float = 0.0
+    erro: Optional[str] = None
+
+
+@dataclass
+class HarvestReport:
+    bancos: List[DatabaseHarvest] = field(default_factory=list)
+    duracao_s: float = 0.0
+
+    @property
+    def falhas(self) -> List[DatabaseHarvest]:
+        return [banco for banco in self.bancos if banco.erro]
+
+    def as_dict(self) -> dict:
+        return {
+            "duracao_s": round(self.duracao_s, 3),
+            "tabelas": sum(banco.tabelas for banco in self.bancos),
+            "colunas": sum(banco.colunas for banco in self.bancos),
+            "falhas": len(self.falhas),
+            "bancos": [asdict(banco) for banco in self.bancos],
+        }
+
+
+def _type_name(column_type) -> str:
+    try:
+        name = str(column_type)
+    except Exception:  # tipos de dialeto que não compilam fora dele
+        name = type(column_type).__name__
+    return name[:TIPO_DADO_MAX]
+
+
+def introspect(url: str, schema: Optional[str] = None) -> List[TableSnapshot]:
+    """
+    Lê tabelas, colunas e comentários de um banco com o inspector do SQLAlchemy.
+
+    Usa a reflexão em lote (get_multi_*): no Postgres são poucas consultas ao
+    information_schema por banco, em vez de uma por tabela.
+    """
+    engine = create_engine(url, poolclass=NullPool)
+    try:
+        inspector = inspect(engine)
+        columns_by_table = inspector.get_multi_columns(schema=schema)
+        try:
+            comments = inspector.get_multi_table_comment(schema=schema)
+        except NotImplementedError:  # SQLite não tem comentários
+            comments = {}
+    finally:
+        engine.dispose()
+
+    tables = []
+    for (_, table_name), columns in sorted(columns_by_table.items(), key=lambda item: item[0][1]):
+        comment = comments.get((schema, table_name), {}).get("text")
+        tables.append(TableSnapshot(
+            nome=table_name[:NOME_MAX],
+            descricao=comment,
+            colunas=[
+                {"nome": column["name"][:NOME_MAX], "tipo_dado": _type_name(column["type"]), "descricao": column.get("comment")}
+                for column in columns
+            ],
+        ))
+    return tables
+
+
+def write_catalog(session: Session, database_id: int, tables: List[TableSnapshot], result: DatabaseHarvest, delete_missing: bool = True):
+    """
+    Aplica o snapshot de um banco ao catálogo: só tabelas com fingerprint diferente são
+    comparadas coluna a coluna, e só o delta é escrito, numa transação.
+    """
+    delta = sync_schema(session, database_id, tables, delete_missing)
+    result.tabelas = len(tables)
+    result.colunas = sum(len(table.colunas) for table in tables)
+    for key, value in delta.resumo().items():
+        setattr(result, key, value)
+
+
+def _log_progress(done: int, total: int, result: DatabaseHarvest):
+    if result.erro:
+        logger.error(f"Coleta {done}/{total}: {result.nome} falhou: {result.erro}")
+    else:
+        logger.info(
+            f"Coleta {done}/{total}: {result.nome} com {result.tabelas} tabelas ({result.tabelas_inalteradas} inalteradas) "
+            f"e {result.colunas} colunas; colunas +{result.colunas_criadas} ~{result.colunas_atualizadas} -{result.colunas_removidas} "
+            f"(introspecção {result.introspeccao_s:.2f}s, escrita {result.escrita_s:.2f}s)"
+        )
+
+
+def _timed_introspect(url: str, schema: Optional[str]):
+    start = time.perf_counter()
+    tables = introspect(url, schema)
+    return tables, time.perf_counter() - start
+
+
+def harvest(
+    urls: Dict[str, str],
+    max_workers: int = DEFAULT_WORKERS,
+    schema: Optional[str] = None,
+    progress: Optional[Callable[[int, int, DatabaseHarvest], None]] = _log_progress,
+    delete_missing: bool = True,
+) -> HarvestReport:
+    """
+    Coleta os bancos de `urls` ({nome do Database: URL}) e devolve o relatório com tempos por banco.
+    Com delete_missing, tabelas e colunas que sumiram da origem são removidas do catálogo.
+    """
+    started = time.perf_counter()
+    report = HarvestReport()
+    with Session(database.engine, expire_on_commit=False) as session:
+        registered = dict(session.execute(select(Database.nome, Database.id).where(Database.nome.in_(list(urls)))).all())
+
+        results, pending, done = {}, {}, 0
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="harvester") as executor:
+            for nome, url in urls.items():
+                results[nome] = DatabaseHarvest(nome=nome, database_id=registered.get(nome))
+                if nome in registered:
+                    pending[executor.submit(_timed_introspect, url, schema)] = nome
+                    continue
+                results[nome].erro = "Database não cadastrado no catálogo"
+                done += 1
+                if progress:
+                    progress(done, len(urls), results[nome])
+
+            for future in as_completed(pending):
+                result = results[pending[future]]
+                try:
+                    tables, result.introspeccao_s = future.result()
+                    write_start = time.perf_counter()
+                    write_catalog(session, result.database_id, tables, result, delete_missing)
+                    result.escrita_s = time.perf_counter() - write_start
+                except Exception as e:
+                    session.rollback()
+                    result.erro = f"{type(e).__name__}: {e}"
+                done += 1
+                if progress:
+                    progress(done, len(urls), result)
+
+    report.bancos = [results[nome] for nome in urls]
+    report.duracao_s = time.perf_counter() - started
+    logger.info(f"Coleta concluída em {report.duracao_s:.2f}s: {len(report.bancos)} bancos, {len(report.falhas)} falhas")
+    return report
+
+
+def _parse_urls(args) -> Dict[str, str]:
+    urls = {}
+    if args.urls_file:
+        with open(args.urls_file, encoding="utf-8") as f:
+            urls.update(json.load(f))
+    for item in args.url or []:
+        nome, _, url = item.partition("=")
+        if not url:
+            raise SystemExit(f"--url deve ser nome=URL: {item}")
+        urls[nome] = url
+    return urls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", action="append", help="nome_do_database=URL (pode repetir)")
+    parser.add_argument("--urls-file", help="JSON {nome_do_database: URL}")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--schema", default=None, help="schema a coletar (padrão: o default de cada banco)")
+    parser.add_argument("--keep-missing", action="store_true", help="não remove do catálogo tabelas/colunas que sumiram da origem")
+    parser.add_argument("--json", action="store_true", help="imprime o relatório completo em JSON")
+    args = parser.parse_args(argv)
+
+    urls = _parse_urls(args)
+    if not urls:
+        parser.error("informe --url ou --urls-file")
+
+    def print_progress(done, total, result):
+        _log_progress(done, total, result)
+        status = f"ERRO {result.erro}" if result.erro else (
+            f"{result.tabelas} tabelas ({result.tabelas_inalteradas} inalteradas), colunas "
+            f"+{result.colunas_criadas} ~{result.colunas_atualizadas} -{result.colunas_removidas}"
+        )
+        print(f"[{done}/{total}] {result.nome} ({make_url(urls[result.nome]).render_as_string(hide_password=True)}): {status}")
+
+    report = harvest(urls, args.workers, args.schema, progress=None if args.json else print_progress, delete_missing=not args.keep_missing)
+    if args.json:
+        print(json.dumps(report.as_dict(), indent=2, ensure_ascii=False))
+    else:
+        summary = report.as_dict()
+        print(f"{summary['tabelas']} tabelas e {summary['colunas']} colunas em {summary['duracao_s']}s ({summary['falhas']} falhas)")
+    return 1 if report.falhas else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,191 @@
+"""
+Relatório de índices candidatos para o banco do catálogo.
+
+Junta três fontes:
+  - FKs cujas colunas não são prefixo de nenhum índice, PK ou constraint única (via
+    inspeção do schema, funciona em qualquer banco);
+  - tabelas com mais seq scans que index scans e volume relevante (pg_stat_user_tables);
+  - consultas que leem muitos blocos por linha devolvida (pg_stat_statements, Postgres 13+,
+    quando a extensão está instalada e carregada em shared_preload_libraries).
+
+Só relata: os CREATE INDEX sugeridos devem virar uma migration.
+
+    python -m infogrid.index_advisor
+    python -m infogrid.index_advisor --limite 50 --json
+"""
+import argparse
+import json
+import logging
+import re
+from typing import Dict, List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+
+from infogrid import database
+from infogrid.models import table_registry
+
+logger = logging.getLogger("app_logger")
+
+DEFAULT_LIMIT = 20
+
+# Abaixo disso um seq scan costuma ser mais barato que qualquer índice
+SEQ_SCAN_MIN_ROWS = 10_000
+
+# Consultas que leem ao menos esse número de blocos (8 kB) por linha devolvida
+STATEMENT_MIN_BLOCKS_PER_ROW = 100
+STATEMENT_MIN_CALLS = 10
+
+
+def _index_prefixes(inspector, table: str) -> List[List[str]]:
+    prefixes = [inspector.get_pk_constraint(table).get("constrained_columns") or []]
+    prefixes += [index["column_names"] for index in inspector.get_indexes(table)]
+    prefixes += [unique["column_names"] for unique in inspector.get_unique_constraints(table)]
+    # Índices de expressão (lower(nome) ...) não atendem a FK
+    return [prefix for prefix in prefixes if prefix and None not in prefix]
+
+
+def unindexed_foreign_keys(connection: Connection) -> List[dict]:
+    """
+    FKs sem índice que comece pelas suas colunas: cada "filhos do pai X" e cada DELETE/UPDATE
+    do pai (checagem da FK, ON DELETE CASCADE) vira um seq scan na tabela filha.
+    """
+    inspector = inspect(connection)
+    missing = []
+    for table in inspector.get_table_names():
+        prefixes = _index_prefixes(inspector, table)
+        for fk in inspector.get_foreign_keys(table):
+            columns = fk["constrained_columns"]
+            if any(set(prefix[:len(columns)]) == set(columns) for prefix in prefixes):
+                continue
+            missing.append({
+                "tabela": table,
+                "colunas": columns,
+                "referencia": fk["referred_table"],
+                "sugestao": f"CREATE INDEX CONCURRENTLY ix_{table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})",
+            })
+    return missing
+
+
+def seq_scan_tables(connection: Connection, limit: int = DEFAULT_LIMIT) -> List[dict]:
+    """
+    Tabelas lidas mais por seq scan que por índice, ordenadas pelas linhas lidas nesses scans.
+    """
+    rows = connection.execute(text(
+        "SELECT relname AS tabela, seq_scan, seq_tup_read, coalesce(idx_scan, 0) AS idx_scan, n_live_tup "
+        "FROM pg_stat_user_tables "
+        "WHERE seq_scan > coalesce(idx_scan, 0) AND n_live_tup >= :min_rows "
+        "ORDER BY seq_tup_read DESC LIMIT :limit"
+    ), {"min_rows": SEQ_SCAN_MIN_ROWS, "limit": limit}).mappings()
+    return [{**row, "linhas_por_seq_scan": row["seq_tup_read"] // max(row["seq_scan"], 1)} for row in rows]
+
+
+def expensive_statements(connection: Connection, limit: int = DEFAULT_LIMIT) -> List[dict]:
+    """
+    Consultas deste banco que leem muitos blocos por linha devolvida (sinal de filtro sem
+    índice), ordenadas pelo tempo total, com as tabelas do catálogo que elas citam.
+    """
+    rows = connection.execute(text(
+        "SELECT query, calls, total_exec_time, mean_exec_time, rows, "
+        "shared_blks_hit + shared_blks_read AS blocos "
+        "FROM pg_stat_statements "
+        "WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database()) "
+        "AND calls >= :min_calls "
+        "AND shared_blks_hit + shared_blks_read >= :min_blocks * greatest(rows, calls) "
+        "ORDER BY total_exec_time DESC LIMIT :limit"
+    ), {"min_calls": STATEMENT_MIN_CALLS, "min_blocks": STATEMENT_MIN_BLOCKS_PER_ROW, "limit": limit}).mappings()
+    names = table_registry.metadata.tables.keys()
+    statements = []
+    for row in rows:
+        cited = [name for name in names if re.search(rf"\b{name}\b", row["query"])]
+        statements.append({
+            "consulta": row["query"],
+            "chamadas": row["calls"],
+            "tempo_total_ms": round(row["total_exec_time"], 1),
+            "tempo_medio_ms": round(row["mean_exec_time"], 2),
+            "blocos_por_linha": row["blocos"] // max(row["rows"], row["calls"], 1),
+            "tabelas": cited,
+        })
+    return statements
+
+
+def _pg_stat_statements_available(connection: Connection) -> bool:
+    return connection.execute(text("SELECT to_regclass('pg_stat_statements') IS NOT NULL")).scalar()
+
+
+def advise(limit: int = DEFAULT_LIMIT) -> Dict[str, object]:
+    """
+    Monta o relatório; fora do Postgres só a parte de FKs é preenchida.
+    """
+    report = {
+        "banco": database.engine.dialect.name,
+        "fks_sem_indice": [],
+        "tabelas_com_seq_scan": [],
+        "consultas_candidatas": [],
+        "avisos": [],
+    }
+    with database.engine.connect() as connection:
+        report["fks_sem_indice"] = unindexed_foreign_keys(connection)
+        if connection.dialect.name != "postgresql":
+            report["avisos"].append("Estatísticas de uso só existem no Postgres (pg_stat_user_tables, pg_stat_statements)")
+            return report
+        report["tabelas_com_seq_scan"] = seq_scan_tables(connection, limit)
+        if not _pg_stat_statements_available(connection):
+            report["avisos"].append("pg_stat_statements não está instalada neste banco (CREATE EXTENSION pg_stat_statements)")
+            return report
+        try:
+            report["consultas_candidatas"] = expensive_statements(connection, limit)
+        except DBAPIError as e:
+            # Extensão criada mas não carregada em shared_preload_libraries, ou sem permissão
+            connection.rollback()
+            logger.warning(f"pg_stat_statements indisponível: {e.orig}")
+            report["avisos"].append(f"pg_stat_statements indisponível: {e.orig}")
+    logger.info(
+        f"Relatório de índices: {len(report['fks_sem_indice'])} FKs sem índice, "
+        f"{len(report['tabelas_com_seq_scan'])} tabelas com seq scan, "
+        f"{len(report['consultas_candidatas'])} consultas candidatas"
+    )
+    return report
+
+
+def _print_report(report: Dict[str, object]):
+    print(f"Banco: {report['banco']}")
+    print(f"\nFKs sem índice ({len(report['fks_sem_indice'])}):")
+    for fk in report["fks_sem_indice"]:
+        print(f"  {fk['tabela']}({', '.join(fk['colunas'])}) -> {fk['referencia']}")
+        print(f"    {fk['sugestao']}")
+    print(f"\nTabelas com mais seq scans que index scans ({len(report['tabelas_com_seq_scan'])}):")
+    for table in report["tabelas_com_seq_scan"]:
+        print(
+            f"  {table['tabela']}: {table['seq_scan']} seq scans (~{table['linhas_por_seq_scan']} linhas cada), "
+            f"{table['idx_scan']} index scans, {table['n_live_tup']} linhas"
+        )
+    print(f"\nConsultas com muitos blocos lidos por linha ({len(report['consultas_candidatas'])}):")
+    for statement in report["consultas_candidatas"]:
+        print(
+            f"  {statement['tempo_total_ms']} ms em {statement['chamadas']} chamadas, "
+            f"{statement['blocos_por_linha']} blocos/linha, tabelas: {', '.join(statement['tabelas']) or '-'}"
+        )
+        print(f"    {' '.join(statement['consulta'].split())[:200]}")
+    for aviso in report["avisos"]:
+        print(f"\nAviso: {aviso}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limite", type=int, default=DEFAULT_LIMIT, help="itens por seção das estatísticas")
+    parser.add_argument("--json", action="store_true", help="imprime o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    report = advise(args.limite)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    else:
+        _print_report(report)
+    # Código 1 quando há FK sem índice, para uso em CI
+    return 1 if report["fks_sem_indice"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
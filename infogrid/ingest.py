@@ -0,0 +1,239 @@
+"""
+Ingestão de registros de acesso com escrita adiada (write-behind): os registros recebidos
+em /registroacesso/ingest/ ficam num buffer em memória do worker e vão para o banco em um
+INSERT multi-linha por lote, com um único COMMIT (group commit), a cada
+ACCESS_INGEST_BATCH_SIZE registros ou ACCESS_INGEST_FLUSH_MS milissegundos.
+
+Durabilidade (ACCESS_INGEST_ACK, ou ?ack= por requisição):
+  - "flush": a resposta espera o commit do lote e traz o resultado do registro;
+  - "enqueue": responde 202 assim que o registro entra no buffer. Mais rápido, mas o que
+    estiver no buffer se perde se o processo morrer sem o shutdown (kill -9, OOM).
+"""
+import asyncio
+import logging
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from infogrid import database
+from infogrid.acl import acl_fields
+from infogrid.bulk import CREATED, EXISTS, INVALID, PARENT_NOT_FOUND
+from infogrid.changes import publish_changes
+from infogrid.database import settings
+from infogrid.models import RegistroAcesso, Usuario
+from infogrid.schemas import naive_utc
+from infogrid.upsert import _DIALECT_INSERTS
+
+logger = logging.getLogger("app_logger")
+
+ACK_FLUSH = "flush"
+ACK_ENQUEUE = "enqueue"
+ACK_MODES = (ACK_FLUSH, ACK_ENQUEUE)
+
+# Chave única de registros_acesso (ON CONFLICT DO NOTHING nela)
+KEY = ("usuario_id", "conjunto_dados", "data_solicitacao")
+
+
+class BufferFullError(Exception):
+    """
+    O buffer atingiu ACCESS_INGEST_MAX_PENDING (ou o worker está encerrando): o cliente deve tentar de novo.
+    """
+
+
+def _key(row: dict) -> tuple:
+    return tuple(row[field] for field in KEY)
+
+
+def insert_access_records(session: Session, rows: Sequence[dict]) -> List[dict]:
+    """
+    Grava um lote de registros de acesso numa transação: uma consulta para os usuários, um
+    INSERT ... ON CONFLICT DO NOTHING RETURNING e, só se houver conflitos, uma consulta para
+    os ids já existentes. Uma linha inválida não derruba o lote; o resultado de cada linha
+    volta na ordem recebida, com a linha gravada em "registro" quando criada.
+    """
+    table = RegistroAcesso.__table__
+    # Linhas que não passaram pelo schema (jobs, testes) também são normalizadas
+    rows = [{**row, "data_solicitacao": naive_utc(row["data_solicitacao"])} for row in rows]
+    lengths = {field: table.c[field].type.length for field in ("conjunto_dados", "status")}
+    results: List[dict] = [{"status": None, "id": None, "detalhe": None, "registro": None} for _ in rows]
+
+    candidates = []
+    for result, row in zip(results, rows):
+        too_long = [field for field, length in lengths.items() if row[field] is not None and len(row[field]) > length]
+        if too_long:
+            result.update(status=INVALID, detalhe=f"{too_long[0]} deve ter no máximo {lengths[too_long[0]]} caracteres")
+        else:
+            candidates.append((result, row))
+
+    usuario_ids = {row["usuario_id"] for _, row in candidates if row["usuario_id"] is not None}
+    existing_users = set(session.scalars(select(Usuario.id).where(Usuario.id.in_(usuario_ids)))) if usuario_ids else set()
+    to_insert = []
+    for result, row in candidates:
+        if row["usuario_id"] is not None and row["usuario_id"] not in existing_users:
+            result.update(status=PARENT_NOT_FOUND, detalhe=f"usuario_id {row['usuario_id']} não encontrado")
+        else:
+            to_insert.append((result, row))
+
+    if to_insert:
+        # Linhas em conflito não voltam no RETURNING: o casamento com a entrada é pela chave.
+        # Sem usuário a chave não é única (NULL), então a mesma chave pode voltar mais de uma vez.
+        insert = _DIALECT_INSERTS[session.get_bind().dialect.name]
+        key_columns = [table.c[field] for field in KEY]
+        stmt = insert(table).on_conflict_do_nothing(index_elements=key_columns).returning(*table.columns)
+        written = defaultdict(deque)
+        for found in session.execute(stmt, [row for _, row in to_insert]).mappings():
+            written[_key(found)].append(dict(found))
+        conflicts = []
+        for result, row in to_insert:
+            created = written.get(_key(row))
+            if created:
+                registro = created.popleft()
+                result.update(status=CREATED, id=registro["id"], registro=registro)
+            else:
+                conflicts.append((result, row))
+        if conflicts:
+            keys = list({_key(row) for _, row in conflicts})
+            existing = {tuple(found[:-1]): found[-1] for found in session.execute(select(*key_columns, table.c.id).where(tuple_(*key_columns).in_(keys)))}
+            for result, row in conflicts:
+                result.update(status=EXISTS, id=existing.get(_key(row)))
+    session.commit()
+
+    logger.info(f"Ingestão de registros de acesso: {sum(r['status'] == CREATED for r in results)} de {len(rows)} gravados")
+    return results
+
+
+class AccessWriteBuffer:
+    """
+    Buffer de escrita de registros de acesso de um worker, esvaziado por uma task do event loop.
+
+    Um lote sai quando junta `batch_size` registros ou quando o mais antigo completa
+    `flush_interval` segundos no buffer; os lotes são gravados um de cada vez, e o que chega durante
+    uma gravação forma o lote seguinte. Acima de `max_pending` registros (no buffer ou sendo
+    gravados) submit recusa com BufferFullError.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # (linha, Future de quem espera o commit, instante de chegada)
+        self._pending: List[Tuple[dict, Optional[asyncio.Future], float]] = []
+        self._in_flight = 0
+        self._closing = False
+        self._has_pending: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"recebidos": 0, "gravados": 0, "recusados": 0, "lotes": 0, "falhas": 0}
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._closing = False
+        self._has_pending = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """
+        Para de aceitar registros, grava tudo o que está no buffer e encerra a task.
+        """
+        if self._task is None:
+            return
+        self._closing = True
+        self._has_pending.set()
+        self._full.set()
+        await self._task
+        self._task = None
+        logger.info(f"Buffer de ingestão de registros de acesso encerrado: {self.stats()}")
+
+    def submit(self, row: dict, wait: bool) -> Optional[asyncio.Future]:
+        """
+        Coloca o registro no buffer. Com `wait`, devolve um Future resolvido com o resultado
+        da linha (ver insert_access_records) depois do commit do lote.
+        """
+        if self._task is None:
+            self.start()
+        elif self._task.done() and not self._closing:
+            logger.error("Task do buffer de ingestão encerrada inesperadamente; reiniciando", exc_info=self._task.exception())
+            self._task = None
+            self.start()
+        if self._closing or len(self._pending) + self._in_flight >= self.max_pending:
+            self._stats["recusados"] += 1
+            raise BufferFullError()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future() if wait else None
+        self._pending.append((row, future, loop.time()))
+        self._stats["recebidos"] += 1
+        self._has_pending.set()
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+        return future
+
+    async def _run(self):
+        while True:
+            await self._has_pending.wait()
+            if not self._pending:
+                if self._closing:
+                    return
+                self._has_pending.clear()
+                continue
+            batch = []
+            try:
+                if len(self._pending) < self.batch_size and not self._closing:
+                    self._full.clear()
+                    remaining = self._pending[0][2] + self.flush_interval - asyncio.get_running_loop().time()
+                    if remaining > 0:
+                        try:
+                            await asyncio.wait_for(self._full.wait(), remaining)
+                        except asyncio.TimeoutError:
+                            pass
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                self._in_flight = len(batch)
+                await self._flush(batch)
+            except Exception as error:
+                # Qualquer falha fora da gravação (abrir/fechar a sessão, avisos) fica neste lote:
+                # a task segue viva para os próximos e ninguém espera para sempre
+                self._fail(batch, error)
+            finally:
+                self._in_flight = 0
+
+    def _fail(self, batch: List[Tuple[dict, Optional[asyncio.Future], float]], error: Exception):
+        self._stats["falhas"] += 1
+        lost = sum(future is None for _, future, _ in batch)
+        logger.error(f"Falha ao gravar lote de {len(batch)} registros de acesso ({lost} já confirmados ao cliente foram perdidos)", exc_info=error)
+        for _, future, _ in batch:
+            if future is not None and not future.done():
+                future.set_exception(error)
+
+    async def _flush(self, batch: List[Tuple[dict, Optional[asyncio.Future], float]]):
+        rows = [row for row, _, _ in batch]
+        async with database.session_scope() as session:
+            try:
+                results = await session.run_sync(insert_access_records, rows)
+            except Exception as error:
+                self._fail(batch, error)
+                return
+            created = [result.pop("registro") for result in results if result["status"] == CREATED]
+            self._stats["lotes"] += 1
+            self._stats["gravados"] += len(created)
+            for (_, future, _), result in zip(batch, results):
+                if future is not None and not future.done():
+                    future.set_result(result)
+            if created:
+                try:
+                    await publish_changes(session, "registroacesso", [(registro["id"], None, acl_fields(registro)) for registro in created])
+                except Exception:
+                    logger.error("Lote de registros de acesso gravado, mas o aviso aos outros workers falhou", exc_info=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "pendentes": len(self._pending), "gravando": self._in_flight}
+
+
+access_write_buffer = AccessWriteBuffer(
+    batch_size=settings.ACCESS_INGEST_BATCH_SIZE,
+    flush_interval=settings.ACCESS_INGEST_FLUSH_MS / 1000,
+    max_pending=settings.ACCESS_INGEST_MAX_PENDING,
+)
@@ -0,0 +1,397 @@
+"""
+Importação em lote de schemas de tópicos Kafka (Avro e JSON Schema).
+
+Lê um diretório ou um arquivo .zip/.tar(.gz) em streaming, faz o parse e o achatamento
+dos schemas num pool de processos e grava TopicoKafka e ColunaTopicoKafka em lote com o
+upsert por chave natural (reimportar o mesmo export não duplica nada).
+
+Arquivos aceitos:
+  - *.avsc: schema Avro; o tópico é o nome do arquivo
+  - *.json: JSON Schema, schema Avro, ou um item do export do schema registry
+    ({"subject": "pedidos-value", "schemaType": "AVRO", "schema": "..."}), também em lista
+
+Records aninhados viram colunas com nomes pontuados (endereco.cidade); itens de arrays
+usam o sufixo [] (itens[].sku).
+
+    python -m infogrid.kafka_import export-registry.zip --workers 8
+"""
+import argparse
+import json
+import logging
+import os
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import PurePosixPath
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from infogrid import database
+from infogrid.changes import publish_changes_sync
+from infogrid.upsert import CREATED, UPDATED, changed_entities, upsert_rows
+
+logger = logging.getLogger("app_logger")
+
+SCHEMA_SUFFIXES = (".avsc", ".json")
+DEFAULT_WORKERS = os.cpu_count() or 2
+# Tópicos gravados por transação
+WRITE_BATCH_TOPICS = 500
+# Arquivos em voo no pool de processos (limita a memória ao ler arquivos grandes)
+MAX_IN_FLIGHT = 256
+
+NOME_MAX = 255
+TIPO_DADO_MAX = 50
+
+AVRO_PRIMITIVES = {"null", "boolean", "int", "long", "float", "double", "bytes", "string"}
+REGISTRY_SUFFIXES = ("-value", "-key")
+
+
+@dataclass
+class TopicSchema:
+    nome: str
+    descricao: Optional[str]
+    colunas: List[dict]  # {"nome", "tipo_dado", "descricao"}
+    origem: str
+
+
+@dataclass
+class ImportReport:
+    arquivos: int = 0
+    topicos: int = 0
+    topicos_criados: int = 0
+    colunas: int = 0
+    colunas_criadas: int = 0
+    colunas_atualizadas: int = 0
+    erros: List[dict] = field(default_factory=list)  # {"arquivo", "erro"}
+    duracao_s: float = 0.0
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data["duracao_s"] = round(self.duracao_s, 3)
+        return data
+
+
+# --- Achatamento -------------------------------------------------------------------------
+
+def _column(nome: str, tipo: str, descricao: Optional[str]) -> dict:
+    return {"nome": nome[:NOME_MAX], "tipo_dado": tipo[:TIPO_DADO_MAX], "descricao": descricao}
+
+
+class _AvroFlattener:
+    def __init__(self):
+        self.named = {}  # fullname -> schema, para referências a tipos já definidos
+        self.columns = []
+
+    def _register(self, schema: dict, namespace: Optional[str]):
+        name = schema.get("name")
+        if name:
+            namespace = schema.get("namespace", namespace)
+            fullname = name if "." in name or not namespace else f"{namespace}.{name}"
+            self.named[fullname] = schema
+            self.named.setdefault(name, schema)
+        return namespace
+
+    def _resolve(self, schema, namespace):
+        if isinstance(schema, str) and schema not in AVRO_PRIMITIVES:
+            return self.named.get(schema) or self.named.get(f"{namespace}.{schema}") or schema
+        return schema
+
+    def type_name(self, schema, namespace=None) -> str:
+        schema = self._resolve(schema, namespace)
+        if isinstance(schema, str):
+            return schema
+        if isinstance(schema, list):
+            branches = [self.type_name(branch, namespace) for branch in schema if branch != "null"]
+            return branches[0] if len(branches) == 1 else f"union<{','.join(branches)}>"
+        if schema.get("logicalType"):
+            return schema["logicalType"]
+        kind = schema.get("type")
+        if kind == "array":
+            return f"array<{self.type_name(schema.get('items'), namespace)}>"
+        if kind == "map":
+            return f"map<{self.type_name(schema.get('values'), namespace)}>"
+        if kind in ("record", "enum", "fixed"):
+            return kind
+        return self.type_name(kind, namespace)
+
+    def walk(self, schema, prefix: str, namespace: Optional[str], doc: Optional[str], stack: Tuple[str, ...]):
+        """
+        Emite a coluna do campo e desce em records (inclusive dentro de unions e arrays).
+        """
+        schema = self._resolve(schema, namespace)
+        if isinstance(schema, list):
+            non_null = [branch for branch in schema if branch != "null"]
+            if len(non_null) == 1:
+                return self.walk(non_null[0], prefix, namespace, doc, stack)
+        if isinstance(schema, dict) and schema.get("type") in ("record", "enum", "fixed"):
+            namespace = self._register(schema, namespace)
+        if prefix:
+            self.columns.append(_column(prefix, self.type_name(schema, namespace), doc))
+        if not isinstance(schema, dict):
+            return
+        if schema.get("type") == "record":
+            self._fields(schema, prefix, namespace, stack)
+        elif schema.get("type") == "array":
+            items = self._resolve(schema.get("items"), namespace)
+            if isinstance(items, dict) and items.get("type") == "record":
+                self._fields(items, f"{prefix}[]", self._register(items, namespace), stack)
+
+    def _fields(self, record: dict, prefix: str, namespace: Optional[str], stack: Tuple[str, ...]):
+        name = record.get("name", "")
+        if name in stack:  # tipo recursivo: não desce de novo
+            return
+        for avro_field in record.get("fields", []):
+            child = f"{prefix}.{avro_field['name']}" if prefix else avro_field["name"]
+            self.walk(avro_field["type"], child, namespace, avro_field.get("doc"), stack + (name,))
+
+
+def flatten_avro(schema) -> Tuple[Optional[str], List[dict]]:
+    flattener = _AvroFlattener()
+    if isinstance(schema, dict) and schema.get("type") == "record":
+        flattener.walk(schema, "", None, None, ())
+        return schema.get("doc"), flattener.columns
+    flattener.walk(schema, "value", None, None, ())
+    return None, flattener.columns
+
+
+def _json_type(schema: dict) -> str:
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kinds = [k for k in kind if k != "null"]
+        kind = kinds[0] if len(kinds) == 1 else "|".join(kinds)
+    if kind == "string" and schema.get("format"):
+        return schema["format"]
+    if kind is None:
+        if "enum" in schema:
+            return "enum"
+        if "properties" in schema:
+            return "object"
+        if any(key in schema for key in ("oneOf", "anyOf", "allOf")):
+            return "union"
+        return "any"
+    return kind
+
+
+def flatten_json_schema(schema: dict) -> Tuple[Optional[str], List[dict]]:
+    definitions = {**schema.get("definitions", {}), **schema.get("$defs", {})}
+    columns = []
+
+    def resolve(node: dict, seen: Tuple[str, ...]):
+        ref = node.get("$ref")
+        if not ref or not ref.startswith("#/"):
+            return node, seen
+        name = ref.rsplit("/", 1)[-1]
+        if name in seen or name not in definitions:
+            return {"type": "object"}, seen
+        return resolve(definitions[name], seen + (name,))
+
+    def walk(node: dict, prefix: str, seen: Tuple[str, ...]):
+        node, seen = resolve(node, seen)
+        for key in ("oneOf", "anyOf"):
+            # nullable: {"anyOf": [{"type": "null"}, {...}]}
+            branches = [branch for branch in node.get(key, []) if branch.get("type") != "null"]
+            if len(branches) == 1:
+                return walk({**branches[0], "description": node.get("description", branches[0].get("description"))}, prefix, seen)
+        kind = _json_type(node)
+        if kind == "array":
+            items, _ = resolve(node.get("items", {}), seen)
+            columns.append(_column(prefix, f"array<{_json_type(items)}>", node.get("description")))
+            if "properties" in items:
+                for name, child in items["properties"].items():
+                    walk(child, f"{prefix}[].{name}", seen)
+            return
+        if prefix:
+            columns.append(_column(prefix, kind, node.get("description")))
+        for name, child in node.get("properties", {}).items():
+            walk(child, f"{prefix}.{name}" if prefix else name, seen)
+
+    walk(schema, "", ())
+    return schema.get("description"), columns
+
+
+def _is_avro(schema) -> bool:
+    if isinstance(schema, (list, str)):
+        return True
+    return schema.get("type") in ("record", "enum", "fixed", "array", "map") and "properties" not in schema and "$schema" not in schema
+
+
+def _topic_name(path: str, subject: Optional[str] = None) -> str:
+    if subject:
+        for suffix in REGISTRY_SUFFIXES:
+            if subject.endswith(suffix):
+                return subject[: -len(suffix)]
+        return subject
+    return PurePosixPath(path).stem
+
+
+def parse_schema_file(path: str, content: bytes) -> List[TopicSchema]:
+    """
+    Parse de um arquivo (roda nos processos do pool). Um arquivo pode trazer vários tópicos
+    quando é um export do schema registry em lista.
+    """
+    document = json.loads(content)
+    entries = document if isinstance(document, list) and document and isinstance(document[0], dict) and "subject" in document[0] else [document]
+
+    topics = []
+    for entry in entries:
+        subject, schema_type, schema = None, None, entry
+        if isinstance(entry, dict) and "subject" in entry and "schema" in entry:
+            subject, schema_type = entry["subject"], entry.get("schemaType", "AVRO")
+            schema = json.loads(entry["schema"]) if isinstance(entry["schema"], str) else entry["schema"]
+        if subject and subject.endswith("-key"):
+            continue  # colunas do catálogo descrevem o valor das mensagens
+        if schema_type == "PROTOBUF":
+            raise ValueError(f"schemaType PROTOBUF não suportado ({subject})")
+        use_avro = schema_type == "AVRO" if schema_type else (path.endswith(".avsc") or _is_avro(schema))
+        descricao, colunas = flatten_avro(schema) if use_avro else flatten_json_schema(schema)
+        topics.append(TopicSchema(nome=_topic_name(path, subject)[:NOME_MAX], descricao=descricao, colunas=colunas, origem=path))
+    return topics
+
+
+def _parse_safely(item: Tuple[str, bytes]):
+    path, content = item
+    try:
+        return path, parse_schema_file(path, content), None
+    except Exception as e:
+        return path, [], f"{type(e).__name__}: {e}"
+
+
+# --- Leitura em streaming ----------------------------------------------------------------
+
+def iter_schema_files(source: str) -> Iterator[Tuple[str, bytes]]:
+    """
+    (caminho, conteúdo) de cada schema de um diretório (recursivo) ou de um .zip/.tar(.gz),
+    lidos um a um.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(SCHEMA_SUFFIXES):
+                    path = os.path.join(root, name)
+                    with open(path, "rb") as f:
+                        yield os.path.relpath(path, source), f.read()
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.endswith(SCHEMA_SUFFIXES):
+                    yield info.filename, archive.read(info)
+    elif tarfile.is_tarfile(source):
+        with tarfile.open(source, "r:*") as archive:
+            for member in archive:
+                if member.isfile() and member.name.endswith(SCHEMA_SUFFIXES):
+                    yield member.name, archive.extractfile(member).read()
+    else:
+        raise ValueError(f"{source} não é um diretório nem um arquivo .zip/.tar")
+
+
+def _parsed(files: Iterator[Tuple[str, bytes]], workers: int):
+    """
+    Parse no pool de processos mantendo no máximo MAX_IN_FLIGHT arquivos em memória.
+    Com workers <= 1 o parse roda no próprio processo.
+    """
+    if workers <= 1:
+        for item in files:
+            yield _parse_safely(item)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for item in files:
+            pending.append(executor.submit(_parse_safely, item))
+            if len(pending) >= MAX_IN_FLIGHT:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+# --- Escrita -----------------------------------------------------------------------------
+
+def write_topics(session: Session, topics: List[TopicSchema], report: ImportReport):
+    """
+    Grava um lote de tópicos numa transação: upsert dos tópicos (criando os que faltam) e
+    depois das colunas, por (topico_kafka_id, nome).
+    """
+    topic_rows = []
+    for topic in topics:
+        row = {"nome": topic.nome}
+        if topic.descricao:
+            row["descricao"] = topic.descricao
+        topic_rows.append(row)
+    topic_results = upsert_rows(session, "topicokafka", topic_rows, commit=False)
+
+    column_rows = []
+    for topic, result in zip(topics, topic_results):
+        for column in topic.colunas:
+            row = {"topico_kafka_id": result["id"], "nome": column["nome"], "tipo_dado": column["tipo_dado"]}
+            if column["descricao"]:
+                row["descricao"] = column["descricao"]
+            column_rows.append(row)
+    column_results = upsert_rows(session, "colunatopicokafka", column_rows, commit=False) if column_rows else []
+    session.commit()
+
+    report.topicos += len(topics)
+    report.topicos_criados += sum(r["status"] == CREATED for r in topic_results)
+    report.colunas += len(column_rows)
+    report.colunas_criadas += sum(r["status"] == CREATED for r in column_results)
+    report.colunas_atualizadas += sum(r["status"] == UPDATED for r in column_results)
+
+    for tipo, rows, results in (("topicokafka", topic_rows, topic_results), ("colunatopicokafka", column_rows, column_results)):
+        changed = changed_entities(rows, results)
+        if changed:
+            publish_changes_sync(session, tipo, changed)
+
+
+def import_schemas(source: str, workers: int = DEFAULT_WORKERS, batch_topics: int = WRITE_BATCH_TOPICS) -> ImportReport:
+    started = time.perf_counter()
+    report = ImportReport()
+    batch: List[TopicSchema] = []
+    with Session(database.engine, expire_on_commit=False) as session:
+        for path, topics, error in _parsed(iter_schema_files(source), workers):
+            report.arquivos += 1
+            if error:
+                report.erros.append({"arquivo": path, "erro": error})
+                logger.warning(f"Schema ignorado: {path}: {error}")
+                continue
+            batch.extend(topics)
+            if len(batch) >= batch_topics:
+                write_topics(session, batch, report)
+                logger.info(f"Importação de schemas: {report.arquivos} arquivos, {report.topicos} tópicos gravados")
+                batch = []
+        if batch:
+            write_topics(session, batch, report)
+
+    report.duracao_s = time.perf_counter() - started
+    logger.info(
+        f"Importação de schemas concluída em {report.duracao_s:.2f}s: {report.topicos} tópicos "
+        f"({report.topicos_criados} novos), {report.colunas} colunas, {len(report.erros)} erros"
+    )
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="diretório ou arquivo .zip/.tar(.gz) com os schemas")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="processos de parse (1 = sem pool)")
+    parser.add_argument("--batch", type=int, default=WRITE_BATCH_TOPICS, help="tópicos gravados por transação")
+    parser.add_argument("--json", action="store_true", help="imprime o relatório completo em JSON")
+    args = parser.parse_args(argv)
+
+    report = import_schemas(args.source, args.workers, args.batch)
+    if args.json:
+        print(json.dumps(report.as_dict(), indent=2, ensure_ascii=False))
+    else:
+        print(
+            f"{report.arquivos} arquivos, {report.topicos} tópicos ({report.topicos_criados} novos), "
+            f"{report.colunas} colunas ({report.colunas_criadas} novas, {report.colunas_atualizadas} atualizadas) "
+            f"em {report.duracao_s:.2f}s; {len(report.erros)} erros"
+        )
+        for erro in report.erros:
+            print(f"  {erro['arquivo']}: {erro['erro']}")
+    return 1 if report.erros else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,6 @@
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Table, Text
+from sqlalchemy import DDL, JSON, Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Table, Text, UniqueConstraint, event, text
 from sqlalchemy.orm import registry, relationship
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.dialects.postgresql import JSONB
 
 
 table_registry = registry()
@@ -10,26 +10,33 @@ table_registry = registry()
 Base = table_registry.generate_base()
 
 
-# Relacionamentos Muitos-para-Muitos
+# FKs DEFERRABLE INITIALLY IMMEDIATE: checadas a cada comando, exceto quando a transação
+# pede SET CONSTRAINTS ALL DEFERRED (importação de snapshot, infogrid/snapshot.py)
+
+# Relacionamentos Muitos-para-Muitos (ON DELETE CASCADE: apagar um dos lados apaga a associação).
+# A PK começa por responsavel_id; o índice (alvo_id, responsavel_id) atende o lado reverso.
 responsaveis_databases = Table(
     'responsaveis_databases',
     Base.metadata,
-    Column('responsavel_id', Integer, ForeignKey('responsaveis.id'), primary_key=True),
-    Column('database_id', Integer, ForeignKey('databases.id'), primary_key=True),
+    Column('responsavel_id', Integer, ForeignKey('responsaveis.id', ondelete='CASCADE', deferrable=True, initially='IMMEDIATE'), primary_key=True),
+    Column('database_id', Integer, ForeignKey('databases.id', ondelete='CASCADE', deferrable=True, initially='IMMEDIATE'), primary_key=True),
+    Index('ix_responsaveis_databases_database_id', 'database_id', 'responsavel_id'),
 )
 
 responsaveis_tabelas = Table(
     'responsaveis_tabelas',
     Base.metadata,
-    Column('responsavel_id', Integer, ForeignKey('responsaveis.id'), primary_key=True),
-    Column('tabela_id', Integer, ForeignKey('tabelas.id'), primary_key=True),
+    Column('responsavel_id', Integer, ForeignKey('responsaveis.id', ondelete='CASCADE', deferrable=True, initially='IMMEDIATE'), primary_key=True),
+    Column('tabela_id', Integer, ForeignKey('tabelas.id', ondelete='CASCADE', deferrable=True, initially='IMMEDIATE'), primary_key=True),
+    Index('ix_responsaveis_tabelas_tabela_id', 'tabela_id', 'responsavel_id'),
 )
 
 responsaveis_topicos_kafka = Table(
     'responsaveis_topicos_kafka',
     Base.metadata,
-    Column('responsavel_id', Integer, ForeignKey('responsaveis.id'), primary_key=True),
-    Column('topico_kafka_id', Integer, ForeignKey('topicos_kafka.id'), primary_key=True),
+    Column('responsavel_id', Integer, ForeignKey('responsaveis.id', ondelete='CASCADE', deferrable=True, initially='IMMEDIATE'), primary_key=True),
+    Column('topico_kafka_id', Integer, ForeignKey('topicos_kafka.id', ondelete='CASCADE', deferrable=True, initially='IMMEDIATE'), primary_key=True),
+    Index('ix_responsaveis_topicos_kafka_topico_kafka_id', 'topico_kafka_id', 'responsavel_id'),
 )
 
 
@@ -77,14 +84,17 @@ class Database(Base):
 # Model Tabela
 class Tabela(Base):
     __tablename__ = 'tabelas'
+    __table_args__ = (UniqueConstraint('database_id', 'nome', name='uq_tabelas_database_id_nome'),)
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     nome = Column(String(255), nullable=False)
     descricao = Column(Text, nullable=True)
-    database_id = Column(Integer, ForeignKey('databases.id'))
+    database_id = Column(Integer, ForeignKey('databases.id', deferrable=True, initially='IMMEDIATE'))
     estado_atual = Column(String(50), nullable=True)
     qualidade = Column(String(50), nullable=True)
     conformidade = Column(Boolean, nullable=True)
+    # Hash do último snapshot coletado (infogrid/schema_sync.py); NULL força a comparação das colunas
+    fingerprint = Column(String(64), nullable=True)
 
     responsaveis = relationship(
         'Responsavel', secondary=responsaveis_tabelas, back_populates="tabelas"
@@ -94,17 +104,37 @@ class Tabela(Base):
 # Model Coluna
 class Coluna(Base):
     __tablename__ = 'colunas'
+    __table_args__ = (UniqueConstraint('tabela_id', 'nome', name='uq_colunas_tabela_id_nome'),)
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     nome = Column(String(255), nullable=False)
     tipo_dado = Column(String(50), nullable=False)
     descricao = Column(Text, nullable=True)
-    tabela_id = Column(Integer, ForeignKey('tabelas.id'))
+    tabela_id = Column(Integer, ForeignKey('tabelas.id', deferrable=True, initially='IMMEDIATE'))
+
+
+# Escritas em colunas limpam o fingerprint da tabela. No Postgres, por triggers por comando
+# (migration 3e8b61f0a2c5); no SQLite, que não tem transition tables, pelos triggers por linha abaixo.
+for _event, _tabela_ids in (
+    ('INSERT', 'NEW.tabela_id'),
+    ('UPDATE', 'OLD.tabela_id, NEW.tabela_id'),
+    ('DELETE', 'OLD.tabela_id'),
+):
+    event.listen(
+        Base.metadata,
+        'after_create',
+        DDL(
+            f"CREATE TRIGGER IF NOT EXISTS colunas_limpar_fingerprint_{_event.lower()} "
+            f"AFTER {_event} ON colunas BEGIN "
+            f"UPDATE tabelas SET fingerprint = NULL WHERE fingerprint IS NOT NULL AND id IN ({_tabela_ids}); END"
+        ).execute_if(dialect='sqlite'),
+    )
 
 
 # Model TopicoKafka
 class TopicoKafka(Base):
     __tablename__ = 'topicos_kafka'
+    __table_args__ = (UniqueConstraint('nome', name='uq_topicos_kafka_nome'),)
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     nome = Column(String(255), nullable=False)
@@ -120,12 +150,13 @@ class TopicoKafka(Base):
 # Model ColunaTopicoKafka
 class ColunaTopicoKafka(Base):
     __tablename__ = 'colunas_topicos_kafka'
+    __table_args__ = (UniqueConstraint('topico_kafka_id', 'nome', name='uq_colunas_topicos_kafka_topico_kafka_id_nome'),)
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     nome = Column(String(255), nullable=False)
     tipo_dado = Column(String(50), nullable=False)
     descricao = Column(Text, nullable=True)
-    topico_kafka_id = Column(Integer, ForeignKey('topicos_kafka.id'))
+    topico_kafka_id = Column(Integer, ForeignKey('topicos_kafka.id', deferrable=True, initially='IMMEDIATE'))
 
 
 # Model Usuario
@@ -140,13 +171,80 @@ class Usuario(Base):
 
 
 # Model RegistroAcesso
+# No Postgres a tabela é particionada por mês em data_solicitacao (migration f2c8a4d6e913,
+# manutenção em infogrid/partitions.py) e a PK é (id, data_solicitacao); aqui o mapeamento
+# mantém só id, que continua único (sequence), para o ORM e para o SQLite de desenvolvimento.
 class RegistroAcesso(Base):
     __tablename__ = 'registros_acesso'
+    __table_args__ = (
+        UniqueConstraint('usuario_id', 'conjunto_dados', 'data_solicitacao', name='uq_registros_acesso_usuario_id_conjunto_dados_data_solicitacao'),
+        # Paginação por keyset em (order_by, id)
+        Index('ix_registros_acesso_data_solicitacao_id', 'data_solicitacao', 'id'),
+        Index('ix_registros_acesso_conjunto_dados_id', 'conjunto_dados', 'id'),
+        # Consultas por permissão com @> (contém), em /registroacesso/busca/
+        Index(
+            'ix_registros_acesso_permissoes_concedidas', 'permissoes_concedidas',
+            postgresql_using='gin', postgresql_ops={'permissoes_concedidas': 'jsonb_path_ops'},
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    usuario_id = Column(Integer, ForeignKey('usuarios.id'))
+    usuario_id = Column(Integer, ForeignKey('usuarios.id', deferrable=True, initially='IMMEDIATE'))
     conjunto_dados = Column(String(255), nullable=False)
     data_solicitacao = Column(DateTime, nullable=False)
     finalidade_uso = Column(Text, nullable=False)
-    permissoes_concedidas = Column(JSON, nullable=True)  # Change to JSON
-    status = Column(String(50), nullable=True)
\ No newline at end of file
+    # JSONB no Postgres (indexável com GIN); JSON no SQLite de desenvolvimento
+    permissoes_concedidas = Column(JSONB().with_variant(JSON(), 'sqlite'), nullable=False, server_default=text("'[]'"))
+    status = Column(String(50), nullable=True)
+
+
+# Agregados de registros_acesso (infogrid/rollups.py): contagens por período de data_solicitacao,
+# conjunto_dados, usuario_id (0 = sem usuário) e status ('' = sem status). No Postgres são mantidos
+# por triggers por comando (migration c5e1b8d3f027); no SQLite, pelos triggers por linha abaixo.
+def _rollup_table(name: str) -> Table:
+    return Table(
+        name,
+        Base.metadata,
+        Column('periodo', DateTime, primary_key=True),  # início da hora ou do dia
+        Column('conjunto_dados', String(255), primary_key=True),
+        Column('usuario_id', Integer, primary_key=True, autoincrement=False),
+        Column('status', String(50), primary_key=True),
+        Column('quantidade', Integer, nullable=False),
+        Index(f'ix_{name}_conjunto_dados_periodo', 'conjunto_dados', 'periodo'),
+    )
+
+
+registros_acesso_por_hora = _rollup_table('registros_acesso_por_hora')
+registros_acesso_por_dia = _rollup_table('registros_acesso_por_dia')
+
+# Mesmo formato texto que o SQLAlchemy usa para DateTime no SQLite, para as comparações baterem
+SQLITE_ROLLUP_PERIODS = {
+    'registros_acesso_por_hora': '%Y-%m-%d %H:00:00.000000',
+    'registros_acesso_por_dia': '%Y-%m-%d 00:00:00.000000',
+}
+
+
+def _sqlite_rollup_upserts(row: str, delta: int) -> str:
+    return "".join(
+        f"INSERT INTO {table} (periodo, conjunto_dados, usuario_id, status, quantidade) "
+        f"VALUES (strftime('{period}', {row}.data_solicitacao), {row}.conjunto_dados, "
+        f"coalesce({row}.usuario_id, 0), coalesce({row}.status, ''), {delta}) "
+        f"ON CONFLICT (periodo, conjunto_dados, usuario_id, status) "
+        f"DO UPDATE SET quantidade = quantidade + excluded.quantidade; "
+        for table, period in SQLITE_ROLLUP_PERIODS.items()
+    )
+
+
+for _event, _body in (
+    ('INSERT', _sqlite_rollup_upserts('NEW', 1)),
+    ('UPDATE', _sqlite_rollup_upserts('OLD', -1) + _sqlite_rollup_upserts('NEW', 1)),
+    ('DELETE', _sqlite_rollup_upserts('OLD', -1)),
+):
+    event.listen(
+        Base.metadata,
+        'after_create',
+        DDL(
+            f"CREATE TRIGGER IF NOT EXISTS registros_acesso_rollup_{_event.lower()} "
+            f"AFTER {_event} ON registros_acesso BEGIN {_body}END".replace('%', '%%')  # DDL formata com %
+        ).execute_if(dialect='sqlite'),
+    )
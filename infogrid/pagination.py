@@ -0,0 +1,84 @@
+import base64
+import json
+import logging
+from datetime import date, datetime
+from http import HTTPStatus
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Select, tuple_
+
+logger = logging.getLogger("app_logger")
+
+# Header com o cursor opaco da próxima página (ausente na última página)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(order_by: Optional[str], value, last_id: int) -> str:
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    payload = json.dumps({"o": order_by, "v": value, "id": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        int(data["id"])
+        return data
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Cursor inválido")
+
+
+def paginate(
+    stmt: Select,
+    model,
+    limit: int,
+    cursor: Optional[str] = None,
+    order_by: Optional[str] = None,
+    skip: Optional[int] = None,
+    sortable: Sequence[str] = ("nome",),
+) -> Select:
+    """
+    Aplica paginação por keyset em (order_by, id) — ou só em id — ao select.
+
+    `skip` (LIMIT/OFFSET) continua aceito apenas como fallback depreciado; em ambos os
+    casos a ordenação é explícita, então linhas não se repetem nem somem entre páginas.
+    """
+    if order_by is not None and order_by not in sortable:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"order_by deve ser um de: {', '.join(sortable)}")
+
+    sort_column = getattr(model, order_by) if order_by else None
+    if cursor is not None:
+        data = decode_cursor(cursor)
+        if data.get("o") != order_by:
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Cursor gerado para outra ordenação")
+        if sort_column is None:
+            stmt = stmt.where(model.id > data["id"])
+        else:
+            value = data["v"]
+            if sort_column.type.python_type is datetime and isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            stmt = stmt.where(tuple_(sort_column, model.id) > tuple_(value, data["id"]))
+    elif skip:
+        logger.warning("Paginação por offset (skip) está depreciada; use o cursor de X-Next-Cursor")
+        stmt = stmt.offset(skip)
+
+    if sort_column is not None:
+        stmt = stmt.order_by(sort_column, model.id)
+    else:
+        stmt = stmt.order_by(model.id)
+    return stmt.limit(limit)
+
+
+def set_next_cursor(response: Response, items: Sequence, limit: int, order_by: Optional[str] = None) -> Optional[str]:
+    """
+    Publica em X-Next-Cursor o cursor que continua a partir do último item da página.
+    """
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    cursor = encode_cursor(order_by, getattr(last, order_by) if order_by else None, last.id)
+    response.headers[NEXT_CURSOR_HEADER] = cursor
+    return cursor
@@ -0,0 +1,216 @@
+"""
+Manutenção das partições mensais de registros_acesso (Postgres).
+
+A tabela é particionada por RANGE de data_solicitacao, uma partição por mês
+(registros_acesso_pAAAA_MM), mais a partição DEFAULT registros_acesso_padrao para datas
+fora das partições existentes. O job:
+  - cria as partições dos próximos meses, para que os INSERTs não caiam na DEFAULT;
+  - desanexa as partições mais antigas que a retenção, grava cada uma num CSV comprimido
+    (gzip) e só então apaga a tabela. Partições desanexadas numa execução interrompida
+    são arquivadas na execução seguinte. Concessões de registros arquivados deixam de valer:
+    o job pede aos workers que recarreguem o índice de permissões (infogrid/acl.py).
+
+Feito para rodar periodicamente (cron / CronJob), por exemplo uma vez por dia:
+
+    python -m infogrid.partitions
+    python -m infogrid.partitions --retencao 12 --meses-a-frente 3 --destino /backup/registros_acesso
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import re
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from infogrid import database
+from infogrid.changes import publish_reload_sync
+
+logger = logging.getLogger("app_logger")
+
+PARTITIONED_TABLE = "registros_acesso"
+PARTITION_NAME = re.compile(rf"^{PARTITIONED_TABLE}_p(\d{{4}})_(\d{{2}})$")
+
+# Linhas lidas por vez no arquivamento sem COPY (drivers que não são psycopg2)
+ARCHIVE_BATCH_SIZE = 10_000
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITIONED_TABLE}_p{month:%Y_%m}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    match = PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def months_to_create(existing: Iterable[date], today: date, ahead: int) -> List[date]:
+    """
+    Meses do atual até `ahead` à frente que ainda não têm partição.
+    """
+    current = today.replace(day=1)
+    existing = set(existing)
+    return [month for month in (add_months(current, i) for i in range(ahead + 1)) if month not in existing]
+
+
+def months_to_archive(existing: Iterable[date], today: date, retention_months: int) -> List[date]:
+    """
+    Meses inteiramente anteriores à janela de retenção (o mês atual conta como o primeiro).
+    """
+    cutoff = add_months(today.replace(day=1), -(retention_months - 1))
+    return sorted(month for month in existing if month < cutoff)
+
+
+def _partitions(connection: Connection) -> Tuple[List[str], List[str]]:
+    """
+    (anexadas, desanexadas): partições mensais ainda ligadas à tabela e tabelas
+    registros_acesso_pAAAA_MM soltas (desanexadas e ainda não arquivadas).
+    """
+    attached = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(:table)"
+    ), {"table": PARTITIONED_TABLE}).scalars().all()
+    tables = connection.execute(text(
+        "SELECT relname FROM pg_class WHERE relkind = 'r' AND relnamespace = current_schema()::regnamespace "
+        "AND relname LIKE :pattern"
+    ), {"pattern": f"{PARTITIONED_TABLE}\\_p%"}).scalars().all()
+    attached = [name for name in attached if partition_month(name)]
+    detached = [name for name in tables if partition_month(name) and name not in attached]
+    return attached, detached
+
+
+def create_partition(connection: Connection, month: date):
+    following = add_months(month, 1)
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {PARTITIONED_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+    ))
+
+
+def _copy_to(connection: Connection, table: str, out) -> int:
+    """
+    Grava a tabela em CSV com cabeçalho em `out` (binário); devolve o número de linhas.
+    """
+    if connection.dialect.driver == "psycopg2":
+        with connection.connection.driver_connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} TO STDOUT WITH (FORMAT csv, HEADER)", out)
+            cursor.execute(f"SELECT count(*) FROM {table}")
+            return cursor.fetchone()[0]
+    stmt = text(f"SELECT * FROM {table} ORDER BY id").execution_options(yield_per=ARCHIVE_BATCH_SIZE)
+    result = connection.execute(stmt)
+    wrapper = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    writer = csv.writer(wrapper)
+    writer.writerow(result.keys())
+    count = 0
+    for rows in result.partitions(ARCHIVE_BATCH_SIZE):
+        writer.writerows([json.dumps(value) if isinstance(value, (list, dict)) else value for value in row] for row in rows)
+        count += len(rows)
+    # detach para que o wrapper não feche o arquivo comprimido
+    wrapper.flush()
+    wrapper.detach()
+    return count
+
+
+def archive_partition(connection: Connection, name: str, archive_dir: str) -> Dict[str, object]:
+    """
+    Exporta uma partição já desanexada para <archive_dir>/<nome>.csv.gz e apaga a tabela.
+    O arquivo é escrito com outro nome e renomeado no fim: um .csv.gz existente está completo.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    partial = f"{path}.parcial"
+    with open(partial, "wb") as raw_file:
+        with gzip.GzipFile(fileobj=raw_file, mode="wb") as out:
+            rows = _copy_to(connection, name, out)
+        raw_file.flush()
+        os.fsync(raw_file.fileno())
+    os.replace(partial, path)
+    connection.execute(text(f"DROP TABLE {name}"))
+    connection.commit()
+    logger.info(f"Partição {name} arquivada em {path} ({rows} linhas)")
+    return {"particao": name, "linhas": rows, "arquivo": path}
+
+
+def maintain_partitions(
+    today: Optional[date] = None,
+    retention_months: Optional[int] = None,
+    months_ahead: Optional[int] = None,
+    archive_dir: Optional[str] = None,
+) -> Dict[str, object]:
+    """
+    Cria as partições futuras e arquiva as que saíram da retenção. Fora do Postgres
+    (registros_acesso não é particionada) não faz nada.
+    """
+    settings = database.settings
+    today = today or date.today()
+    retention_months = retention_months or settings.ACCESS_LOG_RETENTION_MONTHS
+    months_ahead = settings.ACCESS_LOG_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    archive_dir = archive_dir or settings.ACCESS_LOG_ARCHIVE_DIR
+    report = {"criadas": [], "arquivadas": []}
+
+    if database.engine.dialect.name != "postgresql":
+        logger.info("Manutenção de partições ignorada: só o Postgres particiona registros_acesso")
+        return report
+
+    with database.engine.connect() as connection:
+        attached, detached = _partitions(connection)
+        existing = [partition_month(name) for name in attached]
+
+        for month in months_to_create(existing, today, months_ahead):
+            # Falha se a DEFAULT já tiver linhas desse mês: elas precisam ser movidas antes
+            create_partition(connection, month)
+            connection.commit()
+            report["criadas"].append(partition_name(month))
+            logger.info(f"Partição {partition_name(month)} criada")
+
+        for month in months_to_archive(existing, today, retention_months):
+            name = partition_name(month)
+            connection.execute(text(f"ALTER TABLE {PARTITIONED_TABLE} DETACH PARTITION {name}"))
+            connection.commit()
+            detached.append(name)
+
+        try:
+            for name in sorted(detached):
+                report["arquivadas"].append(archive_partition(connection, name, archive_dir))
+        finally:
+            if detached:
+                # Os registros desanexados saíram de registros_acesso: os workers recarregam o
+                # índice de permissões (e invalidam o cache) em vez de manter as concessões antigas
+                with Session(database.engine) as session:
+                    publish_reload_sync(session)
+    return report
+
+
+def main(argv=None):
+    settings = database.settings
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retencao", type=int, default=settings.ACCESS_LOG_RETENTION_MONTHS, help="meses mantidos no banco")
+    parser.add_argument("--meses-a-frente", type=int, default=settings.ACCESS_LOG_PARTITIONS_AHEAD, help="partições futuras criadas")
+    parser.add_argument("--destino", default=settings.ACCESS_LOG_ARCHIVE_DIR, help="diretório dos arquivos .csv.gz")
+    args = parser.parse_args(argv)
+    if args.retencao < 1:
+        parser.error("--retencao deve ser ao menos 1 (o mês atual)")
+
+    report = maintain_partitions(retention_months=args.retencao, months_ahead=args.meses_a_frente, archive_dir=args.destino)
+    for name in report["criadas"]:
+        print(f"criada: {name}")
+    for archived in report["arquivadas"]:
+        print(f"arquivada: {archived['particao']} ({archived['linhas']} linhas) -> {archived['arquivo']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,121 @@
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolMetrics:
+    """
+    Contadores acumulados de checkout do pool (esperas, timeouts e latência).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.waits = 0
+            self.timeouts = 0
+            self.checkout_time_total = 0.0
+            self.checkout_time_max = 0.0
+
+    def record(self, elapsed: float, waited: bool, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.checkout_time_total += elapsed
+                self.checkout_time_max = max(self.checkout_time_max, elapsed)
+            if waited:
+                self.waits += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "checkout_ms_avg": round(self.checkout_time_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "checkout_ms_max": round(self.checkout_time_max * 1000, 3),
+            }
+
+
+class _InstrumentedPoolMixin:
+    """
+    Mede o tempo de cada checkout e conta quantas vezes o pool estava esgotado.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _exhausted(self) -> bool:
+        if self._max_overflow < 0:
+            return False
+        return self.checkedin() == 0 and self.checkedout() >= self.size() + self._max_overflow
+
+    def _do_get(self):
+        waited = self._exhausted()
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record(time.perf_counter() - start, waited, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start, waited)
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(settings, is_async: bool = False) -> dict:
+    """
+    Parâmetros do pool para create_engine/create_async_engine a partir de Settings.
+
+    SQLite usa seus próprios pools (SingletonThreadPool/StaticPool), então só recebe pre_ping.
+    """
+    if settings.DATABASE_URL.startswith("sqlite"):
+        return {"pool_pre_ping": settings.DATABASE_POOL_PRE_PING}
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+    }
+
+
+def pool_stats(pool) -> dict:
+    """
+    Estado atual do pool (conexões em uso, overflow) mais as métricas acumuladas.
+    """
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update(metrics.snapshot())
+    return stats
@@ -0,0 +1,127 @@
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from infogrid.crud import is_foreign_key_violation
+from infogrid.models import (
+    Database,
+    Responsavel,
+    Tabela,
+    TopicoKafka,
+    responsaveis_databases,
+    responsaveis_tabelas,
+    responsaveis_topicos_kafka,
+)
+from infogrid.upsert import _DIALECT_INSERTS
+
+logger = logging.getLogger("app_logger")
+
+# Pares por chamada de /batch (2 parâmetros por par num único statement)
+BATCH_MAX_PAIRS = 5000
+
+# Tentativas de add_pairs quando um responsável ou alvo é excluído durante a associação
+ADD_PAIRS_ATTEMPTS = 3
+
+# nome da associação -> (tabela, coluna do alvo, model do alvo, tipo publicado em changes)
+RELATIONSHIP_TARGETS = {
+    "responsaveis_databases": (responsaveis_databases, "database_id", Database, "database"),
+    "responsaveis_tabelas": (responsaveis_tabelas, "tabela_id", Tabela, "tabela"),
+    "responsaveis_topicos_kafka": (responsaveis_topicos_kafka, "topico_kafka_id", TopicoKafka, "topicokafka"),
+}
+
+Pair = Tuple[int, int]
+
+
+def _unique(pairs: Sequence[Pair]) -> List[Pair]:
+    return list(dict.fromkeys(pairs))
+
+
+def _as_dicts(pairs: Sequence[Pair], target_field: str) -> List[dict]:
+    return [{"responsavel_id": responsavel_id, target_field: target_id} for responsavel_id, target_id in pairs]
+
+
+def add_pairs(session: Session, relationship: str, pairs: Sequence[Pair]) -> Dict[str, List[dict]]:
+    """
+    Associa (responsavel_id, alvo_id) em lote numa transação: uma consulta para os ids que
+    existem e um único INSERT ... ON CONFLICT DO NOTHING RETURNING. Se um deles for excluído
+    entre a consulta e o INSERT, a chave estrangeira recusa o INSERT e tudo é refeito.
+
+    Roda numa Session síncrona (via `run_sync`). Devolve os pares novos, os que já
+    existiam e os ausentes (responsável ou alvo não cadastrado).
+    """
+    table, target_field, target_model, _ = RELATIONSHIP_TARGETS[relationship]
+    pairs = _unique(pairs)
+    responsavel_ids = {responsavel_id for responsavel_id, _ in pairs}
+    target_ids = {target_id for _, target_id in pairs}
+    for attempt in range(1, ADD_PAIRS_ATTEMPTS + 1):
+        found_responsaveis = set(session.scalars(select(Responsavel.id).where(Responsavel.id.in_(responsavel_ids)))) if pairs else set()
+        found_targets = set(session.scalars(select(target_model.id).where(target_model.id.in_(target_ids)))) if pairs else set()
+
+        valid = [pair for pair in pairs if pair[0] in found_responsaveis and pair[1] in found_targets]
+        missing = [pair for pair in pairs if pair[0] not in found_responsaveis or pair[1] not in found_targets]
+        created = set()
+        if not valid:
+            break
+        insert = _DIALECT_INSERTS[session.get_bind().dialect.name]
+        target_column = table.c[target_field]
+        stmt = (
+            insert(table)
+            .values(_as_dicts(valid, target_field))
+            .on_conflict_do_nothing(index_elements=[table.c.responsavel_id, target_column])
+            .returning(table.c.responsavel_id, target_column)
+        )
+        try:
+            created = {tuple(row) for row in session.execute(stmt)}
+            break
+        except IntegrityError as error:
+            # Responsável ou alvo excluído entre a consulta e o INSERT: a transação só tinha as
+            # consultas, então desfaz e consulta de novo (o par excluído vai para ausentes)
+            session.rollback()
+            if not is_foreign_key_violation(error) or attempt == ADD_PAIRS_ATTEMPTS:
+                raise
+            logger.warning(f"Associação em lote em {relationship}: registro excluído durante a inserção; tentando de novo")
+    session.commit()
+
+    logger.info(f"Associação em lote em {relationship}: {len(created)} novos de {len(pairs)} pares")
+    return {
+        "novos": _as_dicts([pair for pair in valid if pair in created], target_field),
+        "existentes": _as_dicts([pair for pair in valid if pair not in created], target_field),
+        "ausentes": _as_dicts(missing, target_field),
+    }
+
+
+def remove_pairs(session: Session, relationship: str, pairs: Sequence[Pair]) -> Dict[str, List[dict]]:
+    """
+    Remove associações em lote com um único DELETE ... WHERE (responsavel_id, alvo_id) IN (...)
+    RETURNING. Devolve os pares removidos e os ausentes (que não estavam associados).
+    """
+    table, target_field, _, _ = RELATIONSHIP_TARGETS[relationship]
+    pairs = _unique(pairs)
+    removed = set()
+    if pairs:
+        target_column = table.c[target_field]
+        stmt = (
+            delete(table)
+            .where(tuple_(table.c.responsavel_id, target_column).in_(pairs))
+            .returning(table.c.responsavel_id, target_column)
+        )
+        removed = {tuple(row) for row in session.execute(stmt)}
+    session.commit()
+
+    logger.info(f"Remoção em lote em {relationship}: {len(removed)} de {len(pairs)} pares")
+    return {
+        "removidos": _as_dicts([pair for pair in pairs if pair in removed], target_field),
+        "ausentes": _as_dicts([pair for pair in pairs if pair not in removed], target_field),
+    }
+
+
+def touched_targets(result: Dict[str, List[dict]], relationship: str) -> List[Tuple[int, None]]:
+    """
+    (id, None) dos alvos cujas associações mudaram, para publish_changes.
+    """
+    _, target_field, _, _ = RELATIONSHIP_TARGETS[relationship]
+    changed = result.get("novos", []) + result.get("removidos", [])
+    return [(target_id, None) for target_id in dict.fromkeys(pair[target_field] for pair in changed)]
@@ -0,0 +1,148 @@
+"""
+Agregados de registros_acesso para os gráficos de acessos: contagens por hora e por dia de
+data_solicitacao, conjunto_dados, usuario_id e status.
+
+As tabelas registros_acesso_por_hora e registros_acesso_por_dia são mantidas pelo banco a
+cada INSERT/UPDATE/DELETE (triggers por comando no Postgres, por linha no SQLite; ver
+infogrid/models.py), então as consultas leem só os agregados, sem varrer o log. Partições
+arquivadas por infogrid/partitions.py saem de registros_acesso sem disparar triggers: o
+histórico delas continua nos agregados.
+
+A recarga recalcula os agregados a partir do log (depois de uma carga feita com os triggers
+desligados, por exemplo). Por padrão começa no dia do registro mais antigo ainda no banco,
+preservando o histórico dos meses arquivados:
+
+    python -m infogrid.rollups
+    python -m infogrid.rollups --desde 2026-01-01
+"""
+import argparse
+import logging
+from datetime import date, datetime
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import delete, func, insert, literal, literal_column, select, text
+from sqlalchemy.orm import Session
+
+from infogrid import database
+from infogrid.models import SQLITE_ROLLUP_PERIODS, RegistroAcesso, registros_acesso_por_dia, registros_acesso_por_hora
+
+logger = logging.getLogger("app_logger")
+
+ROLLUP_TABLES = {
+    "hora": registros_acesso_por_hora,
+    "dia": registros_acesso_por_dia,
+}
+
+# Dimensões aceitas em agrupar_por
+DIMENSIONS = ("periodo", "conjunto_dados", "usuario_id", "status")
+
+# Valores guardados no lugar de NULL (as colunas fazem parte da PK dos agregados)
+SEM_USUARIO = 0
+SEM_STATUS = ""
+
+SQLITE_PERIODS = {granularidade: SQLITE_ROLLUP_PERIODS[table.name] for granularidade, table in ROLLUP_TABLES.items()}
+
+
+def _period(granularidade: str, column, dialect: str):
+    # Formato como literal, não parâmetro: a mesma expressão vai no SELECT e no GROUP BY.
+    # No SQLite o texto segue o formato de DateTime do SQLAlchemy (com microssegundos).
+    if dialect == "postgresql":
+        return func.date_trunc(literal_column("'hour'" if granularidade == "hora" else "'day'"), column)
+    return func.strftime(literal_column(f"'{SQLITE_PERIODS[granularidade]}'"), column)
+
+
+def backfill(session: Session, desde: Optional[date] = None) -> Dict[str, int]:
+    """
+    Recalcula os agregados a partir de `desde` (por padrão, o dia do registro mais antigo).
+    No Postgres as escritas em registros_acesso esperam a recarga terminar (lock SHARE).
+    Devolve quantas linhas de agregado foram gravadas por tabela.
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        session.execute(text("LOCK TABLE registros_acesso IN SHARE MODE"))
+    if desde is None:
+        oldest = session.scalar(select(func.min(RegistroAcesso.data_solicitacao)))
+        if oldest is None:
+            session.commit()
+            return {name: 0 for name in ROLLUP_TABLES}
+        desde = oldest.date()
+    start = datetime.combine(desde, datetime.min.time())
+
+    counts = {}
+    for granularidade, table in ROLLUP_TABLES.items():
+        session.execute(delete(table).where(table.c.periodo >= start))
+        periodo = _period(granularidade, RegistroAcesso.data_solicitacao, dialect)
+        usuario_id = func.coalesce(RegistroAcesso.usuario_id, SEM_USUARIO)
+        status = func.coalesce(RegistroAcesso.status, SEM_STATUS)
+        rows = (
+            select(periodo, RegistroAcesso.conjunto_dados, usuario_id, status, func.count())
+            .where(RegistroAcesso.data_solicitacao >= start)
+            .group_by(periodo, RegistroAcesso.conjunto_dados, usuario_id, status)
+        )
+        result = session.execute(
+            insert(table).from_select(["periodo", "conjunto_dados", "usuario_id", "status", "quantidade"], rows)
+        )
+        counts[table.name] = result.rowcount
+    session.commit()
+    logger.info(f"Agregados de registros de acesso recalculados desde {desde}: {counts}")
+    return counts
+
+
+def access_counts(
+    granularidade: str = "dia",
+    agrupar_por: Sequence[str] = ("periodo",),
+    desde: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    conjunto_dados: Optional[str] = None,
+    usuario_id: Optional[int] = None,
+    status: Optional[str] = None,
+    limit: Optional[int] = None,
+):
+    """
+    Select das contagens somadas a partir do agregado da granularidade pedida. As dimensões
+    fora de `agrupar_por` voltam como NULL. `desde`/`ate` são truncados pelo período do
+    agregado (uma hora ou um dia começa dentro do intervalo).
+    """
+    table = ROLLUP_TABLES[granularidade]
+    columns = []
+    for dimension in DIMENSIONS:
+        column = table.c[dimension]
+        if dimension == "usuario_id":
+            column = func.nullif(column, SEM_USUARIO)
+        elif dimension == "status":
+            column = func.nullif(column, SEM_STATUS)
+        columns.append(column.label(dimension) if dimension in agrupar_por else literal(None).label(dimension))
+    quantidade = func.sum(table.c.quantidade)
+
+    stmt = select(*columns, quantidade.label("quantidade"))
+    if desde is not None:
+        stmt = stmt.where(table.c.periodo >= desde)
+    if ate is not None:
+        stmt = stmt.where(table.c.periodo < ate)
+    if conjunto_dados is not None:
+        stmt = stmt.where(table.c.conjunto_dados == conjunto_dados)
+    if usuario_id is not None:
+        stmt = stmt.where(table.c.usuario_id == usuario_id)
+    if status is not None:
+        stmt = stmt.where(table.c.status == status)
+    grouped = [table.c[dimension] for dimension in DIMENSIONS if dimension in agrupar_por]
+    stmt = stmt.group_by(*grouped).having(quantidade > 0).order_by(*grouped)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--desde", type=date.fromisoformat, help="primeiro dia recalculado (AAAA-MM-DD)")
+    args = parser.parse_args(argv)
+
+    with Session(database.engine, expire_on_commit=False) as session:
+        counts = backfill(session, args.desde)
+    for tabela, linhas in counts.items():
+        print(f"{tabela}: {linhas} linhas")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
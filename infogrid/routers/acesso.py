@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException, Query
+from http import HTTPStatus
+from typing import List
+from infogrid.acl import access_index
+from infogrid.schemas import ResultadoAcesso, VerificacaoAcesso
+
+router = APIRouter(prefix='/api/v1/acesso', tags=['acesso'])
+
+# Verificações por requisição em /check/batch
+CHECK_BATCH_MAX = 1000
+
+
+@router.get("/check", status_code=HTTPStatus.OK, response_model=ResultadoAcesso)
+async def check_access(
+    usuario_id: int,
+    conjunto_dados: str,
+    permissao: List[str] = Query(...),
+):
+    """
+    O usuário pode usar o conjunto de dados com todas as `permissao` informadas (repetível,
+    ex.: ?usuario_id=1&conjunto_dados=vendas&permissao=leitura)? Respondido pelo índice de
+    permissões em memória, montado a partir dos registros de acesso aprovados (não consulta o banco).
+    """
+    return {"permitido": access_index.check(usuario_id, conjunto_dados, permissao)}
+
+
+@router.post("/check/batch", status_code=HTTPStatus.OK, response_model=List[ResultadoAcesso])
+async def check_access_batch(verificacoes: List[VerificacaoAcesso]):
+    """
+    Várias verificações numa requisição; os resultados vêm na ordem do corpo.
+    """
+    if len(verificacoes) > CHECK_BATCH_MAX:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"No máximo {CHECK_BATCH_MAX} verificações por requisição")
+    check = access_index.check
+    return [{"permitido": check(v.usuario_id, v.conjunto_dados, v.permissoes)} for v in verificacoes]
@@ -0,0 +1,91 @@
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from http import HTTPStatus
+from starlette.concurrency import run_in_threadpool
+from infogrid import database
+from infogrid.cache import response_cache
+from infogrid.index_advisor import DEFAULT_LIMIT, advise
+from infogrid.pool import pool_stats
+from infogrid.snapshot import MEDIA_TYPE, CatalogNotEmptyError, SnapshotError, import_snapshot, iter_snapshot_gzip
+import logging
+import tempfile
+
+logger = logging.getLogger("app_logger")
+
+router = APIRouter(prefix='/api/v1/admin', tags=['admin'])
+
+
+@router.get("/pool", status_code=HTTPStatus.OK)
+async def get_pool_stats():
+    """
+    Estatísticas ao vivo do pool de conexões deste worker, para dimensionar
+    DATABASE_POOL_SIZE/DATABASE_MAX_OVERFLOW em função do número de workers.
+    """
+    logger.info("Endpoint /admin/pool acessado")
+    settings = database.settings
+    return {
+        "mode": "async" if database.async_engine is not None else "sync",
+        "config": {
+            "pool_size": settings.DATABASE_POOL_SIZE,
+            "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+            "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+            "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+            "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+        },
+        "sync": pool_stats(database.engine.pool),
+        "async": pool_stats(database.async_engine.pool) if database.async_engine is not None else None,
+    }
+
+
+@router.get("/cache", status_code=HTTPStatus.OK)
+async def get_cache_stats():
+    """
+    Acertos/erros do cache de respostas deste worker e a versão atual de cada entidade.
+    """
+    logger.info("Endpoint /admin/cache acessado")
+    return response_cache.stats()
+
+
+@router.get("/indices", status_code=HTTPStatus.OK)
+async def get_index_advice(limite: int = DEFAULT_LIMIT):
+    """
+    Índices candidatos: FKs sem índice, tabelas lidas por seq scan e consultas caras
+    (pg_stat_user_tables e pg_stat_statements). O mesmo relatório de `python -m infogrid.index_advisor`.
+    """
+    logger.info("Endpoint /admin/indices acessado")
+    return await run_in_threadpool(advise, limite)
+
+
+@router.get("/snapshot", status_code=HTTPStatus.OK)
+async def export_catalog_snapshot():
+    """
+    Baixa o catálogo inteiro como JSONL comprimido (gzip), gerado em streaming.
+    """
+    logger.info("Endpoint /admin/snapshot acessado para exportação")
+    filename = f"infogrid-snapshot-{datetime.now():%Y%m%d-%H%M%S}.jsonl.gz"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    return StreamingResponse(iter_snapshot_gzip(), media_type=MEDIA_TYPE, headers=headers)
+
+
+@router.post("/snapshot", status_code=HTTPStatus.OK)
+async def import_catalog_snapshot(request: Request, replace: bool = False):
+    """
+    Carrega um snapshot enviado no corpo da requisição (o mesmo .jsonl.gz da exportação).
+    Sem replace, o catálogo de destino precisa estar vazio.
+    """
+    logger.info(f"Endpoint /admin/snapshot acessado para importação (replace={replace})")
+    # O corpo vai para um arquivo temporário em disco a partir de 16 MB
+    with tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024) as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        try:
+            linhas = await run_in_threadpool(import_snapshot, upload, replace)
+        except CatalogNotEmptyError as e:
+            logger.warning(f"Importação de snapshot recusada: {e}")
+            raise HTTPException(status_code=HTTPStatus.CONFLICT, detail=str(e))
+        except SnapshotError as e:
+            logger.warning(f"Importação de snapshot falhou: {e}")
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=str(e))
+    return {"linhas": linhas, "total": sum(linhas.values())}
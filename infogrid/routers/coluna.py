@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Request
 from sqlalchemy import select, func
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from http import HTTPStatus
-from typing import List
+from typing import List, Optional
+from infogrid.bulk import BULK_MAX_ROWS, CREATED, insert_children
+from infogrid.changes import publish_change, publish_changes
+from infogrid.crud import delete_returning, insert_returning, is_foreign_key_violation, is_unique_violation, patch_returning, update_returning
 from infogrid.database import get_session
-from infogrid.models import Coluna as ColunaModel
-from infogrid.schemas import Coluna, ColunaPublic
+from infogrid.export import export_format, stream_export
+from infogrid.pagination import paginate, set_next_cursor
+from infogrid.upsert import SYNC_MAX_ROWS, changed_entities, sync_summary, upsert_rows
+from infogrid.models import Coluna as ColunaModel, Tabela as TabelaModel
+from infogrid.schemas import BulkResult, Coluna, ColunaPublic, ColunaUpdate, SyncResult
 import logging
 
 logger = logging.getLogger("app_logger")
@@ -15,111 +21,179 @@ router = APIRouter(prefix='/api/v1/coluna', tags=['coluna'])
 
 
 @router.get("/", status_code=HTTPStatus.OK, response_model=List[ColunaPublic])
-def list_colunas(session: Session = Depends(get_session)):
+async def list_colunas(request: Request, session: AsyncSession = Depends(get_session)):
     logger.info("Endpoint /coluna acessado")
-    colunas = session.scalars(select(ColunaModel)).all()
+    media_type = export_format(request)
+    if media_type:
+        # Accept: application/x-ndjson ou text/csv exporta a tabela inteira em streaming
+        return stream_export(ColunaModel, media_type)
+    colunas = (await session.scalars(select(ColunaModel))).all()
     logger.info(f"{len(colunas)} colunas encontradas")
     return colunas
 
 
 @router.get("/pagined/", status_code=HTTPStatus.OK, response_model=List[ColunaPublic])
-def list_colunas_paged(limit: int = 5, skip: int = 0, session: Session = Depends(get_session)):
-    logger.info(f"Endpoint /coluna/pagined acessado com limite {limit} e offset {skip}")
-    colunas = session.scalars(select(ColunaModel).limit(limit).offset(skip)).all()
+async def list_colunas_paged(
+    response: Response,
+    limit: int = 5,
+    cursor: Optional[str] = None,
+    order_by: Optional[str] = None,
+    skip: Optional[int] = Query(None, deprecated=True),
+    session: AsyncSession = Depends(get_session),
+):
+    logger.info(f"Endpoint /coluna/pagined acessado com limite {limit}, cursor {cursor} e offset {skip}")
+    stmt = paginate(select(ColunaModel), ColunaModel, limit, cursor, order_by, skip, sortable=("nome",))
+    colunas = (await session.scalars(stmt)).all()
+    set_next_cursor(response, colunas, limit, order_by)
     logger.info(f"{len(colunas)} colunas encontradas")
     return colunas
 
 
 @router.post("/", status_code=HTTPStatus.CREATED, response_model=ColunaPublic)
-def create_coluna(coluna: Coluna, session: Session = Depends(get_session)):
+async def create_coluna(coluna: Coluna, session: AsyncSession = Depends(get_session)):
     """
     Cria uma nova coluna
     """
     logger.info("Tentativa de criação de uma nova coluna")
-    with session as session:
-        db_coluna = session.scalar(select(ColunaModel).where(ColunaModel.nome == coluna.nome and ColunaModel.tabela_id == coluna.tabela_id))
-        if db_coluna:
-            logger.warning("Tentativa de criação de coluna falhou: coluna já existe")
-            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Coluna already exists")
-
-        db_instance = ColunaModel(**coluna.dict())
-        session.add(db_instance)
-
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Coluna '{db_instance.nome}' inserida com sucesso")
-        except IntegrityError:
-            session.rollback()
+            db_coluna = await session.run_sync(insert_returning, ColunaModel, coluna.dict())
+        except IntegrityError as e:
+            # Repetida só quando (tabela_id, nome) já existe: uq_colunas_tabela_id_nome
+            if is_unique_violation(e):
+                logger.warning("Tentativa de criação de coluna falhou: coluna já existe")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Coluna already exists")
             logger.error("Falha na inserção da coluna", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Coluna insertion failed")
+        await publish_change(session, "coluna", db_coluna["id"], db_coluna["nome"])
+    logger.info(f"Coluna '{db_coluna['nome']}' inserida com sucesso")
+    return db_coluna
+
+
+@router.post("/bulk", status_code=HTTPStatus.OK, response_model=BulkResult)
+async def create_colunas_bulk(colunas: List[Coluna], session: AsyncSession = Depends(get_session)):
+    """
+    Cria até BULK_MAX_ROWS colunas numa única transação, com o resultado de cada linha
+    (created, duplicate, exists, parent_not_found, invalid) na ordem recebida
+    """
+    logger.info(f"Tentativa de criação em lote de {len(colunas)} colunas")
+    if len(colunas) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"No máximo {BULK_MAX_ROWS} linhas por requisição")
 
-        session.refresh(db_instance)
+    rows = [coluna.dict() for coluna in colunas]
+    async with session as session:
+        try:
+            resultados = await session.run_sync(insert_children, ColunaModel, TabelaModel, "tabela_id", rows)
+        except IntegrityError as e:
+            # Pai excluído entre a verificação e o INSERT (ou no commit, com as FKs adiáveis)
+            if is_foreign_key_violation(e):
+                logger.warning("Criação em lote de colunas falhou: tabela excluída durante a inserção")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tabela não encontrada; nenhuma coluna foi criada")
+            logger.error("Falha na inserção em lote de colunas", exc_info=True)
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Colunas insertion failed")
+        criados = [(item["id"], item["nome"]) for item in resultados if item["status"] == CREATED]
+        if criados:
+            await publish_changes(session, "coluna", criados)
+
+    logger.info(f"{len(criados)} colunas criadas em lote")
+    return {"criados": len(criados), "rejeitados": len(resultados) - len(criados), "resultados": resultados}
+
+
+@router.post("/sync", status_code=HTTPStatus.OK, response_model=SyncResult)
+async def sync_colunas(colunas: List[Coluna], session: AsyncSession = Depends(get_session)):
+    """
+    Upsert idempotente por (tabela_id, nome): cria os novos, atualiza os alterados e mantém os iguais
+    """
+    logger.info(f"Sync de {len(colunas)} colunas")
+    if len(colunas) > SYNC_MAX_ROWS:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"No máximo {SYNC_MAX_ROWS} linhas por requisição")
 
-    return {
-        "id": db_instance.id,
-        "nome": db_instance.nome,
-        "tipo_dado": db_instance.tipo_dado,
-        "descricao": db_instance.descricao,
-        "tabela_id": db_instance.tabela_id,
-    }
+    rows = [coluna.dict() for coluna in colunas]
+    async with session as session:
+        try:
+            resultados = await session.run_sync(upsert_rows, "coluna", rows)
+        except IntegrityError as e:
+            # Nada é gravado: o sync roda numa única transação
+            if is_foreign_key_violation(e):
+                logger.warning("Sync de colunas falhou: tabela excluído durante o sync")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Colunas sync failed: referência a registro inexistente")
+            if is_unique_violation(e):
+                logger.warning("Sync de colunas falhou: conflito com registro existente")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Colunas sync failed: registro já existe")
+            logger.error("Falha no sync de colunas", exc_info=True)
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Colunas sync failed")
+        alterados = changed_entities(rows, resultados)
+        if alterados:
+            await publish_changes(session, "coluna", alterados)
+
+    logger.info(f"Sync de colunas concluído: {len(alterados)} criados ou atualizados")
+    return sync_summary(resultados)
 
 
 @router.delete("/{coluna_id}", status_code=HTTPStatus.NO_CONTENT)
-def delete_coluna(coluna_id: int, session: Session = Depends(get_session)):
+async def delete_coluna(coluna_id: int, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de exclusão da coluna com ID {coluna_id}")
-    with session as session:
-        db_coluna = session.scalar(select(ColunaModel).where(ColunaModel.id == coluna_id))
-        if not db_coluna:
-            logger.warning(f"Tentativa de exclusão falhou: coluna com ID {coluna_id} não encontrada")
-            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Coluna not found")
-        session.delete(db_coluna)
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Coluna com ID {coluna_id} excluída com sucesso")
+            db_coluna = await session.run_sync(delete_returning, ColunaModel, coluna_id)
         except IntegrityError:
-            session.rollback()
             logger.error(f"Falha na exclusão da coluna com ID {coluna_id}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Coluna deletion failed")
+        if db_coluna is None:
+            logger.warning(f"Tentativa de exclusão falhou: coluna com ID {coluna_id} não encontrada")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Coluna not found")
+        await publish_change(session, "coluna", coluna_id, deleted=True)
+    logger.info(f"Coluna com ID {coluna_id} excluída com sucesso")
     return {"message": "Coluna deleted successfully"}
 
-        # session.commit()
-    # return {"message": "Coluna deleted successfully"}
-
 
 @router.put("/{coluna_id}", status_code=HTTPStatus.OK, response_model=ColunaPublic)
-def update_coluna(coluna_id: int, coluna: Coluna, session: Session = Depends(get_session)):
+async def update_coluna(coluna_id: int, coluna: Coluna, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de atualização da coluna com ID {coluna_id}")
-    with session as session:
-        db_coluna = session.scalar(select(ColunaModel).where(ColunaModel.id == coluna_id))
-        if not db_coluna:
+    async with session as session:
+        try:
+            db_coluna = await session.run_sync(update_returning, ColunaModel, coluna_id, coluna.dict())
+        except IntegrityError:
+            logger.error(f"Falha na atualização da coluna com ID {coluna_id}", exc_info=True)
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Coluna update failed")
+        if db_coluna is None:
             logger.warning(f"Tentativa de atualização falhou: coluna com ID {coluna_id} não encontrada")
             raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Coluna not found")
+        await publish_change(session, "coluna", coluna_id, db_coluna["nome"])
+    logger.info(f"Coluna com ID {coluna_id} atualizada com sucesso")
+    return db_coluna
 
-        # Atualiza os dados da coluna
-        update_data = coluna.dict()
-        for key, value in update_data.items():
-            setattr(db_coluna, key, value)
 
+@router.patch("/{coluna_id}", status_code=HTTPStatus.OK, response_model=ColunaPublic)
+async def patch_coluna(coluna_id: int, coluna: ColunaUpdate, session: AsyncSession = Depends(get_session)):
+    """
+    Atualiza só os campos enviados, com um único UPDATE ... RETURNING.
+    """
+    logger.info(f"Tentativa de atualização parcial da coluna com ID {coluna_id}")
+    data = coluna.dict(exclude_unset=True)
+    if not data:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="No fields to update")
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Coluna com ID {coluna_id} atualizada com sucesso")
+            db_coluna = await session.run_sync(patch_returning, ColunaModel, coluna_id, data)
         except IntegrityError:
-            session.rollback()
-            logger.error(f"Falha na atualização da coluna com ID {coluna_id}", exc_info=True)
+            logger.error(f"Falha na atualização parcial da coluna com ID {coluna_id}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Coluna update failed")
-
-        session.refresh(db_coluna)
-
+        if db_coluna is None:
+            logger.warning(f"Tentativa de atualização parcial falhou: coluna com ID {coluna_id} não encontrada")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Coluna not found")
+        await publish_change(session, "coluna", coluna_id, db_coluna["nome"])
+    logger.info(f"Coluna com ID {coluna_id} atualizada parcialmente ({', '.join(data)})")
     return db_coluna
 
 
 
 @router.get("/colunas", status_code=HTTPStatus.OK)
-def count_databases(session: Session = Depends(get_session)):
+async def count_databases(session: AsyncSession = Depends(get_session)):
     """
     Endpoint para contar o número de registros na tabela 'colunas'.
     """
     logger.info("Endpoint /coluna/colunas acessado para contar registros")
-    quantidade = session.scalar(select(func.count()).select_from(ColunaModel))
+    quantidade = await session.scalar(select(func.count()).select_from(ColunaModel))
     logger.info(f"Quantidade de colunas: {quantidade}")
     return {"quantidade": quantidade}
\ No newline at end of file
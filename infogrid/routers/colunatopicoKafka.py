@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Request
 from sqlalchemy import select, func
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from http import HTTPStatus
-from typing import List
+from typing import List, Optional
+from infogrid.bulk import BULK_MAX_ROWS, CREATED, insert_children
+from infogrid.changes import publish_change, publish_changes
+from infogrid.crud import delete_returning, insert_returning, is_foreign_key_violation, is_unique_violation, patch_returning, update_returning
 from infogrid.database import get_session
-from infogrid.models import ColunaTopicoKafka as ColunaTopicoKafkaModel
-from infogrid.schemas import ColunaTopicoKafka, ColunaTopicoKafkaPublic
+from infogrid.export import export_format, stream_export
+from infogrid.pagination import paginate, set_next_cursor
+from infogrid.upsert import SYNC_MAX_ROWS, changed_entities, sync_summary, upsert_rows
+from infogrid.models import ColunaTopicoKafka as ColunaTopicoKafkaModel, TopicoKafka as TopicoKafkaModel
+from infogrid.schemas import BulkResult, ColunaTopicoKafka, ColunaTopicoKafkaPublic, ColunaTopicoKafkaUpdate, SyncResult
 import logging
 
 logger = logging.getLogger("app_logger")
@@ -15,118 +21,179 @@ router = APIRouter(prefix='/api/v1/colunatopicokafka', tags=['colunatopicokafka'
 
 
 @router.get("/", status_code=HTTPStatus.OK, response_model=List[ColunaTopicoKafkaPublic])
-def list_colunas_topico_kafka(session: Session = Depends(get_session)):
+async def list_colunas_topico_kafka(request: Request, session: AsyncSession = Depends(get_session)):
     logger.info("Endpoint /colunatopicoKafka acessado")
-    colunas = session.scalars(select(ColunaTopicoKafkaModel)).all()
+    media_type = export_format(request)
+    if media_type:
+        return stream_export(ColunaTopicoKafkaModel, media_type)
+    colunas = (await session.scalars(select(ColunaTopicoKafkaModel))).all()
     logger.info(f"{len(colunas)} colunas de tópicos Kafka encontradas")
     return colunas
 
 
 @router.get("/pagined/", status_code=HTTPStatus.OK, response_model=List[ColunaTopicoKafkaPublic])
-def list_colunas_topico_kafka_paged(limit: int = 5, skip: int = 0, session: Session = Depends(get_session)):
-    logger.info(f"Endpoint /colunatopicoKafka/pagined acessado com limite {limit} e offset {skip}")
-    colunas = session.scalars(select(ColunaTopicoKafkaModel).limit(limit).offset(skip)).all()
+async def list_colunas_topico_kafka_paged(
+    response: Response,
+    limit: int = 5,
+    cursor: Optional[str] = None,
+    order_by: Optional[str] = None,
+    skip: Optional[int] = Query(None, deprecated=True),
+    session: AsyncSession = Depends(get_session),
+):
+    logger.info(f"Endpoint /colunatopicoKafka/pagined acessado com limite {limit}, cursor {cursor} e offset {skip}")
+    stmt = paginate(select(ColunaTopicoKafkaModel), ColunaTopicoKafkaModel, limit, cursor, order_by, skip, sortable=("nome",))
+    colunas = (await session.scalars(stmt)).all()
+    set_next_cursor(response, colunas, limit, order_by)
     logger.info(f"{len(colunas)} colunas de tópicos Kafka encontradas")
     return colunas
 
 
 @router.post("/", status_code=HTTPStatus.CREATED, response_model=ColunaTopicoKafkaPublic)
-def create_coluna_topico_kafka(coluna: ColunaTopicoKafka, session: Session = Depends(get_session)):
+async def create_coluna_topico_kafka(coluna: ColunaTopicoKafka, session: AsyncSession = Depends(get_session)):
     """
     Cria uma nova coluna associada a um tópico Kafka
     """
     logger.info("Tentativa de criação de uma nova coluna de tópico Kafka")
-    with session as session:
-        db_coluna = session.scalar(
-            select(ColunaTopicoKafkaModel)
-            .where(
-                (ColunaTopicoKafkaModel.nome == coluna.nome) &
-                (ColunaTopicoKafkaModel.topico_kafka_id == coluna.topico_kafka_id)
-            )
-        )
-        if db_coluna:
-            logger.warning("Tentativa de criação de coluna de tópico Kafka falhou: coluna já existe")
-            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Coluna do Tópico Kafka already exists")
-
-        db_instance = ColunaTopicoKafkaModel(**coluna.dict())
-        session.add(db_instance)
-
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Coluna de tópico Kafka '{db_instance.nome}' inserida com sucesso")
+            db_coluna = await session.run_sync(insert_returning, ColunaTopicoKafkaModel, coluna.dict())
         except IntegrityError as e:
-            session.rollback()
+            if is_unique_violation(e):
+                logger.warning("Tentativa de criação de coluna de tópico Kafka falhou: coluna já existe")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Coluna do Tópico Kafka already exists")
             logger.error(f"Erro ao inserir coluna: {str(e)}")  # Registra o erro detalhado
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"Coluna do Tópico Kafka insertion failed: {str(e)}")
+        await publish_change(session, "colunatopicokafka", db_coluna["id"])
+    logger.info(f"Coluna de tópico Kafka '{db_coluna['nome']}' inserida com sucesso")
+    return db_coluna
 
-        session.refresh(db_instance)
 
-    return {
-        "id": db_instance.id,
-        "nome": db_instance.nome,
-        "tipo_dado": db_instance.tipo_dado,
-        "descricao": db_instance.descricao,
-        "topico_kafka_id": db_instance.topico_kafka_id,
-    }
+@router.post("/bulk", status_code=HTTPStatus.OK, response_model=BulkResult)
+async def create_colunas_topico_kafka_bulk(colunas: List[ColunaTopicoKafka], session: AsyncSession = Depends(get_session)):
+    """
+    Cria até BULK_MAX_ROWS colunas de tópico numa única transação, com o resultado de cada linha
+    (created, duplicate, exists, parent_not_found, invalid) na ordem recebida
+    """
+    logger.info(f"Tentativa de criação em lote de {len(colunas)} colunas de tópico")
+    if len(colunas) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"No máximo {BULK_MAX_ROWS} linhas por requisição")
+
+    rows = [coluna.dict() for coluna in colunas]
+    async with session as session:
+        try:
+            resultados = await session.run_sync(insert_children, ColunaTopicoKafkaModel, TopicoKafkaModel, "topico_kafka_id", rows)
+        except IntegrityError as e:
+            # Pai excluído entre a verificação e o INSERT (ou no commit, com as FKs adiáveis)
+            if is_foreign_key_violation(e):
+                logger.warning("Criação em lote de colunas de tópico falhou: tópico Kafka excluído durante a inserção")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tópico Kafka não encontrado; nenhuma coluna foi criada")
+            logger.error("Falha na inserção em lote de colunas de tópico", exc_info=True)
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Colunas do Tópico Kafka insertion failed")
+        criados = [(item["id"], item["nome"]) for item in resultados if item["status"] == CREATED]
+        if criados:
+            await publish_changes(session, "colunatopicokafka", criados)
+
+    logger.info(f"{len(criados)} colunas de tópico criadas em lote")
+    return {"criados": len(criados), "rejeitados": len(resultados) - len(criados), "resultados": resultados}
+
+
+@router.post("/sync", status_code=HTTPStatus.OK, response_model=SyncResult)
+async def sync_colunas_topico_kafka(colunas: List[ColunaTopicoKafka], session: AsyncSession = Depends(get_session)):
+    """
+    Upsert idempotente por (topico_kafka_id, nome): cria os novos, atualiza os alterados e mantém os iguais
+    """
+    logger.info(f"Sync de {len(colunas)} colunas de tópicos")
+    if len(colunas) > SYNC_MAX_ROWS:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"No máximo {SYNC_MAX_ROWS} linhas por requisição")
+
+    rows = [coluna.dict() for coluna in colunas]
+    async with session as session:
+        try:
+            resultados = await session.run_sync(upsert_rows, "colunatopicokafka", rows)
+        except IntegrityError as e:
+            # Nada é gravado: o sync roda numa única transação
+            if is_foreign_key_violation(e):
+                logger.warning("Sync de colunas de tópico falhou: tópico Kafka excluído durante o sync")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Colunas do Tópico Kafka sync failed: referência a registro inexistente")
+            if is_unique_violation(e):
+                logger.warning("Sync de colunas de tópico falhou: conflito com registro existente")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Colunas do Tópico Kafka sync failed: registro já existe")
+            logger.error("Falha no sync de colunas de tópico", exc_info=True)
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Colunas do Tópico Kafka sync failed")
+        alterados = changed_entities(rows, resultados)
+        if alterados:
+            await publish_changes(session, "colunatopicokafka", alterados)
+
+    logger.info(f"Sync de colunas de tópicos concluído: {len(alterados)} criados ou atualizados")
+    return sync_summary(resultados)
 
 
 @router.delete("/{coluna_id}", status_code=HTTPStatus.NO_CONTENT)
-def delete_coluna_topico_kafka(coluna_id: int, session: Session = Depends(get_session)):
+async def delete_coluna_topico_kafka(coluna_id: int, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de exclusão da coluna de tópico Kafka com ID {coluna_id}")
-    with session as session:
-        db_coluna = session.scalar(select(ColunaTopicoKafkaModel).where(ColunaTopicoKafkaModel.id == coluna_id))
-        if not db_coluna:
-            logger.warning(f"Tentativa de exclusão falhou: coluna de tópico Kafka com ID {coluna_id} não encontrada")
-            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Coluna do Tópico Kafka not found")
-        session.delete(db_coluna)
-    #     session.commit()
-    # return {"message": "Coluna do Tópico Kafka deleted successfully"}
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Coluna de tópico Kafka com ID {coluna_id} excluída com sucesso")
+            db_coluna = await session.run_sync(delete_returning, ColunaTopicoKafkaModel, coluna_id)
         except IntegrityError as e:
-            session.rollback()
             logger.error(f"Erro ao excluir coluna de tópico Kafka com ID {coluna_id}: {str(e)}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"Coluna do Tópico Kafka deletion failed: {str(e)}")
+        if db_coluna is None:
+            logger.warning(f"Tentativa de exclusão falhou: coluna de tópico Kafka com ID {coluna_id} não encontrada")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Coluna do Tópico Kafka not found")
+        await publish_change(session, "colunatopicokafka", coluna_id, deleted=True)
+    logger.info(f"Coluna de tópico Kafka com ID {coluna_id} excluída com sucesso")
     return {"message": "Coluna do Tópico Kafka deleted successfully"}
 
 
 
 @router.put("/{coluna_id}", status_code=HTTPStatus.OK, response_model=ColunaTopicoKafkaPublic)
-def update_coluna_topico_kafka(coluna_id: int, coluna: ColunaTopicoKafka, session: Session = Depends(get_session)):
+async def update_coluna_topico_kafka(coluna_id: int, coluna: ColunaTopicoKafka, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de atualização da coluna de tópico Kafka com ID {coluna_id}")
-    with session as session:
-        db_coluna = session.scalar(select(ColunaTopicoKafkaModel).where(ColunaTopicoKafkaModel.id == coluna_id))
-        if not db_coluna:
+    async with session as session:
+        try:
+            db_coluna = await session.run_sync(update_returning, ColunaTopicoKafkaModel, coluna_id, coluna.dict())
+        except IntegrityError as e:
+            logger.error(f"Erro ao atualizar coluna: {str(e)}")  # Registra o erro detalhado
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Coluna do Tópico Kafka update failed")
+        if db_coluna is None:
             logger.warning(f"Tentativa de atualização falhou: coluna de tópico Kafka com ID {coluna_id} não encontrada")
             raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Coluna do Tópico Kafka not found")
+        await publish_change(session, "colunatopicokafka", coluna_id)
+    logger.info(f"Coluna de tópico Kafka com ID {coluna_id} atualizada com sucesso")
+    return db_coluna
 
-        # Atualiza os dados da coluna
-        update_data = coluna.dict()
-        for key, value in update_data.items():
-            setattr(db_coluna, key, value)
 
+@router.patch("/{coluna_id}", status_code=HTTPStatus.OK, response_model=ColunaTopicoKafkaPublic)
+async def patch_coluna_topico_kafka(coluna_id: int, coluna: ColunaTopicoKafkaUpdate, session: AsyncSession = Depends(get_session)):
+    """
+    Atualiza só os campos enviados, com um único UPDATE ... RETURNING.
+    """
+    logger.info(f"Tentativa de atualização parcial da coluna de tópico Kafka com ID {coluna_id}")
+    data = coluna.dict(exclude_unset=True)
+    if not data:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="No fields to update")
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Coluna de tópico Kafka com ID {coluna_id} atualizada com sucesso")
-        except IntegrityError as e:
-            session.rollback()
-            logger.error(f"Erro ao inserir coluna: {str(e)}")  # Registra o erro detalhado
+            db_coluna = await session.run_sync(patch_returning, ColunaTopicoKafkaModel, coluna_id, data)
+        except IntegrityError:
+            logger.error(f"Falha na atualização parcial da coluna de tópico Kafka com ID {coluna_id}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Coluna do Tópico Kafka update failed")
-
-        session.refresh(db_coluna)
-
+        if db_coluna is None:
+            logger.warning(f"Tentativa de atualização parcial falhou: coluna de tópico Kafka com ID {coluna_id} não encontrada")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Coluna do Tópico Kafka not found")
+        await publish_change(session, "colunatopicokafka", coluna_id)
+    logger.info(f"Coluna de tópico Kafka com ID {coluna_id} atualizada parcialmente ({', '.join(data)})")
     return db_coluna
 
 
 
 
 @router.get("/colunastopicoskafka", status_code=HTTPStatus.OK)
-def count_databases(session: Session = Depends(get_session)):
+async def count_databases(session: AsyncSession = Depends(get_session)):
     """
     Endpoint para contar o número de registros na tabela 'colunastopicoskafka'.
     """
     logger.info("Endpoint /colunatopicoKafka/colunastopicoskafka acessado para contar registros")
-    quantidade = session.scalar(select(func.count()).select_from(ColunaTopicoKafkaModel))
+    quantidade = await session.scalar(select(func.count()).select_from(ColunaTopicoKafkaModel))
     logger.info(f"Quantidade de colunas de tópicos Kafka: {quantidade}")
     return {"quantidade": quantidade}
\ No newline at end of file
@@ -1,84 +1,100 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, true
 from infogrid.database import get_session
 from infogrid.models import Responsavel, Database, Tabela, TopicoKafka
 from http import HTTPStatus
 
 router = APIRouter(prefix='/api/v1/entidades', tags=['entidades'])
 
+
+def contains_filter(column, term: str):
+    """
+    Filtro de substring sem diferenciar maiúsculas no formato que os índices
+    `lower(coluna) gin_trgm_ops` conseguem usar.
+    Curingas digitados pelo usuário (% e _) são tratados como texto. Termos com menos de
+    3 caracteres não geram trigramas e o índice não os restringe, mas o resultado continua
+    sendo o de substring; um termo só de espaços não filtra nada.
+    """
+    term = term.strip().lower()
+    if not term:
+        return true()
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return func.lower(column).like(f"%{escaped}%", escape="\\")
+
+
 # Endpoint para filtrar Responsaveis
 @router.get("/responsaveis/", status_code=HTTPStatus.OK)
-def get_responsaveis(
+async def get_responsaveis(
     nome: str = Query(None),
     email: str = Query(None),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     stmt = select(Responsavel)
     
     if nome:
-        stmt = stmt.where(Responsavel.nome.ilike(f"%{nome}%"))
+        stmt = stmt.where(contains_filter(Responsavel.nome, nome))
     if email:
-        stmt = stmt.where(Responsavel.email.ilike(f"%{email}%"))
+        stmt = stmt.where(contains_filter(Responsavel.email, email))
 
-    result = session.execute(stmt).scalars().all()
+    result = (await session.execute(stmt)).scalars().all()
     if not result:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Responsáveis não encontrados")
     return result
 
 # Endpoint para filtrar Databases
 @router.get("/databases/", status_code=HTTPStatus.OK)
-def get_databases(
+async def get_databases(
     nome: str = Query(None),
     tecnologia: str = Query(None),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     stmt = select(Database)
     
     if nome:
-        stmt = stmt.where(Database.nome.ilike(f"%{nome}%"))
+        stmt = stmt.where(contains_filter(Database.nome, nome))
     if tecnologia:
-        stmt = stmt.where(Database.tecnologia.ilike(f"%{tecnologia}%"))
+        stmt = stmt.where(contains_filter(Database.tecnologia, tecnologia))
 
-    result = session.execute(stmt).scalars().all()
+    result = (await session.execute(stmt)).scalars().all()
     if not result:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Databases não encontrados")
     return result
 
 # Endpoint para filtrar Tabelas
 @router.get("/tabelas/", status_code=HTTPStatus.OK)
-def get_tabelas(
+async def get_tabelas(
     nome: str = Query(None),
     descricao: str = Query(None),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     stmt = select(Tabela)
     
     if nome:
-        stmt = stmt.where(Tabela.nome.ilike(f"%{nome}%"))
+        stmt = stmt.where(contains_filter(Tabela.nome, nome))
     if descricao:
-        stmt = stmt.where(Tabela.descricao.ilike(f"%{descricao}%"))
+        stmt = stmt.where(contains_filter(Tabela.descricao, descricao))
 
-    result = session.execute(stmt).scalars().all()
+    result = (await session.execute(stmt)).scalars().all()
     if not result:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Tabelas não encontradas")
     return result
 
 # Endpoint para filtrar TopicosKafka
 @router.get("/topicos_kafka/", status_code=HTTPStatus.OK)
-def get_topicos_kafka(
+async def get_topicos_kafka(
     nome: str = Query(None),
     descricao: str = Query(None),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     stmt = select(TopicoKafka)
     
     if nome:
-        stmt = stmt.where(TopicoKafka.nome.ilike(f"%{nome}%"))
+        stmt = stmt.where(contains_filter(TopicoKafka.nome, nome))
     if descricao:
-        stmt = stmt.where(TopicoKafka.descricao.ilike(f"%{descricao}%"))
+        stmt = stmt.where(contains_filter(TopicoKafka.descricao, descricao))
 
-    result = session.execute(stmt).scalars().all()
+    result = (await session.execute(stmt)).scalars().all()
     if not result:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Tópicos Kafka não encontrados")
     return result
@@ -1,13 +1,22 @@
-import json
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Request
 from sqlalchemy import select, func
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from http import HTTPStatus
-from typing import List
-from infogrid.database import get_session
+from typing import List, Optional
+from infogrid.acl import acl_fields
+from infogrid.bulk import CREATED, EXISTS
+from infogrid.changes import publish_change
+from infogrid.crud import delete_returning, insert_returning, is_unique_violation, patch_returning, update_returning
+from infogrid.database import get_session, settings
+from infogrid.export import export_format, stream_export
+from infogrid.ingest import ACK_ENQUEUE, ACK_MODES, BufferFullError, access_write_buffer
+from infogrid.pagination import paginate, set_next_cursor
 from infogrid.models import RegistroAcesso as RegistroAcessoModel
-from infogrid.schemas import RegistroAcesso, RegistroAcessoPublic
+from infogrid.rollups import DIMENSIONS, ROLLUP_TABLES, access_counts
+from infogrid.schemas import ContagemAcessos, IngestaoResult, RegistroAcesso, RegistroAcessoPublic, RegistroAcessoUpdate
 import logging
 
 logger = logging.getLogger("app_logger")
@@ -15,137 +24,265 @@ logger = logging.getLogger("app_logger")
 router = APIRouter(prefix='/api/v1/registroacesso', tags=['registroacesso'])
 
 
+def _periodo(desde: Optional[datetime], ate: Optional[datetime]) -> list:
+    """
+    Filtro por data_solicitacao (desde <= data < ate). No Postgres a tabela é particionada por
+    mês nessa coluna: com o período informado só as partições do intervalo são lidas.
+    """
+    criteria = []
+    if desde is not None:
+        criteria.append(RegistroAcessoModel.data_solicitacao >= desde)
+    if ate is not None:
+        criteria.append(RegistroAcessoModel.data_solicitacao < ate)
+    return criteria
+
+
+def _com_permissoes(permissoes: List[str], dialect: str):
+    """
+    Registros que concedem todas as permissões pedidas. No Postgres é `permissoes_concedidas @> '[...]'`,
+    atendido pelo índice GIN (jsonb_path_ops); no SQLite, um EXISTS por permissão sobre json_each.
+    """
+    column = RegistroAcessoModel.permissoes_concedidas
+    if dialect == "postgresql":
+        return [column.contains(permissoes)]
+    criteria = []
+    for permissao in permissoes:
+        elementos = func.json_each(column).table_valued("value")
+        criteria.append(select(elementos.c.value).where(elementos.c.value == permissao).exists())
+    return criteria
+
+
 @router.get("/", status_code=HTTPStatus.OK, response_model=List[RegistroAcessoPublic])
-def list_registros_acesso(session: Session = Depends(get_session)):
+async def list_registros_acesso(
+    request: Request,
+    desde: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_session),
+):
     logger.info("Endpoint /registroacesso acessado")
-    registros = session.scalars(select(RegistroAcessoModel)).all()
+    media_type = export_format(request)
+    if media_type:
+        return stream_export(RegistroAcessoModel, media_type, where=_periodo(desde, ate))
+    registros = (await session.scalars(select(RegistroAcessoModel).where(*_periodo(desde, ate)))).all()
     logger.info(f"{len(registros)} registros de acesso encontrados")
 
     return registros
 
 
 @router.get("/pagined/", status_code=HTTPStatus.OK, response_model=List[RegistroAcessoPublic])
-def list_registros_acesso_paged(limit: int = 5, skip: int = 0, session: Session = Depends(get_session)):
-    logger.info(f"Endpoint /registroacesso/pagined acessado com limite {limit} e offset {skip}")
-    registros = session.scalars(select(RegistroAcessoModel).limit(limit).offset(skip)).all()
+async def list_registros_acesso_paged(
+    response: Response,
+    limit: int = 5,
+    cursor: Optional[str] = None,
+    order_by: Optional[str] = None,
+    skip: Optional[int] = Query(None, deprecated=True),
+    desde: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    logger.info(f"Endpoint /registroacesso/pagined acessado com limite {limit}, cursor {cursor} e offset {skip}")
+    stmt = paginate(select(RegistroAcessoModel).where(*_periodo(desde, ate)), RegistroAcessoModel, limit, cursor, order_by, skip, sortable=("data_solicitacao", "conjunto_dados"))
+    registros = (await session.scalars(stmt)).all()
+    set_next_cursor(response, registros, limit, order_by)
     logger.info(f"{len(registros)} registros de acesso encontrados")
     return registros
 
+
+@router.get("/busca/", status_code=HTTPStatus.OK, response_model=List[RegistroAcessoPublic])
+async def search_registros_acesso(
+    response: Response,
+    permissao: List[str] = Query([]),
+    usuario_id: Optional[int] = None,
+    conjunto_dados: Optional[str] = None,
+    status: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    order_by: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Revisão de acessos: registros que concedem todas as `permissao` informadas (repetível,
+    ex.: ?permissao=escrita&conjunto_dados=vendas), filtrados por usuário, conjunto de dados,
+    status e período. Paginado por keyset como /pagined/.
+    """
+    logger.info(f"Endpoint /registroacesso/busca acessado com permissões {permissao}, usuário {usuario_id} e conjunto {conjunto_dados}")
+    criteria = _periodo(desde, ate)
+    if permissao:
+        criteria += _com_permissoes(permissao, session.get_bind().dialect.name)
+    if usuario_id is not None:
+        criteria.append(RegistroAcessoModel.usuario_id == usuario_id)
+    if conjunto_dados is not None:
+        criteria.append(RegistroAcessoModel.conjunto_dados == conjunto_dados)
+    if status is not None:
+        criteria.append(RegistroAcessoModel.status == status)
+    stmt = paginate(select(RegistroAcessoModel).where(*criteria), RegistroAcessoModel, limit, cursor, order_by, sortable=("data_solicitacao", "conjunto_dados"))
+    registros = (await session.scalars(stmt)).all()
+    set_next_cursor(response, registros, limit, order_by)
+    logger.info(f"{len(registros)} registros de acesso encontrados na busca")
+    return registros
+
+
+@router.get("/estatisticas/", status_code=HTTPStatus.OK, response_model=List[ContagemAcessos])
+async def access_statistics(
+    granularidade: str = "dia",
+    agrupar_por: List[str] = Query(["periodo"]),
+    desde: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    conjunto_dados: Optional[str] = None,
+    usuario_id: Optional[int] = None,
+    status: Optional[str] = None,
+    limit: int = 1000,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Quantidade de registros de acesso por período (hora ou dia), conjunto de dados, usuário e
+    status, lida dos agregados mantidos a cada escrita (infogrid/rollups.py): o custo depende
+    do número de grupos, não do tamanho do log. Ex.: ?agrupar_por=periodo&agrupar_por=status.
+    """
+    logger.info(f"Endpoint /registroacesso/estatisticas acessado com granularidade {granularidade} e agrupamento {agrupar_por}")
+    if granularidade not in ROLLUP_TABLES:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"granularidade deve ser um de: {', '.join(ROLLUP_TABLES)}")
+    invalid = [dimension for dimension in agrupar_por if dimension not in DIMENSIONS]
+    if invalid:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"agrupar_por deve conter apenas: {', '.join(DIMENSIONS)}")
+    stmt = access_counts(granularidade, agrupar_por, desde, ate, conjunto_dados, usuario_id, status, limit)
+    contagens = (await session.execute(stmt)).mappings().all()
+    logger.info(f"{len(contagens)} grupos de contagem de acessos encontrados")
+    return contagens
+
 @router.post("/", status_code=HTTPStatus.CREATED, response_model=RegistroAcessoPublic)
-def create_registro_acesso(registro: RegistroAcesso, session: Session = Depends(get_session)):
+async def create_registro_acesso(registro: RegistroAcesso, session: AsyncSession = Depends(get_session)):
     """
     Creates a new access record (Registro de Acesso).
     """
     logger.info("Tentativa de criação de um novo registro de acesso")
-    with session as session:
-        # Check if the record already exists
-        db_registro = session.scalar(
-            select(RegistroAcessoModel)
-            .where(
-                (RegistroAcessoModel.usuario_id == registro.usuario_id) &
-                (RegistroAcessoModel.conjunto_dados == registro.conjunto_dados) &
-                (RegistroAcessoModel.data_solicitacao == registro.data_solicitacao)
-            )
-        )
-        if db_registro:
-            logger.warning("Tentativa de criação de registro de acesso falhou: registro já existe")
-            raise HTTPException(
-                status_code=HTTPStatus.BAD_REQUEST,
-                detail="Registro de Acesso already exists for the given criteria",
-            )
-
-        # Create a new record
-        db_instance = RegistroAcessoModel(**registro.dict())
-        session.add(db_instance)
-
+    async with session as session:
         try:
-            session.commit()
-            session.refresh(db_instance)  # Refresh to get updated instance with ID
-            logger.info(f"Registro de acesso '{db_instance.id}' criado com sucesso")
+            db_registro = await session.run_sync(insert_returning, RegistroAcessoModel, registro.dict())
         except IntegrityError as e:
-            session.rollback()
+            # (usuario_id, conjunto_dados, data_solicitacao) é único
+            if is_unique_violation(e):
+                logger.warning("Tentativa de criação de registro de acesso falhou: registro já existe")
+                raise HTTPException(
+                    status_code=HTTPStatus.BAD_REQUEST,
+                    detail="Registro de Acesso already exists for the given criteria",
+                )
             logger.error(f"Erro ao inserir registro de acesso: {str(e)}", exc_info=True)
             raise HTTPException(
                 status_code=HTTPStatus.BAD_REQUEST,
                 detail=f"Failed to insert Registro de Acesso: {e.orig.args if e.orig else str(e)}"
             )
+        await publish_change(session, "registroacesso", db_registro["id"], acesso=acl_fields(db_registro))
+    logger.info(f"Registro de acesso '{db_registro['id']}' criado com sucesso")
+    return db_registro
+
 
-    # Deserialize permissoes_concedidas if it's stored as a string
-    permissoes_concedidas = (
-        json.loads(db_instance.permissoes_concedidas)
-        if isinstance(db_instance.permissoes_concedidas, str)
-        else db_instance.permissoes_concedidas or []
-    )
-
-    # Return the created record using the response model
-    return RegistroAcessoPublic(
-        id=db_instance.id,
-        usuario_id=db_instance.usuario_id,
-        conjunto_dados=db_instance.conjunto_dados,
-        data_solicitacao=db_instance.data_solicitacao,
-        finalidade_uso=db_instance.finalidade_uso,
-        permissoes_concedidas=permissoes_concedidas,
-        status=db_instance.status,
-    )
+@router.post("/ingest/", status_code=HTTPStatus.CREATED, response_model=IngestaoResult)
+async def ingest_registro_acesso(registro: RegistroAcesso, response: Response, ack: Optional[str] = None):
+    """
+    Ingestão de alto volume: o registro entra no buffer do worker e é gravado junto com os
+    demais num INSERT multi-linha com um só COMMIT (infogrid/ingest.py). Com ack=flush
+    (padrão em ACCESS_INGEST_ACK) responde após o commit: 201 se criado, 200 se já existia;
+    com ack=enqueue responde 202 ao entrar no buffer. Buffer cheio: 503 com Retry-After.
+    """
+    ack = ack or settings.ACCESS_INGEST_ACK
+    if ack not in ACK_MODES:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"ack deve ser um de: {', '.join(ACK_MODES)}")
+    try:
+        future = access_write_buffer.submit(registro.dict(), wait=ack != ACK_ENQUEUE)
+    except BufferFullError:
+        logger.warning("Ingestão de registro de acesso recusada: buffer cheio")
+        raise HTTPException(status_code=HTTPStatus.SERVICE_UNAVAILABLE, detail="Ingestion buffer is full, retry later", headers={"Retry-After": "1"})
+    if future is None:
+        response.status_code = HTTPStatus.ACCEPTED
+        return {"status": "queued", "id": None}
+    try:
+        result = await asyncio.wait_for(future, settings.ACCESS_INGEST_FLUSH_TIMEOUT_MS / 1000)
+    except asyncio.TimeoutError:
+        # O lote pode ainda ser gravado: reenviar é seguro (o repetido volta como "exists")
+        logger.error("Ingestão de registro de acesso sem confirmação do lote dentro do prazo")
+        raise HTTPException(status_code=HTTPStatus.SERVICE_UNAVAILABLE, detail="Registro de Acesso batch not confirmed in time, retry later")
+    except Exception:
+        raise HTTPException(status_code=HTTPStatus.SERVICE_UNAVAILABLE, detail="Failed to write Registro de Acesso batch, retry later")
+    if result["status"] == EXISTS:
+        response.status_code = HTTPStatus.OK
+    elif result["status"] != CREATED:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"Failed to insert Registro de Acesso: {result['detalhe']}")
+    return {"status": result["status"], "id": result["id"]}
 
 
 @router.delete("/{registro_id}", status_code=HTTPStatus.NO_CONTENT)
-def delete_registro_acesso(registro_id: int, session: Session = Depends(get_session)):
+async def delete_registro_acesso(registro_id: int, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de exclusão do registro de acesso com ID {registro_id}")
-    with session as session:
-        db_registro = session.scalar(select(RegistroAcessoModel).where(RegistroAcessoModel.id == registro_id))
-        if not db_registro:
-            logger.warning(f"Tentativa de exclusão falhou: registro de acesso com ID {registro_id} não encontrado")
-            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Registro de Acesso not found")
-        session.delete(db_registro)
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Registro de acesso com ID {registro_id} excluído com sucesso")
+            db_registro = await session.run_sync(delete_returning, RegistroAcessoModel, registro_id)
         except IntegrityError as e:
-            session.rollback()
             logger.error(f"Erro ao excluir registro de acesso com ID {registro_id}: {str(e)}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"Registro de Acesso deletion failed: {str(e)}")
+        if db_registro is None:
+            logger.warning(f"Tentativa de exclusão falhou: registro de acesso com ID {registro_id} não encontrado")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Registro de Acesso not found")
+        await publish_change(session, "registroacesso", registro_id, deleted=True)
+    logger.info(f"Registro de acesso com ID {registro_id} excluído com sucesso")
     return {"message": "Registro de Acesso deleted successfully"}
 
-    #     session.commit()
-    # return {"message": "Registro de Acesso deleted successfully"}
-
 
 @router.put("/{registro_id}", status_code=HTTPStatus.OK, response_model=RegistroAcessoPublic)
-def update_registro_acesso(registro_id: int, registro: RegistroAcesso, session: Session = Depends(get_session)):
+async def update_registro_acesso(registro_id: int, registro: RegistroAcesso, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de atualização do registro de acesso com ID {registro_id}")
-    with session as session:
-        db_registro = session.scalar(select(RegistroAcessoModel).where(RegistroAcessoModel.id == registro_id))
-        if not db_registro:
-            logger.warning(f"Tentativa de atualização falhou: registro de acesso com ID {registro_id} não encontrado")
-            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Registro de Acesso not found")
-
-        # Atualiza os dados do registro de acesso
-        update_data = registro.dict()
-        for key, value in update_data.items():
-            setattr(db_registro, key, value)
-
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Registro de acesso com ID {registro_id} atualizado com sucesso")
+            db_registro = await session.run_sync(update_returning, RegistroAcessoModel, registro_id, registro.dict())
         except IntegrityError as e:
-            session.rollback()
             logger.error(f"Erro ao atualizar registro de acesso com ID {registro_id}: {str(e)}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Registro de Acesso update failed")
+        if db_registro is None:
+            logger.warning(f"Tentativa de atualização falhou: registro de acesso com ID {registro_id} não encontrado")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Registro de Acesso not found")
+        await publish_change(session, "registroacesso", registro_id, acesso=acl_fields(db_registro))
+    logger.info(f"Registro de acesso com ID {registro_id} atualizado com sucesso")
+    return db_registro
 
-        session.refresh(db_registro)
 
+@router.patch("/{registro_id}", status_code=HTTPStatus.OK, response_model=RegistroAcessoPublic)
+async def patch_registro_acesso(registro_id: int, registro: RegistroAcessoUpdate, session: AsyncSession = Depends(get_session)):
+    """
+    Atualiza só os campos enviados, com um único UPDATE ... RETURNING.
+    """
+    logger.info(f"Tentativa de atualização parcial do registro de acesso com ID {registro_id}")
+    data = registro.dict(exclude_unset=True)
+    if not data:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="No fields to update")
+    async with session as session:
+        try:
+            db_registro = await session.run_sync(patch_returning, RegistroAcessoModel, registro_id, data)
+        except IntegrityError:
+            logger.error(f"Falha na atualização parcial do registro de acesso com ID {registro_id}", exc_info=True)
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Registro de Acesso update failed")
+        if db_registro is None:
+            logger.warning(f"Tentativa de atualização parcial falhou: registro de acesso com ID {registro_id} não encontrado")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Registro de Acesso not found")
+        await publish_change(session, "registroacesso", registro_id, acesso=acl_fields(db_registro))
+    logger.info(f"Registro de acesso com ID {registro_id} atualizado parcialmente ({', '.join(data)})")
     return db_registro
 
 
 
 
 @router.get("/registrosacesso", status_code=HTTPStatus.OK)
-def count_databases(session: Session = Depends(get_session)):
+async def count_databases(
+    desde: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_session),
+):
     """
-    Endpoint para contar o número de registros na tabela 'registrosacesso'.
+    Endpoint para contar o número de registros na tabela 'registrosacesso'
+    (opcionalmente só os de um período de data_solicitacao).
     """
     logger.info("Endpoint /registroacesso/registrosacesso acessado para contar registros")
-    quantidade = session.scalar(select(func.count()).select_from(RegistroAcessoModel))
+    quantidade = await session.scalar(select(func.count()).select_from(RegistroAcessoModel).where(*_periodo(desde, ate)))
     logger.info(f"Quantidade de registros de acesso: {quantidade}")
     return {"quantidade": quantidade}
\ No newline at end of file
@@ -1,8 +1,18 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import select, insert, delete, join
+from typing import List
+from infogrid.changes import publish_change, publish_changes
 from infogrid.database import get_session
+from infogrid.relationships import BATCH_MAX_PAIRS, RELATIONSHIP_TARGETS, add_pairs, remove_pairs, touched_targets
+from infogrid.schemas import (
+    RelacionamentoLoteResult,
+    RelacionamentoRemocaoResult,
+    ResponsavelDatabasePar,
+    ResponsavelTabelaPar,
+    ResponsavelTopicoKafkaPar,
+)
 # from infogrid.models import responsaveis_databases, responsaveis_tabelas, responsaveis_topicos_kafka
 from infogrid.models import responsaveis_databases, responsaveis_tabelas, responsaveis_topicos_kafka, Responsavel, Database, TopicoKafka, Tabela
 
@@ -10,32 +20,67 @@ from http import HTTPStatus
 
 router = APIRouter(prefix='/api/v1/relacionamentos', tags=['relacionamentos'])
 
+
+async def _batch(session: AsyncSession, relationship: str, pairs: List[tuple], remove: bool = False):
+    """
+    Associa ou remove pares em lote numa transação e publica os alvos alterados
+    """
+    if len(pairs) > BATCH_MAX_PAIRS:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"No máximo {BATCH_MAX_PAIRS} pares por requisição")
+    async with session as session:
+        try:
+            resultado = await session.run_sync(remove_pairs if remove else add_pairs, relationship, pairs)
+        except IntegrityError:
+            # add_pairs já refez a associação ADD_PAIRS_ATTEMPTS vezes com registros sendo excluídos
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Associação em lote falhou; tente novamente")
+        alvos = touched_targets(resultado, relationship)
+        if alvos:
+            await publish_changes(session, RELATIONSHIP_TARGETS[relationship][3], alvos)
+    return resultado
+
+
 # Endpoints para responsaveis_databases
 @router.post("/responsaveis_databases/", status_code=HTTPStatus.CREATED)
-def create_responsavel_database(responsavel_id: int, database_id: int, session: Session = Depends(get_session)):
+async def create_responsavel_database(responsavel_id: int, database_id: int, session: AsyncSession = Depends(get_session)):
     stmt = insert(responsaveis_databases).values(responsavel_id=responsavel_id, database_id=database_id)
     try:
-        session.execute(stmt)
-        session.commit()
+        await session.execute(stmt)
+        await session.commit()
+        await publish_change(session, "database", database_id)
     except IntegrityError as e:
-        session.rollback()
+        await session.rollback()
         raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Relacionamento já existe")
     return {"message": "Relacionamento criado com sucesso"}
 
 @router.delete("/responsaveis_databases/", status_code=HTTPStatus.NO_CONTENT)
-def delete_responsavel_database(responsavel_id: int, database_id: int, session: Session = Depends(get_session)):
+async def delete_responsavel_database(responsavel_id: int, database_id: int, session: AsyncSession = Depends(get_session)):
     stmt = delete(responsaveis_databases).where(
         responsaveis_databases.c.responsavel_id == responsavel_id,
         responsaveis_databases.c.database_id == database_id
     )
-    result = session.execute(stmt)
+    result = await session.execute(stmt)
     if result.rowcount == 0:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Relacionamento não encontrado")
-    session.commit()
+    await session.commit()
+    await publish_change(session, "database", database_id)
     return {"message": "Relacionamento excluído com sucesso"}
 
+@router.post("/responsaveis_databases/batch", status_code=HTTPStatus.OK, response_model=RelacionamentoLoteResult)
+async def create_responsavel_database_batch(pares: List[ResponsavelDatabasePar], session: AsyncSession = Depends(get_session)):
+    """
+    Associa vários pares de uma vez: novos, existentes e ausentes (responsável ou alvo inexistente)
+    """
+    return await _batch(session, "responsaveis_databases", [(par.responsavel_id, par.database_id) for par in pares])
+
+@router.delete("/responsaveis_databases/batch", status_code=HTTPStatus.OK, response_model=RelacionamentoRemocaoResult)
+async def delete_responsavel_database_batch(pares: List[ResponsavelDatabasePar], session: AsyncSession = Depends(get_session)):
+    """
+    Remove vários pares de uma vez: removidos e ausentes (que não estavam associados)
+    """
+    return await _batch(session, "responsaveis_databases", [(par.responsavel_id, par.database_id) for par in pares], remove=True)
+
 @router.get("/responsaveis_databases/", status_code=HTTPStatus.OK)
-def get_responsavel_databases(session: Session = Depends(get_session)):
+async def get_responsavel_databases(session: AsyncSession = Depends(get_session)):
     stmt = select(
         Responsavel.id, Responsavel.nome, Database.id, Database.nome
     ).select_from(
@@ -43,7 +88,7 @@ def get_responsavel_databases(session: Session = Depends(get_session)):
     ).join(
         Database, responsaveis_databases.c.database_id == Database.id
     )
-    result = session.execute(stmt).fetchall()
+    result = (await session.execute(stmt)).fetchall()
     if not result:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Relacionamentos não encontrados")
     return [{"responsavel_id": row[0], "responsavel_nome": row[1], "database_id": row[2], "database_nome": row[3]} for row in result]
@@ -71,30 +116,46 @@ def get_responsavel_databases(session: Session = Depends(get_session)):
 
 # Endpoints para responsaveis_tabelas
 @router.post("/responsaveis_tabelas/", status_code=HTTPStatus.CREATED)
-def create_responsavel_tabela(responsavel_id: int, tabela_id: int, session: Session = Depends(get_session)):
+async def create_responsavel_tabela(responsavel_id: int, tabela_id: int, session: AsyncSession = Depends(get_session)):
     stmt = insert(responsaveis_tabelas).values(responsavel_id=responsavel_id, tabela_id=tabela_id)
     try:
-        session.execute(stmt)
-        session.commit()
+        await session.execute(stmt)
+        await session.commit()
+        await publish_change(session, "tabela", tabela_id)
     except IntegrityError as e:
-        session.rollback()
+        await session.rollback()
         raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Relacionamento já existe")
     return {"message": "Relacionamento criado com sucesso"}
 
 @router.delete("/responsaveis_tabelas/", status_code=HTTPStatus.NO_CONTENT)
-def delete_responsavel_tabela(responsavel_id: int, tabela_id: int, session: Session = Depends(get_session)):
+async def delete_responsavel_tabela(responsavel_id: int, tabela_id: int, session: AsyncSession = Depends(get_session)):
     stmt = delete(responsaveis_tabelas).where(
         responsaveis_tabelas.c.responsavel_id == responsavel_id,
         responsaveis_tabelas.c.tabela_id == tabela_id
     )
-    result = session.execute(stmt)
+    result = await session.execute(stmt)
     if result.rowcount == 0:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Relacionamento não encontrado")
-    session.commit()
+    await session.commit()
+    await publish_change(session, "tabela", tabela_id)
     return {"message": "Relacionamento excluído com sucesso"}
 
+@router.post("/responsaveis_tabelas/batch", status_code=HTTPStatus.OK, response_model=RelacionamentoLoteResult)
+async def create_responsavel_tabela_batch(pares: List[ResponsavelTabelaPar], session: AsyncSession = Depends(get_session)):
+    """
+    Associa vários pares de uma vez: novos, existentes e ausentes (responsável ou alvo inexistente)
+    """
+    return await _batch(session, "responsaveis_tabelas", [(par.responsavel_id, par.tabela_id) for par in pares])
+
+@router.delete("/responsaveis_tabelas/batch", status_code=HTTPStatus.OK, response_model=RelacionamentoRemocaoResult)
+async def delete_responsavel_tabela_batch(pares: List[ResponsavelTabelaPar], session: AsyncSession = Depends(get_session)):
+    """
+    Remove vários pares de uma vez: removidos e ausentes (que não estavam associados)
+    """
+    return await _batch(session, "responsaveis_tabelas", [(par.responsavel_id, par.tabela_id) for par in pares], remove=True)
+
 @router.get("/responsaveis_tabelas/", status_code=HTTPStatus.OK)
-def get_responsavel_tabelas(session: Session = Depends(get_session)):
+async def get_responsavel_tabelas(session: AsyncSession = Depends(get_session)):
     stmt = select(
         Responsavel.id, Responsavel.nome, Tabela.id, Tabela.nome
     ).select_from(
@@ -102,7 +163,7 @@ def get_responsavel_tabelas(session: Session = Depends(get_session)):
     ).join(
         Tabela, responsaveis_tabelas.c.tabela_id == Tabela.id
     )
-    result = session.execute(stmt).fetchall()
+    result = (await session.execute(stmt)).fetchall()
     if not result:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Relacionamentos não encontrados")
     return [{"responsavel_id": row[0], "responsavel_nome": row[1], "tabela_id": row[2], "tabela_nome": row[3]} for row in result]
@@ -111,30 +172,46 @@ def get_responsavel_tabelas(session: Session = Depends(get_session)):
 
 # Endpoints para responsaveis_topicos_kafka
 @router.post("/responsaveis_topicos_kafka/", status_code=HTTPStatus.CREATED)
-def create_responsavel_topico_kafka(responsavel_id: int, topico_kafka_id: int, session: Session = Depends(get_session)):
+async def create_responsavel_topico_kafka(responsavel_id: int, topico_kafka_id: int, session: AsyncSession = Depends(get_session)):
     stmt = insert(responsaveis_topicos_kafka).values(responsavel_id=responsavel_id, topico_kafka_id=topico_kafka_id)
     try:
-        session.execute(stmt)
-        session.commit()
+        await session.execute(stmt)
+        await session.commit()
+        await publish_change(session, "topicokafka", topico_kafka_id)
     except IntegrityError as e:
-        session.rollback()
+        await session.rollback()
         raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Relacionamento já existe")
     return {"message": "Relacionamento criado com sucesso"}
 
 @router.delete("/responsaveis_topicos_kafka/", status_code=HTTPStatus.NO_CONTENT)
-def delete_responsavel_topico_kafka(responsavel_id: int, topico_kafka_id: int, session: Session = Depends(get_session)):
+async def delete_responsavel_topico_kafka(responsavel_id: int, topico_kafka_id: int, session: AsyncSession = Depends(get_session)):
     stmt = delete(responsaveis_topicos_kafka).where(
         responsaveis_topicos_kafka.c.responsavel_id == responsavel_id,
         responsaveis_topicos_kafka.c.topico_kafka_id == topico_kafka_id
     )
-    result = session.execute(stmt)
+    result = await session.execute(stmt)
     if result.rowcount == 0:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Relacionamento não encontrado")
-    session.commit()
+    await session.commit()
+    await publish_change(session, "topicokafka", topico_kafka_id)
     return {"message": "Relacionamento excluído com sucesso"}
 
+@router.post("/responsaveis_topicos_kafka/batch", status_code=HTTPStatus.OK, response_model=RelacionamentoLoteResult)
+async def create_responsavel_topico_kafka_batch(pares: List[ResponsavelTopicoKafkaPar], session: AsyncSession = Depends(get_session)):
+    """
+    Associa vários pares de uma vez: novos, existentes e ausentes (responsável ou alvo inexistente)
+    """
+    return await _batch(session, "responsaveis_topicos_kafka", [(par.responsavel_id, par.topico_kafka_id) for par in pares])
+
+@router.delete("/responsaveis_topicos_kafka/batch", status_code=HTTPStatus.OK, response_model=RelacionamentoRemocaoResult)
+async def delete_responsavel_topico_kafka_batch(pares: List[ResponsavelTopicoKafkaPar], session: AsyncSession = Depends(get_session)):
+    """
+    Remove vários pares de uma vez: removidos e ausentes (que não estavam associados)
+    """
+    return await _batch(session, "responsaveis_topicos_kafka", [(par.responsavel_id, par.topico_kafka_id) for par in pares], remove=True)
+
 @router.get("/responsaveis_topicos_kafka/", status_code=HTTPStatus.OK)
-def get_responsavel_topicos_kafka(session: Session = Depends(get_session)):
+async def get_responsavel_topicos_kafka(session: AsyncSession = Depends(get_session)):
     stmt = select(
         Responsavel.id, Responsavel.nome, TopicoKafka.id, TopicoKafka.nome
     ).select_from(
@@ -142,7 +219,7 @@ def get_responsavel_topicos_kafka(session: Session = Depends(get_session)):
     ).join(
         TopicoKafka, responsaveis_topicos_kafka.c.topico_kafka_id == TopicoKafka.id
     )
-    result = session.execute(stmt).fetchall()
+    result = (await session.execute(stmt)).fetchall()
     if not result:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Relacionamentos não encontrados")
     return [{"responsavel_id": row[0], "responsavel_nome": row[1], "topico_kafka_id": row[2], "topico_kafka_nome": row[3]} for row in result]
\ No newline at end of file
@@ -1,13 +1,17 @@
 from http import HTTPStatus
-from typing import List
-from fastapi import APIRouter, HTTPException , Depends
-from sqlalchemy import create_engine, insert, select, func
-from sqlalchemy.orm import Session, joinedload
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, Request
+from sqlalchemy import insert, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
+from infogrid.changes import publish_change, publish_changes
+from infogrid.crud import delete_returning, insert_returning, is_foreign_key_violation, is_unique_violation, patch_returning, update_returning
 from infogrid.database import get_session
+from infogrid.export import export_format, stream_export
+from infogrid.pagination import paginate, set_next_cursor
+from infogrid.upsert import SYNC_MAX_ROWS, changed_entities, sync_summary, upsert_rows
 from infogrid.models import Responsavel as ResponsavelModel
-from infogrid.schemas import Responsavel, ResponsavelPublic
-from infogrid.settings import Settings
+from infogrid.schemas import Responsavel, ResponsavelPublic, ResponsavelUpdate, SyncResult
 import logging
 
 logger = logging.getLogger("app_logger")
@@ -19,17 +23,29 @@ router = APIRouter(prefix='/api/v1/responsavel', tags=['responsavel'])
 
 
 @router.get("/", status_code=HTTPStatus.OK, response_model=List[ResponsavelPublic])
-def list_responsavel(session: Session = Depends(get_session)):
+async def list_responsavel(request: Request, session: AsyncSession = Depends(get_session)):
     logger.info("Endpoint /responsavel acessado")
-    responsavel = session.scalars(select(ResponsavelModel)).all()
+    media_type = export_format(request)
+    if media_type:
+        return stream_export(ResponsavelModel, media_type)
+    responsavel = (await session.scalars(select(ResponsavelModel))).all()
     logger.info(f"{len(responsavel)} responsáveis encontrados")
     return responsavel
 
 
 @router.get("/pagined/", status_code=HTTPStatus.OK, response_model=List[ResponsavelPublic]) 
-def list_responsavel_paged(limit: int = 5, skip: int = 0, session: Session = Depends(get_session)):
-    logger.info(f"Endpoint /responsavel/pagined acessado com limite {limit} e offset {skip}")
-    responsavel = session.scalars(select(ResponsavelModel).limit(limit).offset(skip)).all()
+async def list_responsavel_paged(
+    response: Response,
+    limit: int = 5,
+    cursor: Optional[str] = None,
+    order_by: Optional[str] = None,
+    skip: Optional[int] = Query(None, deprecated=True),
+    session: AsyncSession = Depends(get_session),
+):
+    logger.info(f"Endpoint /responsavel/pagined acessado com limite {limit}, cursor {cursor} e offset {skip}")
+    stmt = paginate(select(ResponsavelModel), ResponsavelModel, limit, cursor, order_by, skip, sortable=("nome", "email"))
+    responsavel = (await session.scalars(stmt)).all()
+    set_next_cursor(response, responsavel, limit, order_by)
     logger.info(f"{len(responsavel)} responsáveis encontrados")
     return responsavel
 
@@ -37,105 +53,119 @@ def list_responsavel_paged(limit: int = 5, skip: int = 0, session: Session = Dep
 
 
 @router.post("/", status_code=HTTPStatus.CREATED, response_model=ResponsavelPublic)
-def create_responsavel(responsavel: Responsavel):
+async def create_responsavel(responsavel: Responsavel, session: AsyncSession = Depends(get_session)):
     logger.info("Tentativa de criação de um novo responsável")
-    engine = create_engine(Settings().DATABASE_URL)
-    with Session(engine) as session:
-        db_responsavel = session.scalar(select(ResponsavelModel).where(ResponsavelModel.email == responsavel.email))
-        if db_responsavel:
-            logger.warning("Tentativa de criação de responsável falhou: responsável já existe")
-            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Responsavel already exists")
-        data = responsavel.dict(exclude={"responsaveis"})
-        db_instance = ResponsavelModel(**data)
-        session.add(db_instance)
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Responsável '{db_instance.nome}' criado com sucesso")
-        except IntegrityError:
-            session.rollback()
+            db_responsavel = await session.run_sync(insert_returning, ResponsavelModel, responsavel.dict())
+        except IntegrityError as e:
+            if is_unique_violation(e):
+                logger.warning("Tentativa de criação de responsável falhou: responsável já existe")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Responsavel already exists")
             logger.error("Erro ao inserir responsável", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Responsavel insertion failed")
-        session.refresh(db_instance)
-
-    # Ensure all required fields are included
-    return {
-        "id": db_instance.id,
-        "nome": db_instance.nome,
-        "email": db_instance.email,
-        "responsaveis": [],
-        "cargo": db_instance.cargo,  
-        "telefone": db_instance.telefone,  
-    }
+        await publish_change(session, "responsavel", db_responsavel["id"], db_responsavel["nome"])
+    logger.info(f"Responsável '{db_responsavel['nome']}' criado com sucesso")
+    return db_responsavel
+
+@router.post("/sync", status_code=HTTPStatus.OK, response_model=SyncResult)
+async def sync_responsaveis(responsaveis: List[Responsavel], session: AsyncSession = Depends(get_session)):
+    """
+    Upsert idempotente por email: cria os novos, atualiza os alterados e mantém os iguais
+    """
+    logger.info(f"Sync de {len(responsaveis)} responsáveis")
+    if len(responsaveis) > SYNC_MAX_ROWS:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"No máximo {SYNC_MAX_ROWS} linhas por requisição")
+
+    rows = [responsavel.dict() for responsavel in responsaveis]
+    async with session as session:
+        try:
+            resultados = await session.run_sync(upsert_rows, "responsavel", rows)
+        except IntegrityError as e:
+            # Nada é gravado: o sync roda numa única transação
+            if is_foreign_key_violation(e):
+                logger.warning("Sync de responsáveis falhou: chave estrangeira violada")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Responsáveis sync failed: referência a registro inexistente")
+            if is_unique_violation(e):
+                logger.warning("Sync de responsáveis falhou: conflito com registro existente")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Responsáveis sync failed: registro já existe")
+            logger.error("Falha no sync de responsáveis", exc_info=True)
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Responsáveis sync failed")
+        alterados = changed_entities(rows, resultados)
+        if alterados:
+            await publish_changes(session, "responsavel", alterados)
+
+    logger.info(f"Sync de responsáveis concluído: {len(alterados)} criados ou atualizados")
+    return sync_summary(resultados)
+
 
 @router.delete("/{responsavel_id}", status_code=HTTPStatus.NO_CONTENT)
-def delete_responsavel(responsavel_id: int, session: Session = Depends(get_session)):
+async def delete_responsavel(responsavel_id: int, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de exclusão do responsável com ID {responsavel_id}")
-    with session as session:
-        db_database = session.scalar(select(ResponsavelModel).where(ResponsavelModel.id == responsavel_id))
-        if not db_database:
-            logger.warning(f"Tentativa de exclusão falhou: responsável com ID {responsavel_id} não encontrado")
-            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Responsavel not found")
-        session.delete(db_database)
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Responsável com ID {responsavel_id} excluído com sucesso")
+            db_responsavel = await session.run_sync(delete_returning, ResponsavelModel, responsavel_id)
         except IntegrityError as e:
-            session.rollback()
             logger.error(f"Erro ao excluir responsável com ID {responsavel_id}: {str(e)}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"Responsavel deletion failed: {str(e)}")
+        if db_responsavel is None:
+            logger.warning(f"Tentativa de exclusão falhou: responsável com ID {responsavel_id} não encontrado")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Responsavel not found")
+        await publish_change(session, "responsavel", responsavel_id, deleted=True)
+    logger.info(f"Responsável com ID {responsavel_id} excluído com sucesso")
     return {"message": "Responsavel deleted successfully"}
 
-    #     session.commit()
-    # return {"message": "Responsavel deleted successfully"}
-
 
 
 
 @router.put("/{responsavel_id}", status_code=HTTPStatus.OK, response_model=ResponsavelPublic)
-def update_responsavel(responsavel_id: int, responsavel: Responsavel, session: Session = Depends(get_session)):
+async def update_responsavel(responsavel_id: int, responsavel: Responsavel, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de atualização do responsável com ID {responsavel_id}")
-    with session as session:
-        # Carrega o responsável com os relacionamentos necessários
-        db_responsavel = session.scalar(
-            select(ResponsavelModel)
-            .where(ResponsavelModel.id == responsavel_id)
-            .options(
-                joinedload(ResponsavelModel.databases),  # Carrega relacionamentos com databases
-                joinedload(ResponsavelModel.tabelas),  # Carrega relacionamentos com tabelas
-                joinedload(ResponsavelModel.topicos_kafka)  # Carrega relacionamentos com tópicos Kafka
-            )
-        )
-        if not db_responsavel:
+    async with session as session:
+        try:
+            db_responsavel = await session.run_sync(update_returning, ResponsavelModel, responsavel_id, responsavel.dict())
+        except IntegrityError:
+            logger.error(f"Erro ao atualizar responsável com ID {responsavel_id}", exc_info=True)
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Responsável update failed")
+        if db_responsavel is None:
             logger.warning(f"Tentativa de atualização falhou: responsável com ID {responsavel_id} não encontrado")
             raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Responsável not found")
+        await publish_change(session, "responsavel", responsavel_id, db_responsavel["nome"])
+    logger.info(f"Responsável com ID {responsavel_id} atualizado com sucesso")
+    return db_responsavel
 
-        # Atualiza os dados do responsável
-        update_data = responsavel.dict(exclude={"databases", "tabelas", "topicos_kafka"})
-        for key, value in update_data.items():
-            setattr(db_responsavel, key, value)
 
+@router.patch("/{responsavel_id}", status_code=HTTPStatus.OK, response_model=ResponsavelPublic)
+async def patch_responsavel(responsavel_id: int, responsavel: ResponsavelUpdate, session: AsyncSession = Depends(get_session)):
+    """
+    Atualiza só os campos enviados, com um único UPDATE ... RETURNING.
+    """
+    logger.info(f"Tentativa de atualização parcial do responsável com ID {responsavel_id}")
+    data = responsavel.dict(exclude_unset=True)
+    if not data:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="No fields to update")
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Responsável com ID {responsavel_id} atualizado com sucesso")
+            db_responsavel = await session.run_sync(patch_returning, ResponsavelModel, responsavel_id, data)
         except IntegrityError:
-            session.rollback()
-            logger.error(f"Erro ao atualizar responsável com ID {responsavel_id}", exc_info=True)
+            logger.error(f"Falha na atualização parcial do responsável com ID {responsavel_id}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Responsável update failed")
-
-        # Atualiza o objeto para refletir as mudanças
-        session.refresh(db_responsavel)
-
+        if db_responsavel is None:
+            logger.warning(f"Tentativa de atualização parcial falhou: responsável com ID {responsavel_id} não encontrado")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Responsável not found")
+        await publish_change(session, "responsavel", responsavel_id, db_responsavel["nome"])
+    logger.info(f"Responsável com ID {responsavel_id} atualizado parcialmente ({', '.join(data)})")
     return db_responsavel
 
 
 
 @router.get("/responsaveis", status_code=HTTPStatus.OK)
-def count_responsaveis(session: Session = Depends(get_session)):
+async def count_responsaveis(session: AsyncSession = Depends(get_session)):
     """
     Endpoint para contar o número de registros na tabela 'responsaveis'.
     """
     logger.info("Endpoint /responsavel/responsaveis acessado para contar registros")
-    quantidade = session.scalar(select(func.count()).select_from(ResponsavelModel))
+    quantidade = await session.scalar(select(func.count()).select_from(ResponsavelModel))
     logger.info(f"Quantidade de responsáveis: {quantidade}")
     return {"quantidade": quantidade}
 
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Request
 from sqlalchemy import select, func
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from http import HTTPStatus
-from typing import List
+from typing import List, Optional
+from infogrid.changes import publish_change, publish_changes
+from infogrid.crud import delete_returning, insert_returning, is_foreign_key_violation, is_unique_violation, patch_returning, update_returning
 from infogrid.database import get_session
+from infogrid.export import export_format, stream_export
+from infogrid.pagination import paginate, set_next_cursor
+from infogrid.upsert import SYNC_MAX_ROWS, changed_entities, sync_summary, upsert_rows
 from infogrid.models import Database as DatabaseModel
-from infogrid.schemas import Database, DatabasePublic
+from infogrid.schemas import Database, DatabasePublic, DatabaseSummary, DatabaseUpdate, SyncResult
 import logging
 
 logger = logging.getLogger("app_logger")
@@ -16,121 +22,154 @@ router = APIRouter(prefix='/api/v1/database', tags=['routerdatabase'])
 
 
 
+# As listagens serializam `responsaveis` de cada linha: selectinload busca todos com uma
+# única consulta IN (total de 2 consultas por página, sem duplicar linhas sob LIMIT).
+# O PUT devolve a linha do UPDATE ... RETURNING e lê os responsáveis numa consulta (infogrid/crud.py).
+# O PATCH devolve só a linha (DatabaseSummary), sem consultar os responsáveis.
 @router.get("/", status_code=HTTPStatus.OK, response_model=List[DatabasePublic])
-def list_databases(session: Session = Depends(get_session)):
+async def list_databases(request: Request, session: AsyncSession = Depends(get_session)):
     logger.info("Endpoint /routerdatabase/dados acessado")
-    databases = session.scalars(select(DatabaseModel)).all()
+    media_type = export_format(request)
+    if media_type:
+        return stream_export(DatabaseModel, media_type)
+    databases = (await session.scalars(select(DatabaseModel).options(selectinload(DatabaseModel.responsaveis)))).all()
     logger.info(f"{len(databases)} bancos de dados encontrados")
     return databases
 
 
 @router.get("/pagined/", status_code=HTTPStatus.OK, response_model=List[DatabasePublic])
-def list_databases_paged(limit: int = 5, skip: int = 0, session: Session = Depends(get_session)):
-    logger.info(f"Endpoint /routerdatabase/pagined acessado com limite {limit} e offset {skip}")
-    databases = session.scalars(select(DatabaseModel).limit(limit).offset(skip)).all()
+async def list_databases_paged(
+    response: Response,
+    limit: int = 5,
+    cursor: Optional[str] = None,
+    order_by: Optional[str] = None,
+    skip: Optional[int] = Query(None, deprecated=True),
+    session: AsyncSession = Depends(get_session),
+):
+    logger.info(f"Endpoint /routerdatabase/pagined acessado com limite {limit}, cursor {cursor} e offset {skip}")
+    stmt = paginate(select(DatabaseModel).options(selectinload(DatabaseModel.responsaveis)), DatabaseModel, limit, cursor, order_by, skip, sortable=("nome",))
+    databases = (await session.scalars(stmt)).all()
+    set_next_cursor(response, databases, limit, order_by)
     logger.info(f"{len(databases)} bancos de dados encontrados")
     return databases
 
 
 @router.post("/", status_code=HTTPStatus.CREATED, response_model=DatabasePublic)
-def create_database(database: Database, session: Session = Depends(get_session)):
+async def create_database(database: Database, session: AsyncSession = Depends(get_session)):
     """
     Cria um novo banco de dados ignorando os responsáveis, tabelas e tópicos Kafka associados
-    
     """
     logger.info("Tentativa de criação de um novo banco de dados")
-    with session as session:
-        db_database = session.scalar(select(DatabaseModel).where(DatabaseModel.nome == database.nome))
-        if db_database:
-            logger.warning("Tentativa de criação de banco de dados falhou: banco de dados já existe")
-            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Database already exists")
-        data = database.dict(exclude={"responsaveis", "tabelas", "topicos_kafka"})
-        db_instance = DatabaseModel(**data)
-
-        # db_instance = DatabaseModel(**database.dict(exclude_unset=True))
-        session.add(db_instance)
+    data = database.dict(exclude={"responsaveis", "tabelas", "topicos_kafka"})
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Banco de dados '{db_instance.nome}' inserido com sucesso")
-        except IntegrityError:
-            session.rollback()
+            db_database = await session.run_sync(insert_returning, DatabaseModel, data)
+        except IntegrityError as e:
+            if is_unique_violation(e):
+                logger.warning("Tentativa de criação de banco de dados falhou: banco de dados já existe")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Database already exists")
             logger.error("Falha na inserção do banco de dados", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Database insertion failed")
-        session.refresh(db_instance)
-        # session.execute(insert(DatabaseModel).values(database.dict(exclude_unset=True)))
-        # session.commit()
-        # session.refresh(db_instance)
-    return {
-        "id": db_instance.id,
-        "nome": db_instance.nome,
-        "tecnologia": db_instance.tecnologia,
-        "descricao": db_instance.descricao,
-        "responsaveis": []
-    }
-    # return database
+        await publish_change(session, "database", db_database["id"], db_database["nome"])
+    logger.info(f"Banco de dados '{db_database['nome']}' inserido com sucesso")
+    return db_database
+
+
+@router.post("/sync", status_code=HTTPStatus.OK, response_model=SyncResult)
+async def sync_databases(databases: List[Database], session: AsyncSession = Depends(get_session)):
+    """
+    Upsert idempotente por nome: cria os novos, atualiza os alterados e mantém os iguais
+    (os responsáveis não são sincronizados, como no POST)
+    """
+    logger.info(f"Sync de {len(databases)} bancos de dados")
+    if len(databases) > SYNC_MAX_ROWS:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"No máximo {SYNC_MAX_ROWS} linhas por requisição")
+
+    rows = [database.dict(exclude={"responsaveis", "tabelas", "topicos_kafka"}) for database in databases]
+    async with session as session:
+        try:
+            resultados = await session.run_sync(upsert_rows, "database", rows)
+        except IntegrityError as e:
+            # Nada é gravado: o sync roda numa única transação
+            if is_foreign_key_violation(e):
+                logger.warning("Sync de bancos de dados falhou: chave estrangeira violada")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Bancos de dados sync failed: referência a registro inexistente")
+            if is_unique_violation(e):
+                logger.warning("Sync de bancos de dados falhou: conflito com registro existente")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Bancos de dados sync failed: registro já existe")
+            logger.error("Falha no sync de bancos de dados", exc_info=True)
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Bancos de dados sync failed")
+        alterados = changed_entities(rows, resultados)
+        if alterados:
+            await publish_changes(session, "database", alterados)
+
+    logger.info(f"Sync de bancos de dados concluído: {len(alterados)} criados ou atualizados")
+    return sync_summary(resultados)
 
 
 @router.delete("/{database_id}", status_code=HTTPStatus.NO_CONTENT)
-def delete_database(database_id: int, session: Session = Depends(get_session)):
+async def delete_database(database_id: int, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de exclusão do banco de dados com ID {database_id}")
-    with session as session:
-        db_database = session.scalar(select(DatabaseModel).where(DatabaseModel.id == database_id))
-        if not db_database:
-            logger.warning(f"Tentativa de exclusão falhou: banco de dados com ID {database_id} não encontrado")
-            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Database not found")
-        session.delete(db_database)
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Banco de dados com ID {database_id} excluído com sucesso")
+            db_database = await session.run_sync(delete_returning, DatabaseModel, database_id)
         except IntegrityError:
-            session.rollback()
             logger.error(f"Falha na exclusão do banco de dados com ID {database_id}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Database deletion failed")
+        if db_database is None:
+            logger.warning(f"Tentativa de exclusão falhou: banco de dados com ID {database_id} não encontrado")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Database not found")
+        await publish_change(session, "database", database_id, deleted=True)
+    logger.info(f"Banco de dados com ID {database_id} excluído com sucesso")
     return {"message": "Database deleted successfully"}
 
-    #     session.commit()
-    # return {"message": "Database deleted successfully"}
-
 
 @router.put("/{database_id}", status_code=HTTPStatus.OK, response_model=DatabasePublic)
-def update_database(database_id: int, database: Database, session: Session = Depends(get_session)):
+async def update_database(database_id: int, database: Database, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de atualização do banco de dados com ID {database_id}")
-    with session as session:
-        # Carrega o database com os relacionamentos necessários
-        db_database = session.scalar(
-            select(DatabaseModel)
-            .where(DatabaseModel.id == database_id)
-            .options(joinedload(DatabaseModel.responsaveis))  # Carrega responsaveis
-        )
-        if not db_database:
+    async with session as session:
+        try:
+            db_database = await session.run_sync(update_returning, DatabaseModel, database_id, database.dict(exclude={"responsaveis"}))
+        except IntegrityError:
+            logger.error(f"Falha na atualização do banco de dados com ID {database_id}", exc_info=True)
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Database update failed")
+        if db_database is None:
             logger.warning(f"Tentativa de atualização falhou: banco de dados com ID {database_id} não encontrado")
             raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Database not found")
+        await publish_change(session, "database", database_id, db_database["nome"])
+    logger.info(f"Banco de dados com ID {database_id} atualizado com sucesso")
+    return db_database
 
-        # Atualiza os dados do database
-        update_data = database.dict(exclude={"responsaveis"})
-        for key, value in update_data.items():
-            setattr(db_database, key, value)
 
+@router.patch("/{database_id}", status_code=HTTPStatus.OK, response_model=DatabaseSummary)
+async def patch_database(database_id: int, database: DatabaseUpdate, session: AsyncSession = Depends(get_session)):
+    """
+    Atualiza só os campos enviados, com um único UPDATE ... RETURNING.
+    """
+    logger.info(f"Tentativa de atualização parcial do banco de dados com ID {database_id}")
+    data = database.dict(exclude_unset=True)
+    if not data:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="No fields to update")
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Banco de dados com ID {database_id} atualizado com sucesso")
+            db_database = await session.run_sync(patch_returning, DatabaseModel, database_id, data)
         except IntegrityError:
-            session.rollback()
-            logger.error(f"Falha na atualização do banco de dados com ID {database_id}", exc_info=True)
+            logger.error(f"Falha na atualização parcial do banco de dados com ID {database_id}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Database update failed")
-
-        # Atualiza o objeto para refletir as mudanças
-        session.refresh(db_database)
-
+        if db_database is None:
+            logger.warning(f"Tentativa de atualização parcial falhou: banco de dados com ID {database_id} não encontrado")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Database not found")
+        await publish_change(session, "database", database_id, db_database["nome"])
+    logger.info(f"Banco de dados com ID {database_id} atualizado parcialmente ({', '.join(data)})")
     return db_database
 
 
 @router.get("/databases", status_code=HTTPStatus.OK)
-def count_databases(session: Session = Depends(get_session)):
+async def count_databases(session: AsyncSession = Depends(get_session)):
     """
     Endpoint para contar o número de registros na tabela 'databases'.
     """
     logger.info("Endpoint /routerdatabase/databases acessado para contar registros")
-    quantidade = session.scalar(select(func.count()).select_from(DatabaseModel))
+    quantidade = await session.scalar(select(func.count()).select_from(DatabaseModel))
     logger.info(f"Quantidade de bancos de dados: {quantidade}")
     return {"quantidade": quantidade}
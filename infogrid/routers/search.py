@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from http import HTTPStatus
+from typing import List, Optional
+from infogrid.database import get_session
+from infogrid.schemas import SearchHit
+from infogrid.search import SEARCH_TARGETS, build_search_query
+import logging
+
+logger = logging.getLogger("app_logger")
+
+router = APIRouter(prefix='/api/v1/search', tags=['search'])
+
+
+@router.get("/", status_code=HTTPStatus.OK, response_model=List[SearchHit])
+async def search_catalog(
+    q: str = Query(..., min_length=2),
+    tipos: Optional[List[str]] = Query(None),
+    limit: int = Query(20, ge=1, le=200),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Busca textual em databases, tabelas, colunas, tópicos Kafka, colunas de tópicos e responsáveis,
+    com resultados tipados e ordenados por relevância numa única consulta.
+    """
+    logger.info(f"Endpoint /search acessado com termo '{q}' e tipos {tipos}")
+    if tipos:
+        invalidos = set(tipos) - set(SEARCH_TARGETS)
+        if invalidos:
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"Tipos inválidos: {', '.join(sorted(invalidos))}")
+    stmt = build_search_query(q, session.get_bind().dialect.name, tipos, limit)
+    hits = (await session.execute(stmt)).mappings().all()
+    logger.info(f"{len(hits)} resultados encontrados")
+    return hits
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, HTTPException, Query
+from http import HTTPStatus
+from typing import List, Optional
+from infogrid.schemas import Suggestion
+from infogrid.suggest import SUGGEST_TARGETS, suggest_index
+
+router = APIRouter(prefix='/api/v1/suggest', tags=['suggest'])
+
+
+@router.get("/", status_code=HTTPStatus.OK, response_model=List[Suggestion])
+async def suggest(
+    q: str = Query(..., min_length=1),
+    tipos: Optional[List[str]] = Query(None),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """
+    Autocomplete de nomes do catálogo a partir do índice de prefixos em memória (não consulta o banco).
+    """
+    if tipos and set(tipos) - set(SUGGEST_TARGETS):
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"Tipos válidos: {', '.join(SUGGEST_TARGETS)}")
+    return suggest_index.suggest(q, limit, tipos)
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Request
 from sqlalchemy import select, func
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from http import HTTPStatus
-from typing import List
+from typing import List, Optional
+from infogrid.changes import publish_change, publish_changes
+from infogrid.crud import delete_returning, insert_returning, is_foreign_key_violation, is_unique_violation, patch_returning, update_returning
 from infogrid.database import get_session
+from infogrid.export import export_format, stream_export
+from infogrid.pagination import paginate, set_next_cursor
+from infogrid.upsert import SYNC_MAX_ROWS, changed_entities, sync_summary, upsert_rows
 from infogrid.models import Tabela as TabelaModel
-from infogrid.schemas import Tabela, TabelaPublic
+from infogrid.schemas import SyncResult, Tabela, TabelaPublic, TabelaSummary, TabelaUpdate
 import logging
 
 logger = logging.getLogger("app_logger")
@@ -14,123 +20,152 @@ logger = logging.getLogger("app_logger")
 router = APIRouter(prefix='/api/v1/tabela', tags=['tabela'])
 
 
+# Responsáveis em lote via selectinload (mesma estratégia de routerdatabase)
 @router.get("/", status_code=HTTPStatus.OK, response_model=List[TabelaPublic])
-def list_tabelas(session: Session = Depends(get_session)):
+async def list_tabelas(request: Request, session: AsyncSession = Depends(get_session)):
     logger.info("Endpoint /tabela acessado")
-    tabelas = session.scalars(select(TabelaModel)).all()
+    media_type = export_format(request)
+    if media_type:
+        return stream_export(TabelaModel, media_type)
+    tabelas = (await session.scalars(select(TabelaModel).options(selectinload(TabelaModel.responsaveis)))).all()
     logger.info(f"{len(tabelas)} tabelas encontradas")
     return tabelas
 
 
 @router.get("/pagined/", status_code=HTTPStatus.OK, response_model=List[TabelaPublic])
-def list_tabelas_paged(limit: int = 5, skip: int = 0, session: Session = Depends(get_session)):
-    logger.info(f"Endpoint /tabela/pagined acessado com limite {limit} e offset {skip}")
-    tabelas = session.scalars(select(TabelaModel).limit(limit).offset(skip)).all()
+async def list_tabelas_paged(
+    response: Response,
+    limit: int = 5,
+    cursor: Optional[str] = None,
+    order_by: Optional[str] = None,
+    skip: Optional[int] = Query(None, deprecated=True),
+    session: AsyncSession = Depends(get_session),
+):
+    logger.info(f"Endpoint /tabela/pagined acessado com limite {limit}, cursor {cursor} e offset {skip}")
+    stmt = paginate(select(TabelaModel).options(selectinload(TabelaModel.responsaveis)), TabelaModel, limit, cursor, order_by, skip, sortable=("nome",))
+    tabelas = (await session.scalars(stmt)).all()
+    set_next_cursor(response, tabelas, limit, order_by)
     logger.info(f"{len(tabelas)} tabelas encontradas")
     return tabelas
 
 
 @router.post("/", status_code=HTTPStatus.CREATED, response_model=TabelaPublic)
-def create_tabela(tabela: Tabela, session: Session = Depends(get_session)):
+async def create_tabela(tabela: Tabela, session: AsyncSession = Depends(get_session)):
     """
     Cria uma nova tabela ignorando os responsáveis associados
     """
     logger.info("Tentativa de criação de uma nova tabela")
-    with session as session:
-        db_tabela = session.scalar(select(TabelaModel).where(TabelaModel.nome == tabela.nome))
-        if db_tabela:
-            logger.warning("Tentativa de criação de tabela falhou: tabela já existe")
-            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tabela already exists")
-
-        data = tabela.dict(exclude={"responsaveis"})
-        db_instance = TabelaModel(**data)
-        session.add(db_instance)
-
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Tabela '{db_instance.nome}' criada com sucesso")
-        except IntegrityError:
-            session.rollback()
+            db_tabela = await session.run_sync(insert_returning, TabelaModel, tabela.dict(exclude={"responsaveis"}))
+        except IntegrityError as e:
+            if is_unique_violation(e):
+                logger.warning("Tentativa de criação de tabela falhou: tabela já existe")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tabela already exists")
             logger.error("Erro ao inserir tabela", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tabela insertion failed")
+        await publish_change(session, "tabela", db_tabela["id"], db_tabela["nome"])
+    logger.info(f"Tabela '{db_tabela['nome']}' criada com sucesso")
+    return db_tabela
 
-        session.refresh(db_instance)
 
-    return {
-        "id": db_instance.id,
-        "nome": db_instance.nome,
-        "descricao": db_instance.descricao,
-        "database_id": db_instance.database_id,
-        "responsaveis": [],
-        "estado_atual": db_instance.estado_atual,
-        "qualidade": db_instance.qualidade,
-        "conformidade": db_instance.conformidade,
-    }
+@router.post("/sync", status_code=HTTPStatus.OK, response_model=SyncResult)
+async def sync_tabelas(tabelas: List[Tabela], session: AsyncSession = Depends(get_session)):
+    """
+    Upsert idempotente por (database_id, nome): cria os novos, atualiza os alterados e mantém os iguais
+    (os responsáveis não são sincronizados, como no POST)
+    """
+    logger.info(f"Sync de {len(tabelas)} tabelas")
+    if len(tabelas) > SYNC_MAX_ROWS:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"No máximo {SYNC_MAX_ROWS} linhas por requisição")
+
+    rows = [tabela.dict(exclude={"responsaveis"}) for tabela in tabelas]
+    async with session as session:
+        try:
+            resultados = await session.run_sync(upsert_rows, "tabela", rows)
+        except IntegrityError as e:
+            # Nada é gravado: o sync roda numa única transação
+            if is_foreign_key_violation(e):
+                logger.warning("Sync de tabelas falhou: database excluído durante o sync")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tabelas sync failed: referência a registro inexistente")
+            if is_unique_violation(e):
+                logger.warning("Sync de tabelas falhou: conflito com registro existente")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tabelas sync failed: registro já existe")
+            logger.error("Falha no sync de tabelas", exc_info=True)
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tabelas sync failed")
+        alterados = changed_entities(rows, resultados)
+        if alterados:
+            await publish_changes(session, "tabela", alterados)
+
+    logger.info(f"Sync de tabelas concluído: {len(alterados)} criados ou atualizados")
+    return sync_summary(resultados)
 
 
 @router.delete("/{tabela_id}", status_code=HTTPStatus.NO_CONTENT)
-def delete_tabela(tabela_id: int, session: Session = Depends(get_session)):
+async def delete_tabela(tabela_id: int, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de exclusão da tabela com ID {tabela_id}")
-    with session as session:
-        db_tabela = session.scalar(select(TabelaModel).where(TabelaModel.id == tabela_id))
-        if not db_tabela:
-            logger.warning(f"Tentativa de exclusão falhou: tabela com ID {tabela_id} não encontrada")
-            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Tabela not found")
-        session.delete(db_tabela)
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Tabela com ID {tabela_id} excluída com sucesso")
+            db_tabela = await session.run_sync(delete_returning, TabelaModel, tabela_id)
         except IntegrityError as e:
-            session.rollback()
             logger.error(f"Erro ao excluir tabela com ID {tabela_id}: {str(e)}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"Tabela deletion failed: {str(e)}")
+        if db_tabela is None:
+            logger.warning(f"Tentativa de exclusão falhou: tabela com ID {tabela_id} não encontrada")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Tabela not found")
+        await publish_change(session, "tabela", tabela_id, deleted=True)
+    logger.info(f"Tabela com ID {tabela_id} excluída com sucesso")
     return {"message": "Tabela deleted successfully"}
 
-    #     session.commit()
-    # return {"message": "Tabela deleted successfully"}
-
 
 @router.put("/{tabela_id}", status_code=HTTPStatus.OK, response_model=TabelaPublic)
-def update_tabela(tabela_id: int, tabela: Tabela, session: Session = Depends(get_session)):
+async def update_tabela(tabela_id: int, tabela: Tabela, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de atualização da tabela com ID {tabela_id}")
-    with session as session:
-        # Carrega a tabela com os relacionamentos necessários
-        db_tabela = session.scalar(
-            select(TabelaModel)
-            .where(TabelaModel.id == tabela_id)
-            .options(joinedload(TabelaModel.responsaveis))  # Carrega responsaveis
-        )
-        if not db_tabela:
+    async with session as session:
+        try:
+            db_tabela = await session.run_sync(update_returning, TabelaModel, tabela_id, tabela.dict(exclude={"responsaveis"}))
+        except IntegrityError:
+            logger.error(f"Erro ao atualizar tabela com ID {tabela_id}", exc_info=True)
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tabela update failed")
+        if db_tabela is None:
             logger.warning(f"Tentativa de atualização falhou: tabela com ID {tabela_id} não encontrada")
             raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Tabela not found")
+        await publish_change(session, "tabela", tabela_id, db_tabela["nome"])
+    logger.info(f"Tabela com ID {tabela_id} atualizada com sucesso")
+    return db_tabela
 
-        # Atualiza os dados da tabela
-        update_data = tabela.dict(exclude={"responsaveis"})
-        for key, value in update_data.items():
-            setattr(db_tabela, key, value)
 
+@router.patch("/{tabela_id}", status_code=HTTPStatus.OK, response_model=TabelaSummary)
+async def patch_tabela(tabela_id: int, tabela: TabelaUpdate, session: AsyncSession = Depends(get_session)):
+    """
+    Atualiza só os campos enviados, com um único UPDATE ... RETURNING.
+    """
+    logger.info(f"Tentativa de atualização parcial da tabela com ID {tabela_id}")
+    data = tabela.dict(exclude_unset=True)
+    if not data:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="No fields to update")
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Tabela com ID {tabela_id} atualizada com sucesso")
+            db_tabela = await session.run_sync(patch_returning, TabelaModel, tabela_id, data)
         except IntegrityError:
-            session.rollback()
-            logger.error(f"Erro ao atualizar tabela com ID {tabela_id}", exc_info=True)
+            logger.error(f"Falha na atualização parcial da tabela com ID {tabela_id}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tabela update failed")
-
-        # Atualiza o objeto para refletir as mudanças
-        session.refresh(db_tabela)
-
+        if db_tabela is None:
+            logger.warning(f"Tentativa de atualização parcial falhou: tabela com ID {tabela_id} não encontrada")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Tabela not found")
+        await publish_change(session, "tabela", tabela_id, db_tabela["nome"])
+    logger.info(f"Tabela com ID {tabela_id} atualizada parcialmente ({', '.join(data)})")
     return db_tabela
 
 
 
 
 @router.get("/tabelas", status_code=HTTPStatus.OK)
-def count_databases(session: Session = Depends(get_session)):
+async def count_databases(session: AsyncSession = Depends(get_session)):
     """
     Endpoint para contar o número de registros na tabela 'tabelas'.
     """
     logger.info("Endpoint /tabela/tabelas acessado para contar registros")
-    quantidade = session.scalar(select(func.count()).select_from(TabelaModel))
+    quantidade = await session.scalar(select(func.count()).select_from(TabelaModel))
     logger.info(f"Quantidade de tabelas: {quantidade}")
     return {"quantidade": quantidade}
\ No newline at end of file
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Request
 from sqlalchemy import select, func
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from http import HTTPStatus
-from typing import List
+from typing import List, Optional
+from infogrid.changes import publish_change, publish_changes
+from infogrid.crud import delete_returning, insert_returning, is_foreign_key_violation, is_unique_violation, patch_returning, update_returning
 from infogrid.database import get_session
+from infogrid.export import export_format, stream_export
+from infogrid.pagination import paginate, set_next_cursor
+from infogrid.upsert import SYNC_MAX_ROWS, changed_entities, sync_summary, upsert_rows
 from infogrid.models import TopicoKafka as TopicoKafkaModel
-from infogrid.schemas import TopicoKafka, TopicoKafkaPublic
+from infogrid.schemas import SyncResult, TopicoKafka, TopicoKafkaPublic, TopicoKafkaSummary, TopicoKafkaUpdate
 import logging
 
 logger = logging.getLogger("app_logger")
@@ -14,117 +20,150 @@ logger = logging.getLogger("app_logger")
 router = APIRouter(prefix='/api/v1/topicokafka', tags=['topicokafka'])
 
 
+# selectinload: 2 consultas por listagem, qualquer que seja o número de tópicos
 @router.get("/", status_code=HTTPStatus.OK, response_model=List[TopicoKafkaPublic])
-def list_topicos_kafka(session: Session = Depends(get_session)):
+async def list_topicos_kafka(request: Request, session: AsyncSession = Depends(get_session)):
     logger.info("Endpoint /topicokafka acessado")
-    topicos = session.scalars(select(TopicoKafkaModel)).all()
+    media_type = export_format(request)
+    if media_type:
+        return stream_export(TopicoKafkaModel, media_type)
+    topicos = (await session.scalars(select(TopicoKafkaModel).options(selectinload(TopicoKafkaModel.responsaveis)))).all()
     logger.info(f"{len(topicos)} tópicos Kafka encontrados")
     return topicos
 
 
 @router.get("/pagined/", status_code=HTTPStatus.OK, response_model=List[TopicoKafkaPublic])
-def list_topicos_kafka_paged(limit: int = 5, skip: int = 0, session: Session = Depends(get_session)):
-    logger.info(f"Endpoint /topicokafka/pagined acessado com limite {limit} e offset {skip}")
-    topicos = session.scalars(select(TopicoKafkaModel).limit(limit).offset(skip)).all()
+async def list_topicos_kafka_paged(
+    response: Response,
+    limit: int = 5,
+    cursor: Optional[str] = None,
+    order_by: Optional[str] = None,
+    skip: Optional[int] = Query(None, deprecated=True),
+    session: AsyncSession = Depends(get_session),
+):
+    logger.info(f"Endpoint /topicokafka/pagined acessado com limite {limit}, cursor {cursor} e offset {skip}")
+    stmt = paginate(select(TopicoKafkaModel).options(selectinload(TopicoKafkaModel.responsaveis)), TopicoKafkaModel, limit, cursor, order_by, skip, sortable=("nome",))
+    topicos = (await session.scalars(stmt)).all()
+    set_next_cursor(response, topicos, limit, order_by)
     logger.info(f"{len(topicos)} tópicos Kafka encontrados")
     return topicos
 
 
 @router.post("/", status_code=HTTPStatus.CREATED, response_model=TopicoKafkaPublic)
-def create_topico_kafka(topico: TopicoKafka, session: Session = Depends(get_session)):
+async def create_topico_kafka(topico: TopicoKafka, session: AsyncSession = Depends(get_session)):
     """
     Cria um novo tópico Kafka ignorando os responsáveis associados
     """
-    with session as session:
-        db_topico = session.scalar(select(TopicoKafkaModel).where(TopicoKafkaModel.nome == topico.nome))
-        if db_topico:
-            logger.warning("Tentativa de criação de tópico Kafka falhou: tópico já existe")
-            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tópico Kafka already exists")
-
-        data = topico.dict(exclude={"responsaveis"})
-        db_instance = TopicoKafkaModel(**data)
-        session.add(db_instance)
-
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Tópico Kafka '{db_instance.nome}' criado com sucesso")
-        except IntegrityError:
-            session.rollback()
+            db_topico = await session.run_sync(insert_returning, TopicoKafkaModel, topico.dict(exclude={"responsaveis"}))
+        except IntegrityError as e:
+            if is_unique_violation(e):
+                logger.warning("Tentativa de criação de tópico Kafka falhou: tópico já existe")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tópico Kafka already exists")
             logger.error("Erro ao inserir tópico Kafka", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tópico Kafka insertion failed")
+        await publish_change(session, "topicokafka", db_topico["id"], db_topico["nome"])
+    logger.info(f"Tópico Kafka '{db_topico['nome']}' criado com sucesso")
+    return db_topico
 
-        session.refresh(db_instance)
 
-    return {
-        "id": db_instance.id,
-        "nome": db_instance.nome,
-        "descricao": db_instance.descricao,
-        "responsaveis": [],
-        "estado_atual": db_instance.estado_atual,
-        "conformidade": db_instance.conformidade,
-    }
+@router.post("/sync", status_code=HTTPStatus.OK, response_model=SyncResult)
+async def sync_topicos_kafka(topicos: List[TopicoKafka], session: AsyncSession = Depends(get_session)):
+    """
+    Upsert idempotente por nome: cria os novos, atualiza os alterados e mantém os iguais
+    (os responsáveis não são sincronizados, como no POST)
+    """
+    logger.info(f"Sync de {len(topicos)} tópicos Kafka")
+    if len(topicos) > SYNC_MAX_ROWS:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"No máximo {SYNC_MAX_ROWS} linhas por requisição")
+
+    rows = [topico.dict(exclude={"responsaveis"}) for topico in topicos]
+    async with session as session:
+        try:
+            resultados = await session.run_sync(upsert_rows, "topicokafka", rows)
+        except IntegrityError as e:
+            # Nada é gravado: o sync roda numa única transação
+            if is_foreign_key_violation(e):
+                logger.warning("Sync de tópicos Kafka falhou: chave estrangeira violada")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tópicos Kafka sync failed: referência a registro inexistente")
+            if is_unique_violation(e):
+                logger.warning("Sync de tópicos Kafka falhou: conflito com registro existente")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tópicos Kafka sync failed: registro já existe")
+            logger.error("Falha no sync de tópicos Kafka", exc_info=True)
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tópicos Kafka sync failed")
+        alterados = changed_entities(rows, resultados)
+        if alterados:
+            await publish_changes(session, "topicokafka", alterados)
+
+    logger.info(f"Sync de tópicos Kafka concluído: {len(alterados)} criados ou atualizados")
+    return sync_summary(resultados)
 
 
 @router.delete("/{topico_id}", status_code=HTTPStatus.NO_CONTENT)
-def delete_topico_kafka(topico_id: int, session: Session = Depends(get_session)):
+async def delete_topico_kafka(topico_id: int, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de exclusão do tópico Kafka com ID {topico_id}")
-    with session as session:
-        db_topico = session.scalar(select(TopicoKafkaModel).where(TopicoKafkaModel.id == topico_id))
-        if not db_topico:
-            logger.warning(f"Tentativa de exclusão falhou: tópico Kafka com ID {topico_id} não encontrado")
-            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Tópico Kafka not found")
-        session.delete(db_topico)
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Tópico Kafka com ID {topico_id} excluído com sucesso")
+            db_topico = await session.run_sync(delete_returning, TopicoKafkaModel, topico_id)
         except IntegrityError as e:
-            session.rollback()
             logger.error(f"Erro ao excluir tópico Kafka com ID {topico_id}: {str(e)}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"Tópico Kafka deletion failed: {str(e)}")
+        if db_topico is None:
+            logger.warning(f"Tentativa de exclusão falhou: tópico Kafka com ID {topico_id} não encontrado")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Tópico Kafka not found")
+        await publish_change(session, "topicokafka", topico_id, deleted=True)
+    logger.info(f"Tópico Kafka com ID {topico_id} excluído com sucesso")
     return {"message": "Tópico Kafka deleted successfully"}
 
-    #     session.commit()
-    # return {"message": "Tópico Kafka deleted successfully"}
-
 
 @router.put("/{topico_id}", status_code=HTTPStatus.OK, response_model=TopicoKafkaPublic)
-def update_topico_kafka(topico_id: int, topico: TopicoKafka, session: Session = Depends(get_session)):
+async def update_topico_kafka(topico_id: int, topico: TopicoKafka, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de atualização do tópico Kafka com ID {topico_id}")
-    with session as session:
-        db_topico = session.scalar(
-            select(TopicoKafkaModel)
-            .where(TopicoKafkaModel.id == topico_id)
-            .options(joinedload(TopicoKafkaModel.responsaveis))  # Carrega responsaveis
-        )
-        if not db_topico:
+    async with session as session:
+        try:
+            db_topico = await session.run_sync(update_returning, TopicoKafkaModel, topico_id, topico.dict(exclude={"responsaveis"}))
+        except IntegrityError:
+            logger.error(f"Erro ao atualizar tópico Kafka com ID {topico_id}", exc_info=True)
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tópico Kafka update failed")
+        if db_topico is None:
             logger.warning(f"Tentativa de atualização falhou: tópico Kafka com ID {topico_id} não encontrado")
             raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Tópico Kafka not found")
+        await publish_change(session, "topicokafka", topico_id, db_topico["nome"])
+    logger.info(f"Tópico Kafka com ID {topico_id} atualizado com sucesso")
+    return db_topico
 
-        # Atualiza os dados do tópico Kafka
-        update_data = topico.dict(exclude={"responsaveis"})
-        for key, value in update_data.items():
-            setattr(db_topico, key, value)
 
+@router.patch("/{topico_id}", status_code=HTTPStatus.OK, response_model=TopicoKafkaSummary)
+async def patch_topico_kafka(topico_id: int, topico: TopicoKafkaUpdate, session: AsyncSession = Depends(get_session)):
+    """
+    Atualiza só os campos enviados, com um único UPDATE ... RETURNING.
+    """
+    logger.info(f"Tentativa de atualização parcial do tópico Kafka com ID {topico_id}")
+    data = topico.dict(exclude_unset=True)
+    if not data:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="No fields to update")
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Tópico Kafka com ID {topico_id} atualizado com sucesso")
+            db_topico = await session.run_sync(patch_returning, TopicoKafkaModel, topico_id, data)
         except IntegrityError:
-            session.rollback()
-            logger.error(f"Erro ao atualizar tópico Kafka com ID {topico_id}", exc_info=True)
+            logger.error(f"Falha na atualização parcial do tópico Kafka com ID {topico_id}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Tópico Kafka update failed")
-
-        session.refresh(db_topico)
-
+        if db_topico is None:
+            logger.warning(f"Tentativa de atualização parcial falhou: tópico Kafka com ID {topico_id} não encontrado")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Tópico Kafka not found")
+        await publish_change(session, "topicokafka", topico_id, db_topico["nome"])
+    logger.info(f"Tópico Kafka com ID {topico_id} atualizado parcialmente ({', '.join(data)})")
     return db_topico
 
 
 
 @router.get("/topicoskafka", status_code=HTTPStatus.OK)
-def count_databases(session: Session = Depends(get_session)):
+async def count_databases(session: AsyncSession = Depends(get_session)):
     """
     Endpoint para contar o número de registros na tabela 'topicoskafka'.
     """
     logger.info("Endpoint /topicokafka/topicoskafka acessado para contar registros")
-    quantidade = session.scalar(select(func.count()).select_from(TopicoKafkaModel))
+    quantidade = await session.scalar(select(func.count()).select_from(TopicoKafkaModel))
     logger.info(f"Quantidade de tópicos Kafka: {quantidade}")
     return {"quantidade": quantidade}
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Request
 from sqlalchemy import select, func
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from http import HTTPStatus
-from typing import List
+from typing import List, Optional
+from infogrid.changes import publish_change
+from infogrid.crud import delete_returning, insert_returning, is_unique_violation, patch_returning, update_returning
 from infogrid.database import get_session
+from infogrid.export import export_format, stream_export
+from infogrid.pagination import paginate, set_next_cursor
 from infogrid.models import Usuario as UsuarioModel
-from infogrid.schemas import Usuario, UsuarioPublic
+from infogrid.schemas import Usuario, UsuarioPublic, UsuarioUpdate
 import logging
 
 logger = logging.getLogger("app_logger")
@@ -15,126 +19,119 @@ router = APIRouter(prefix='/api/v1/usuario', tags=['usuario'])
 
 
 @router.get("/", status_code=HTTPStatus.OK, response_model=List[UsuarioPublic])
-def list_usuarios(session: Session = Depends(get_session)):
+async def list_usuarios(request: Request, session: AsyncSession = Depends(get_session)):
     logger.info("Endpoint /usuario acessado")
-    usuarios = session.scalars(select(UsuarioModel)).all()
+    media_type = export_format(request)
+    if media_type:
+        return stream_export(UsuarioModel, media_type)
+    usuarios = (await session.scalars(select(UsuarioModel))).all()
     logger.info(f"{len(usuarios)} usuários encontrados")
     return usuarios
 
 
 @router.get("/pagined/", status_code=HTTPStatus.OK, response_model=List[UsuarioPublic])
-def list_usuarios_paged(limit: int = 5, skip: int = 0, session: Session = Depends(get_session)):
-    logger.info(f"Endpoint /usuario/pagined acessado com limite {limit} e offset {skip}")
-    usuarios = session.scalars(select(UsuarioModel).limit(limit).offset(skip)).all()
+async def list_usuarios_paged(
+    response: Response,
+    limit: int = 5,
+    cursor: Optional[str] = None,
+    order_by: Optional[str] = None,
+    skip: Optional[int] = Query(None, deprecated=True),
+    session: AsyncSession = Depends(get_session),
+):
+    logger.info(f"Endpoint /usuario/pagined acessado com limite {limit}, cursor {cursor} e offset {skip}")
+    stmt = paginate(select(UsuarioModel), UsuarioModel, limit, cursor, order_by, skip, sortable=("nome", "email"))
+    usuarios = (await session.scalars(stmt)).all()
+    set_next_cursor(response, usuarios, limit, order_by)
     logger.info(f"{len(usuarios)} usuários encontrados")
     return usuarios
 
 
 
 @router.post("/", status_code=HTTPStatus.CREATED, response_model=UsuarioPublic)
-def create_usuario(usuario: Usuario, session: Session = Depends(get_session)):
+async def create_usuario(usuario: Usuario, session: AsyncSession = Depends(get_session)):
     """
     Cria um novo usuário
     """
     logger.info("Tentativa de criação de um novo usuário")
-    with session as session:
-        # Verifique se o usuário já existe
-        db_usuario = session.scalar(select(UsuarioModel).where(UsuarioModel.email == usuario.email))
-        if db_usuario:
-            logger.warning("Tentativa de criação de usuário falhou: usuário já existe")
-            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Usuário já existe")
-
-        # Aqui, criamos uma instância de UsuarioModel sem passar 'registros_acesso'
-        db_instance = UsuarioModel(
-            nome=usuario.nome,
-            email=usuario.email,
-            cargo=usuario.cargo,
-            telefone=usuario.telefone
-        )
-        
-        session.add(db_instance)
-
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Usuário '{db_instance.nome}' criado com sucesso")
-        except IntegrityError:
-            session.rollback()
+            db_usuario = await session.run_sync(insert_returning, UsuarioModel, usuario.dict())
+        except IntegrityError as e:
+            # O email é único: a constraint recusa o repetido
+            if is_unique_violation(e):
+                logger.warning("Tentativa de criação de usuário falhou: usuário já existe")
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Usuário já existe")
             logger.error("Erro ao inserir usuário", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Falha na inserção do usuário")
-
-        session.refresh(db_instance)
-
-    # Retorne os dados do novo usuário, excluindo 'registros_acesso' que não pertence a esse modelo
-    return {
-        "id": db_instance.id,
-        "nome": db_instance.nome,
-        "email": db_instance.email,
-        "cargo": db_instance.cargo,
-        "telefone": db_instance.telefone,
-        "registros_acesso": []  # Esse campo é provavelmente um relacionamento e deve ser tratado separadamente
-    }
+        await publish_change(session, "usuario", db_usuario["id"], db_usuario["nome"])
+    logger.info(f"Usuário '{db_usuario['nome']}' criado com sucesso")
+    return db_usuario
 
 
 @router.delete("/{usuario_id}", status_code=HTTPStatus.NO_CONTENT)
-def delete_usuario(usuario_id: int, session: Session = Depends(get_session)):
+async def delete_usuario(usuario_id: int, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de exclusão do usuário com ID {usuario_id}")
-    with session as session:
-        db_usuario = session.scalar(select(UsuarioModel).where(UsuarioModel.id == usuario_id))
-        if not db_usuario:
-            logger.warning(f"Tentativa de exclusão falhou: usuário com ID {usuario_id} não encontrado")
-            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Usuário not found")
-        session.delete(db_usuario)
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Usuário com ID {usuario_id} excluído com sucesso")
+            db_usuario = await session.run_sync(delete_returning, UsuarioModel, usuario_id)
         except IntegrityError as e:
-            session.rollback()
             logger.error(f"Erro ao excluir usuário com ID {usuario_id}: {str(e)}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"Usuário deletion failed: {str(e)}")
+        if db_usuario is None:
+            logger.warning(f"Tentativa de exclusão falhou: usuário com ID {usuario_id} não encontrado")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Usuário not found")
+        await publish_change(session, "usuario", usuario_id, deleted=True)
+    logger.info(f"Usuário com ID {usuario_id} excluído com sucesso")
     return {"message": "Usuário deleted successfully"}
 
-    #     session.commit()
-    # return {"message": "Usuário deleted successfully"}
-
 
 @router.put("/{usuario_id}", status_code=HTTPStatus.OK, response_model=UsuarioPublic)
-def update_usuario(usuario_id: int, usuario: Usuario, session: Session = Depends(get_session)):
+async def update_usuario(usuario_id: int, usuario: Usuario, session: AsyncSession = Depends(get_session)):
     logger.info(f"Tentativa de atualização do usuário com ID {usuario_id}")
-    with session as session:
-        db_usuario = session.scalar(
-            select(UsuarioModel)
-            .where(UsuarioModel.id == usuario_id)
-            # .options(joinedload(UsuarioModel.registros_acesso))  # Carrega registros de acesso
-        )
-        if not db_usuario:
+    async with session as session:
+        try:
+            db_usuario = await session.run_sync(update_returning, UsuarioModel, usuario_id, usuario.dict())
+        except IntegrityError:
+            logger.error(f"Erro ao atualizar usuário com ID {usuario_id}", exc_info=True)
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Usuário update failed")
+        if db_usuario is None:
             logger.warning(f"Tentativa de atualização falhou: usuário com ID {usuario_id} não encontrado")
             raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Usuário not found")
+        await publish_change(session, "usuario", usuario_id, db_usuario["nome"])
+    logger.info(f"Usuário com ID {usuario_id} atualizado com sucesso")
+    return db_usuario
 
-        # Atualiza os dados do usuário
-        update_data = usuario.dict()
-        for key, value in update_data.items():
-            setattr(db_usuario, key, value)
 
+@router.patch("/{usuario_id}", status_code=HTTPStatus.OK, response_model=UsuarioPublic)
+async def patch_usuario(usuario_id: int, usuario: UsuarioUpdate, session: AsyncSession = Depends(get_session)):
+    """
+    Atualiza só os campos enviados, com um único UPDATE ... RETURNING.
+    """
+    logger.info(f"Tentativa de atualização parcial do usuário com ID {usuario_id}")
+    data = usuario.dict(exclude_unset=True)
+    if not data:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="No fields to update")
+    async with session as session:
         try:
-            session.commit()
-            logger.info(f"Usuário com ID {usuario_id} atualizado com sucesso")
+            db_usuario = await session.run_sync(patch_returning, UsuarioModel, usuario_id, data)
         except IntegrityError:
-            session.rollback()
-            logger.error(f"Erro ao atualizar usuário com ID {usuario_id}", exc_info=True)
+            logger.error(f"Falha na atualização parcial do usuário com ID {usuario_id}", exc_info=True)
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Usuário update failed")
-
-        session.refresh(db_usuario)
-
+        if db_usuario is None:
+            logger.warning(f"Tentativa de atualização parcial falhou: usuário com ID {usuario_id} não encontrado")
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Usuário not found")
+        await publish_change(session, "usuario", usuario_id, db_usuario["nome"])
+    logger.info(f"Usuário com ID {usuario_id} atualizado parcialmente ({', '.join(data)})")
     return db_usuario
 
 
 
 @router.get("/usuarios", status_code=HTTPStatus.OK)
-def count_usuarios(session: Session = Depends(get_session)):
+async def count_usuarios(session: AsyncSession = Depends(get_session)):
     """
     Endpoint para contar o número de registros na tabela 'usuarios'.
     """
     logger.info("Endpoint /usuario/usuarios acessado para contar registros")
-    quantidade = session.scalar(select(func.count()).select_from(UsuarioModel))
+    quantidade = await session.scalar(select(func.count()).select_from(UsuarioModel))
     logger.info(f"Quantidade de usuários: {quantidade}")
     return {"quantidade": quantidade}
\ No newline at end of file
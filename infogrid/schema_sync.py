@@ -0,0 +1,199 @@
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from infogrid.changes import publish_changes_sync
+from infogrid.models import Coluna, Tabela, responsaveis_tabelas
+
+logger = logging.getLogger("app_logger")
+
+
+@dataclass
+class TableSnapshot:
+    nome: str
+    descricao: Optional[str]
+    colunas: List[dict]  # {"nome", "tipo_dado", "descricao"}; descricao None = sem comentário na origem
+
+
+@dataclass
+class SchemaDelta:
+    """
+    Diferença entre o snapshot recebido e o catálogo de um Database, calculada em memória.
+    """
+    tabelas_novas: List[TableSnapshot] = field(default_factory=list)
+    tabelas_alteradas: Dict[int, TableSnapshot] = field(default_factory=dict)  # id -> snapshot
+    tabelas_removidas: Dict[int, str] = field(default_factory=dict)  # id -> nome
+    tabelas_inalteradas: int = 0
+    colunas_novas: List[dict] = field(default_factory=list)  # com tabela_id (ou _tabela para as novas)
+    colunas_atualizadas: List[dict] = field(default_factory=list)  # {"id", ...campos alterados}
+    colunas_removidas: Dict[int, str] = field(default_factory=dict)  # id -> nome
+    fingerprints: Dict[int, str] = field(default_factory=dict)  # tabela_id -> fingerprint novo
+
+    @property
+    def vazio(self) -> bool:
+        return not (self.tabelas_novas or self.tabelas_alteradas or self.tabelas_removidas)
+
+    def resumo(self) -> dict:
+        return {
+            "tabelas_criadas": len(self.tabelas_novas),
+            "tabelas_alteradas": len(self.tabelas_alteradas),
+            "tabelas_removidas": len(self.tabelas_removidas),
+            "tabelas_inalteradas": self.tabelas_inalteradas,
+            "colunas_criadas": len(self.colunas_novas),
+            "colunas_atualizadas": len(self.colunas_atualizadas),
+            "colunas_removidas": len(self.colunas_removidas),
+        }
+
+
+def fingerprint(table: TableSnapshot) -> str:
+    """
+    Hash estável do snapshot de uma tabela (descrição + colunas em ordem de nome).
+    """
+    payload = [table.descricao, sorted((c["nome"], c["tipo_dado"], c.get("descricao")) for c in table.colunas)]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode()).hexdigest()
+
+
+def _column_changes(stored: Coluna, incoming: dict) -> dict:
+    changes = {}
+    if stored.tipo_dado != incoming["tipo_dado"]:
+        changes["tipo_dado"] = incoming["tipo_dado"]
+    # Sem comentário na origem a descrição digitada no catálogo é mantida
+    if incoming.get("descricao") and stored.descricao != incoming["descricao"]:
+        changes["descricao"] = incoming["descricao"]
+    return changes
+
+
+def diff_schema(session: Session, database_id: int, snapshot: Sequence[TableSnapshot], delete_missing: bool = True) -> SchemaDelta:
+    """
+    Compara o snapshot com tabelas/colunas do Database.
+
+    Só (id, nome, fingerprint) das tabelas é lido por inteiro; colunas são carregadas apenas
+    das tabelas cujo fingerprint mudou, então um schema sem mudanças custa uma consulta.
+    """
+    delta = SchemaDelta()
+    stored_tables = {
+        nome: (tabela_id, stored_fingerprint)
+        for tabela_id, nome, stored_fingerprint in session.execute(
+            select(Tabela.id, Tabela.nome, Tabela.fingerprint).where(Tabela.database_id == database_id)
+        )
+    }
+
+    incoming_names = set()
+    for table in snapshot:
+        incoming_names.add(table.nome)
+        table_fingerprint = fingerprint(table)
+        stored = stored_tables.get(table.nome)
+        if stored is None:
+            delta.tabelas_novas.append(table)
+            delta.colunas_novas.extend({**column, "_tabela": table.nome} for column in table.colunas)
+        elif stored[1] == table_fingerprint:
+            delta.tabelas_inalteradas += 1
+        else:
+            delta.tabelas_alteradas[stored[0]] = table
+            delta.fingerprints[stored[0]] = table_fingerprint
+
+    if delete_missing:
+        delta.tabelas_removidas = {tabela_id: nome for nome, (tabela_id, _) in stored_tables.items() if nome not in incoming_names}
+
+    if delta.tabelas_alteradas:
+        stored_columns: Dict[int, Dict[str, Coluna]] = {}
+        for coluna in session.scalars(select(Coluna).where(Coluna.tabela_id.in_(list(delta.tabelas_alteradas)))):
+            stored_columns.setdefault(coluna.tabela_id, {})[coluna.nome] = coluna
+        for tabela_id, table in delta.tabelas_alteradas.items():
+            existing = stored_columns.get(tabela_id, {})
+            for column in table.colunas:
+                stored = existing.pop(column["nome"], None)
+                if stored is None:
+                    delta.colunas_novas.append({**column, "tabela_id": tabela_id})
+                    continue
+                changes = _column_changes(stored, column)
+                if changes:
+                    delta.colunas_atualizadas.append({"id": stored.id, "nome": stored.nome, **changes})
+            delta.colunas_removidas.update({coluna.id: coluna.nome for coluna in existing.values()})
+    return delta
+
+
+def apply_delta(session: Session, database_id: int, delta: SchemaDelta) -> dict:
+    """
+    Aplica só a diferença, em lote e sem commit: INSERT multi-linha com RETURNING para tabelas
+    e colunas novas, UPDATE por chave primária em lote e DELETE ... WHERE id IN (...).
+    Devolve os (id, nome) alterados por tipo para a invalidação de caches.
+    """
+    changed = {"tabela": [], "coluna": [], "tabela_removida": [], "coluna_removida": []}
+
+    if delta.tabelas_removidas:
+        removed = list(delta.tabelas_removidas)
+        removed_columns = session.execute(delete(Coluna).where(Coluna.tabela_id.in_(removed)).returning(Coluna.id)).scalars().all()
+        session.execute(delete(responsaveis_tabelas).where(responsaveis_tabelas.c.tabela_id.in_(removed)))
+        session.execute(delete(Tabela).where(Tabela.id.in_(removed)))
+        changed["tabela_removida"] = [(tabela_id, None) for tabela_id in removed]
+        changed["coluna_removida"] = [(coluna_id, None) for coluna_id in removed_columns]
+
+    new_table_ids = {}
+    if delta.tabelas_novas:
+        rows = [{"database_id": database_id, "nome": table.nome, "descricao": table.descricao} for table in delta.tabelas_novas]
+        ids = session.scalars(insert(Tabela).returning(Tabela.id, sort_by_parameter_order=True), rows).all()
+        new_table_ids = {table.nome: tabela_id for table, tabela_id in zip(delta.tabelas_novas, ids)}
+        for table, tabela_id in zip(delta.tabelas_novas, ids):
+            delta.fingerprints[tabela_id] = fingerprint(table)
+            changed["tabela"].append((tabela_id, table.nome))
+
+    for tabela_id, table in delta.tabelas_alteradas.items():
+        if table.descricao:
+            session.execute(update(Tabela).where(Tabela.id == tabela_id, Tabela.descricao.is_distinct_from(table.descricao)).values(descricao=table.descricao))
+
+    if delta.colunas_removidas:
+        session.execute(delete(Coluna).where(Coluna.id.in_(list(delta.colunas_removidas))))
+        changed["coluna_removida"].extend((coluna_id, None) for coluna_id in delta.colunas_removidas)
+
+    if delta.colunas_novas:
+        rows = [
+            {
+                "tabela_id": column.get("tabela_id") or new_table_ids[column["_tabela"]],
+                "nome": column["nome"],
+                "tipo_dado": column["tipo_dado"],
+                "descricao": column.get("descricao"),
+            }
+            for column in delta.colunas_novas
+        ]
+        ids = session.scalars(insert(Coluna).returning(Coluna.id, sort_by_parameter_order=True), rows).all()
+        changed["coluna"].extend(zip(ids, (row["nome"] for row in rows)))
+
+    # UPDATE em lote por chave primária (executemany), agrupado pelos campos alterados
+    groups: Dict[tuple, List[dict]] = {}
+    for column in delta.colunas_atualizadas:
+        params = {key: value for key, value in column.items() if key != "nome"}
+        groups.setdefault(tuple(sorted(params)), []).append(params)
+    for params in groups.values():
+        session.execute(update(Coluna), params)
+    changed["coluna"].extend((column["id"], column["nome"]) for column in delta.colunas_atualizadas)
+
+    # Por último: as escritas em colunas acima limpam o fingerprint da tabela (trigger no Postgres)
+    if delta.fingerprints:
+        session.execute(update(Tabela), [{"id": tabela_id, "fingerprint": value} for tabela_id, value in delta.fingerprints.items()])
+    return changed
+
+
+def sync_schema(session: Session, database_id: int, snapshot: Sequence[TableSnapshot], delete_missing: bool = True) -> SchemaDelta:
+    """
+    Calcula e aplica o delta de um Database numa única transação e publica as alterações.
+    """
+    delta = diff_schema(session, database_id, snapshot, delete_missing)
+    if delta.vazio:
+        session.rollback()  # encerra a transação de leitura
+        return delta
+
+    changed = apply_delta(session, database_id, delta)
+    session.commit()
+    for tipo in ("tabela", "coluna"):
+        if changed[tipo]:
+            publish_changes_sync(session, tipo, changed[tipo])
+        if changed[f"{tipo}_removida"]:
+            publish_changes_sync(session, tipo, changed[f"{tipo}_removida"], deleted=True)
+    logger.info(f"Sync do schema do database {database_id}: {delta.resumo()}")
+    return delta
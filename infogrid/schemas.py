@@ -1,7 +1,7 @@
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timezone
+from typing import Annotated, Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import AfterValidator, BaseModel
 
 
 class Message(BaseModel):
@@ -23,6 +23,14 @@ class ResponsavelPublic(BaseModel):
     telefone: Optional[str]
 
 
+# Campos alterados no PATCH: só os enviados entram no UPDATE
+class ResponsavelUpdate(BaseModel):
+    nome: Optional[str] = None
+    email: Optional[str] = None
+    cargo: Optional[str] = None
+    telefone: Optional[str] = None
+
+
 # Classe para os bancos de dados (Databases)
 class Database(BaseModel):
     # id: int
@@ -40,6 +48,20 @@ class DatabasePublic(BaseModel):
     responsaveis: List[Responsavel]
 
 
+class DatabaseUpdate(BaseModel):
+    nome: Optional[str] = None
+    tecnologia: Optional[str] = None
+    descricao: Optional[str] = None
+
+
+# Resposta do PATCH: a linha atualizada, sem carregar os responsáveis
+class DatabaseSummary(BaseModel):
+    id: int
+    nome: str
+    tecnologia: str
+    descricao: Optional[str]
+
+
 # Classe para tabelas em um Database
 class Tabela(BaseModel):
     nome: str
@@ -62,6 +84,25 @@ class TabelaPublic(BaseModel):
     conformidade: Optional[bool]  # True/False para indicar se está em conformidade
 
 
+class TabelaUpdate(BaseModel):
+    nome: Optional[str] = None
+    descricao: Optional[str] = None
+    database_id: Optional[int] = None
+    estado_atual: Optional[str] = None
+    qualidade: Optional[str] = None
+    conformidade: Optional[bool] = None
+
+
+class TabelaSummary(BaseModel):
+    id: int
+    nome: str
+    descricao: Optional[str]
+    database_id: int
+    estado_atual: Optional[str]
+    qualidade: Optional[str]
+    conformidade: Optional[bool]
+
+
 # Classe para colunas dentro de uma tabela
 class Coluna(BaseModel):
     nome: str
@@ -78,6 +119,13 @@ class ColunaPublic(BaseModel):
     tabela_id: int
 
 
+class ColunaUpdate(BaseModel):
+    nome: Optional[str] = None
+    tipo_dado: Optional[str] = None
+    descricao: Optional[str] = None
+    tabela_id: Optional[int] = None
+
+
 # Classe para Tópicos Kafka
 class TopicoKafka(BaseModel):
     nome: str
@@ -96,6 +144,21 @@ class TopicoKafkaPublic(BaseModel):
     conformidade: Optional[bool]  # True/False para indicar conformidade
 
 
+class TopicoKafkaUpdate(BaseModel):
+    nome: Optional[str] = None
+    descricao: Optional[str] = None
+    estado_atual: Optional[str] = None
+    conformidade: Optional[bool] = None
+
+
+class TopicoKafkaSummary(BaseModel):
+    id: int
+    nome: str
+    descricao: Optional[str]
+    estado_atual: Optional[str]
+    conformidade: Optional[bool]
+
+
 # Classe para colunas de Tópicos Kafka
 class ColunaTopicoKafka(BaseModel):
     nome: str
@@ -112,11 +175,100 @@ class ColunaTopicoKafkaPublic(BaseModel):
     topico_kafka_id: int
 
 
+class ColunaTopicoKafkaUpdate(BaseModel):
+    nome: Optional[str] = None
+    tipo_dado: Optional[str] = None
+    descricao: Optional[str] = None
+    topico_kafka_id: Optional[int] = None
+
+
+# Resultado por linha das inserções em lote (/bulk)
+class BulkItemResult(BaseModel):
+    indice: int  # posição da linha no corpo da requisição
+    status: str  # created, duplicate, exists, parent_not_found, invalid
+    id: Optional[int]  # id criado, ou o já existente quando status = exists
+    nome: str
+    detalhe: Optional[str]
+
+
+class BulkResult(BaseModel):
+    criados: int
+    rejeitados: int
+    resultados: List[BulkItemResult]
+
+
+# Resultado do upsert em lote (/sync) por chave natural
+class SyncItemResult(BaseModel):
+    indice: int
+    id: Optional[int] = None
+    status: str  # created, updated, unchanged, parent_not_found
+
+
+class SyncResult(BaseModel):
+    criados: int
+    atualizados: int
+    inalterados: int
+    rejeitados: int
+    resultados: List[SyncItemResult]
+
+
+
+# Verificação de permissão respondida pelo índice em memória (/acesso/check)
+class VerificacaoAcesso(BaseModel):
+    usuario_id: int
+    conjunto_dados: str
+    permissoes: List[str]  # todas precisam ter sido concedidas, ex.: ["leitura"]
+
+
+class ResultadoAcesso(BaseModel):
+    permitido: bool
+
+
+# Pares (responsável, alvo) das associações em lote (/relacionamentos/.../batch)
+class ResponsavelDatabasePar(BaseModel):
+    responsavel_id: int
+    database_id: int
+
+
+class ResponsavelTabelaPar(BaseModel):
+    responsavel_id: int
+    tabela_id: int
+
+
+class ResponsavelTopicoKafkaPar(BaseModel):
+    responsavel_id: int
+    topico_kafka_id: int
+
+
+class RelacionamentoLoteResult(BaseModel):
+    novos: List[Dict[str, int]]
+    existentes: List[Dict[str, int]]
+    ausentes: List[Dict[str, int]]  # responsável ou alvo não cadastrado
+
+
+class RelacionamentoRemocaoResult(BaseModel):
+    removidos: List[Dict[str, int]]
+    ausentes: List[Dict[str, int]]  # pares que não estavam associados
+
 # Classe para registrar acessos aos dados
+def naive_utc(value: datetime) -> datetime:
+    """
+    data_solicitacao é gravada sem fuso: um horário com fuso ("...Z", "...-03:00") vira UTC
+    sem tzinfo, a mesma forma que volta do RETURNING (senão a chave única não casa com a entrada).
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# Aplicado em toda escrita de registro de acesso (POST, PUT, PATCH e ingestão)
+DataSolicitacao = Annotated[datetime, AfterValidator(naive_utc)]
+
+
 class RegistroAcesso(BaseModel):
     usuario_id: int
     conjunto_dados: str  # Pode ser o nome do Database, Tabela, ou Tópico Kafka
-    data_solicitacao: datetime
+    data_solicitacao: DataSolicitacao
     finalidade_uso: str
     permissoes_concedidas: List[str]  # Exemplo: ["leitura", "escrita"]
     status: Optional[str]  # Exemplo: "Aprovado", "Negado", "Pendente"
@@ -132,6 +284,30 @@ class RegistroAcessoPublic(BaseModel):
     status: Optional[str]  # Exemplo: "Aprovado", "Negado", "Pendente"
 
 
+class RegistroAcessoUpdate(BaseModel):
+    usuario_id: Optional[int] = None
+    conjunto_dados: Optional[str] = None
+    data_solicitacao: Optional[DataSolicitacao] = None
+    finalidade_uso: Optional[str] = None
+    permissoes_concedidas: Optional[List[str]] = None
+    status: Optional[str] = None
+
+
+# Resposta da ingestão com escrita adiada (/registroacesso/ingest/)
+class IngestaoResult(BaseModel):
+    status: str  # queued (ack=enqueue), created, exists
+    id: Optional[int]  # None enquanto queued
+
+
+# Contagem de registros de acesso lida dos agregados (/registroacesso/estatisticas/)
+class ContagemAcessos(BaseModel):
+    periodo: Optional[datetime]  # início da hora ou do dia; None quando não agrupado por período
+    conjunto_dados: Optional[str]
+    usuario_id: Optional[int]
+    status: Optional[str]
+    quantidade: int
+
+
 # Classe para os usuários que acessam os dados
 class Usuario(BaseModel):
     nome: str
@@ -148,3 +324,27 @@ class UsuarioPublic(BaseModel):
     cargo: Optional[str]
     telefone: Optional[str]
     # registros_acesso: List[RegistroAcesso]
+
+
+class UsuarioUpdate(BaseModel):
+    nome: Optional[str] = None
+    email: Optional[str] = None
+    cargo: Optional[str] = None
+    telefone: Optional[str] = None
+
+
+# Resultado da busca textual unificada do catálogo
+class SearchHit(BaseModel):
+    tipo: str  # database, tabela, coluna, topicokafka, colunatopicokafka, responsavel
+    id: int
+    nome: str
+    descricao: Optional[str]
+    parent_id: Optional[int]  # database_id da tabela, tabela_id da coluna, topico_kafka_id da coluna do tópico
+    rank: float
+
+
+# Sugestão do autocomplete (servida do índice em memória)
+class Suggestion(BaseModel):
+    tipo: str  # database, tabela, coluna, topicokafka, responsavel
+    id: int
+    nome: str
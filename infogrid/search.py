@@ -0,0 +1,88 @@
+import re
+from typing import Iterable, Optional
+
+from sqlalchemy import Float, String, cast, func, literal, literal_column, null, or_, select, union_all
+
+from infogrid.models import Coluna, ColunaTopicoKafka, Database, Responsavel, Tabela, TopicoKafka
+
+# tipo -> (model, coluna exibida como descrição, id do "pai" no catálogo)
+SEARCH_TARGETS = {
+    "database": (Database, Database.descricao, None),
+    "tabela": (Tabela, Tabela.descricao, Tabela.database_id),
+    "coluna": (Coluna, Coluna.descricao, Coluna.tabela_id),
+    "topicokafka": (TopicoKafka, TopicoKafka.descricao, None),
+    "colunatopicokafka": (ColunaTopicoKafka, ColunaTopicoKafka.descricao, ColunaTopicoKafka.topico_kafka_id),
+    "responsavel": (Responsavel, Responsavel.email, None),
+}
+
+# Coluna tsvector gerada (GENERATED ALWAYS ... STORED) criada pela migration de busca.
+# Fica fora dos models para não ser carregada em todo SELECT do ORM.
+SEARCH_VECTOR_COLUMN = "search_vector"
+
+
+def prefix_tsquery(term: str) -> str:
+    """
+    Texto de to_tsquery em que cada palavra do termo é um prefixo ("vend" -> 'vend':*), para
+    a busca no Postgres casar começos de palavra como o fallback casa substrings. Só letras,
+    dígitos e _ entram, então nada do termo é lido como operador de tsquery.
+    """
+    return " & ".join(f"'{word}':*" for word in re.findall(r"\w+", term))
+
+
+def _ts_query(term: str):
+    # Dicionário português (stemming) OU simple (nomes técnicos, siglas, snake_case)
+    query = prefix_tsquery(term)
+    return func.to_tsquery(literal_column("'portuguese'"), query).op("||")(
+        func.to_tsquery(literal_column("'simple'"), query)
+    )
+
+
+def _postgres_branch(tipo: str, term: str):
+    model, descricao, parent_id = SEARCH_TARGETS[tipo]
+    vector = literal_column(f"{model.__tablename__}.{SEARCH_VECTOR_COLUMN}")
+    query = _ts_query(term)
+    return (
+        select(
+            literal(tipo, String).label("tipo"),
+            model.id.label("id"),
+            model.nome.label("nome"),
+            cast(descricao, String).label("descricao"),
+            (parent_id if parent_id is not None else null()).label("parent_id"),
+            cast(func.ts_rank(vector, query), Float).label("rank"),
+        )
+        .select_from(model)
+        .where(vector.op("@@")(query))
+    )
+
+
+def _fallback_branch(tipo: str, term: str):
+    # Bancos sem tsvector (SQLite em desenvolvimento/testes): substring em nome/descrição
+    model, descricao, parent_id = SEARCH_TARGETS[tipo]
+    pattern = f"%{term}%"
+    return (
+        select(
+            literal(tipo, String).label("tipo"),
+            model.id.label("id"),
+            model.nome.label("nome"),
+            cast(descricao, String).label("descricao"),
+            (parent_id if parent_id is not None else null()).label("parent_id"),
+            cast(literal(1.0), Float).label("rank"),
+        )
+        .where(or_(model.nome.ilike(pattern), descricao.ilike(pattern)))
+    )
+
+
+def build_search_query(term: str, dialect_name: str, tipos: Optional[Iterable[str]] = None, limit: int = 20):
+    """
+    Monta um único UNION ALL sobre as entidades pedidas, ordenado por relevância.
+
+    No Postgres cada ramo filtra com `search_vector @@ tsquery` (índice GIN) e pontua com ts_rank;
+    as palavras do termo casam por prefixo ("vend" acha "vendas", "valor_venda"). Nos outros
+    bancos o termo inteiro casa como substring de nome/descrição, sem ranking. Nos dois casos
+    um termo que é começo de palavra é encontrado; o resto (meio de palavra, e-mail inteiro,
+    ordem dos resultados) depende do banco.
+    """
+    branch = _postgres_branch if dialect_name == "postgresql" else _fallback_branch
+    selects = [branch(tipo, term) for tipo in (tipos or SEARCH_TARGETS)]
+    hits = union_all(*selects).subquery("hits")
+    return select(hits).order_by(hits.c.rank.desc(), hits.c.tipo, hits.c.id).limit(limit)
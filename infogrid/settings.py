@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -7,4 +9,29 @@ class Settings(BaseSettings):
         env_file='.env', env_file_encoding='utf-8'
     )
     DATABASE_URL: str
+    # Liga o engine assíncrono (asyncpg/aiosqlite) no lugar da Session síncrona no threadpool
+    ASYNC_DATABASE: bool = False
+    # Opcional: se vazio, é derivada de DATABASE_URL trocando o driver
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # Pool de conexões compartilhado por todos os routers (um por processo/worker)
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_PRE_PING: bool = True
+    DATABASE_POOL_RECYCLE: int = 1800  # segundos; -1 desliga
+    DATABASE_POOL_TIMEOUT: float = 30.0  # segundos esperando uma conexão livre
     LOG_FILE: str = "app.log"
+    # Respostas JSON de GET guardadas em memória por worker (0 desliga o armazenamento; ETag/304 continuam)
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    # NOTIFY/LISTEN em infogrid_changes para invalidar os caches dos outros workers (só Postgres)
+    CHANGE_NOTIFICATIONS: bool = True
+    # registros_acesso (particionada por mês no Postgres): retenção e arquivamento em infogrid/partitions.py
+    ACCESS_LOG_RETENTION_MONTHS: int = 24
+    ACCESS_LOG_PARTITIONS_AHEAD: int = 3
+    ACCESS_LOG_ARCHIVE_DIR: str = "arquivo/registros_acesso"
+    # Ingestão com escrita adiada em /registroacesso/ingest/ (infogrid/ingest.py): um INSERT e um
+    # COMMIT por lote de até ACCESS_INGEST_BATCH_SIZE registros ou a cada ACCESS_INGEST_FLUSH_MS
+    ACCESS_INGEST_BATCH_SIZE: int = 500
+    ACCESS_INGEST_FLUSH_MS: int = 50
+    ACCESS_INGEST_MAX_PENDING: int = 10000  # acima disso a ingestão responde 503
+    ACCESS_INGEST_FLUSH_TIMEOUT_MS: int = 30000  # com ack=flush, espera máxima pelo commit (depois, 503)
+    ACCESS_INGEST_ACK: str = "flush"  # "flush" (após o commit) ou "enqueue" (ao entrar no buffer)
@@ -0,0 +1,343 @@
+"""
+Snapshot do catálogo inteiro: exportação e importação em JSONL comprimido com gzip.
+
+Todas as tabelas do catálogo (entidades e associações responsaveis_*) vão para um único
+arquivo, em ordem de dependência de FK, seguidas dos agregados de registros_acesso
+(infogrid/rollups.py), que guardam também o histórico das partições já arquivadas. A exportação lê com cursor do lado do servidor e
+comprime em streaming (memória constante); no Postgres ela roda numa transação REPEATABLE
+READ, então o snapshot é consistente entre tabelas. A importação carrega com COPY no
+Postgres (INSERT em lote nos demais bancos), com as FKs adiadas até o commit, e ajusta as
+sequences dos ids.
+
+Formato (uma linha JSON por registro):
+    {"formato": "infogrid-snapshot", "versao": 1, "criado_em": "..."}
+    {"tabela": "databases", "colunas": ["id", "nome", ...]}
+    [1, "vendas", ...]
+    ...
+    {"fim": true, "linhas": {"databases": 1, ...}}
+
+    python -m infogrid.snapshot export catalogo.jsonl.gz
+    python -m infogrid.snapshot import catalogo.jsonl.gz --replace
+"""
+import argparse
+import gzip
+import io
+import json
+import logging
+import zlib
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional
+
+from sqlalchemy import DateTime, delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from infogrid import database
+from infogrid.changes import publish_reload_sync
+from infogrid.models import table_registry
+from infogrid.rollups import ROLLUP_TABLES
+
+logger = logging.getLogger("app_logger")
+
+SNAPSHOT_FORMAT = "infogrid-snapshot"
+SNAPSHOT_VERSION = 1
+MEDIA_TYPE = "application/gzip"
+
+# Linhas por ida ao banco na exportação e por COPY/INSERT na importação
+SNAPSHOT_BATCH_SIZE = 5000
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+class CatalogNotEmptyError(SnapshotError):
+    pass
+
+
+def _catalog_tables():
+    rollups = set(ROLLUP_TABLES.values())
+    return [table for table in table_registry.metadata.sorted_tables if table not in rollups]
+
+
+def snapshot_tables():
+    """
+    Tabelas do catálogo em ordem de dependência (pais antes dos filhos) e, por último, os
+    agregados de registros_acesso. Na importação a carga de registros_acesso preenche os
+    agregados pelos triggers; as linhas exportadas os substituem depois, com as contagens
+    das partições arquivadas, que os registros carregados não têm.
+    """
+    return _catalog_tables() + list(ROLLUP_TABLES.values())
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável no snapshot: {type(value).__name__}")
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, default=_encode, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+# --- Exportação ----------------------------------------------------------------------------
+
+def iter_snapshot(counts: Optional[Dict[str, int]] = None, batch_size: int = SNAPSHOT_BATCH_SIZE) -> Iterator[str]:
+    """
+    Linhas JSONL do snapshot, em lotes. `counts` recebe as linhas exportadas por tabela.
+    """
+    counts = {} if counts is None else counts
+    with Session(database.engine) as session:
+        if session.get_bind().dialect.name == "postgresql":
+            # Mesma foto do banco para todas as tabelas, sem bloquear escritas
+            session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            session.execute(text("SET TRANSACTION READ ONLY"))
+        yield _dumps({"formato": SNAPSHOT_FORMAT, "versao": SNAPSHOT_VERSION, "criado_em": datetime.now().isoformat()})
+
+        for table in snapshot_tables():
+            columns = list(table.columns)
+            yield _dumps({"tabela": table.name, "colunas": [column.name for column in columns]})
+            counts[table.name] = 0
+            stmt = select(*columns).order_by(*table.primary_key.columns).execution_options(yield_per=batch_size)
+            for rows in session.execute(stmt).partitions(batch_size):
+                counts[table.name] += len(rows)
+                yield "".join(_dumps(list(row)) for row in rows)
+        yield _dumps({"fim": True, "linhas": counts})
+    logger.info(f"Snapshot exportado: {sum(counts.values())} linhas em {len(counts)} tabelas")
+
+
+def iter_snapshot_gzip(counts: Optional[Dict[str, int]] = None, batch_size: int = SNAPSHOT_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    O snapshot comprimido com gzip à medida que é lido, para o StreamingResponse ou um arquivo.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: cabeçalho gzip
+    for chunk in iter_snapshot(counts, batch_size):
+        compressed = compressor.compress(chunk.encode())
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_snapshot(path: str, batch_size: int = SNAPSHOT_BATCH_SIZE) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    with open(path, "wb") as f:
+        for chunk in iter_snapshot_gzip(counts, batch_size):
+            f.write(chunk)
+    return counts
+
+
+# --- Importação ----------------------------------------------------------------------------
+
+def _copy_value(value) -> str:
+    """
+    Valor no formato texto do COPY: \\N para NULL e barra invertida, tab e quebras escapadas.
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False)
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class _TableLoader:
+    """
+    Acumula as linhas de uma tabela e grava em lotes: COPY FROM STDIN com psycopg2,
+    INSERT executemany nos demais drivers.
+    """
+
+    def __init__(self, session: Session, table, column_names: List[str], batch_size: int):
+        unknown = [name for name in column_names if name not in table.columns]
+        if unknown:
+            raise SnapshotError(f"Colunas desconhecidas em {table.name}: {', '.join(unknown)}")
+        self.session = session
+        self.table = table
+        self.column_names = column_names
+        self.batch_size = batch_size
+        self.datetime_positions = [i for i, name in enumerate(column_names) if isinstance(table.c[name].type, DateTime)]
+        self.use_copy = session.get_bind().dialect.driver == "psycopg2"
+        self.rows: List[list] = []
+        self.count = 0
+
+    def add(self, row: list):
+        if len(row) != len(self.column_names):
+            raise SnapshotError(f"Linha de {self.table.name} com {len(row)} valores; esperado {len(self.column_names)}")
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.use_copy:
+            self._copy()
+        else:
+            self._insert()
+        self.count += len(self.rows)
+        self.rows = []
+
+    def _copy(self):
+        buffer = io.StringIO()
+        for row in self.rows:
+            buffer.write("\t".join(_copy_value(value) for value in row) + "\n")
+        buffer.seek(0)
+        quote = self.session.get_bind().dialect.identifier_preparer.quote
+        columns = ", ".join(quote(name) for name in self.column_names)
+        cursor = self.session.connection().connection.driver_connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {quote(self.table.name)} ({columns}) FROM STDIN", buffer)
+        finally:
+            cursor.close()
+
+    def _insert(self):
+        params = []
+        for row in self.rows:
+            for position in self.datetime_positions:
+                if row[position] is not None:
+                    row[position] = datetime.fromisoformat(row[position])
+            params.append(dict(zip(self.column_names, row)))
+        self.session.execute(insert(self.table), params)
+
+
+def _catalog_is_empty(session: Session) -> bool:
+    # Agregados sozinhos (histórico de partições arquivadas) não contam: a carga os substitui
+    return not any(session.execute(select(1).select_from(table).limit(1)).first() for table in _catalog_tables())
+
+
+def _clear_catalog(session: Session):
+    tables = _catalog_tables()
+    # Os agregados são esvaziados por último: TRUNCATE não dispara os triggers de DELETE e,
+    # no SQLite, o DELETE de registros_acesso ainda os decrementa
+    rollups = list(ROLLUP_TABLES.values())
+    if session.get_bind().dialect.name == "postgresql":
+        quote = session.get_bind().dialect.identifier_preparer.quote
+        session.execute(text(f"TRUNCATE {', '.join(quote(table.name) for table in tables + rollups)} RESTART IDENTITY"))
+        return
+    for table in list(reversed(tables)) + rollups:
+        session.execute(delete(table))
+
+
+def _reset_sequences(session: Session):
+    """
+    Depois do COPY com ids explícitos, as sequences voltam a apontar para depois do maior id.
+    """
+    for table in snapshot_tables():
+        if "id" not in table.c:
+            continue
+        session.execute(
+            select(func.setval(func.pg_get_serial_sequence(table.name, "id"), func.coalesce(func.max(table.c.id), 1), func.max(table.c.id).isnot(None)))
+        )
+
+
+def _read_lines(fileobj: BinaryIO) -> Iterator:
+    try:
+        with gzip.open(fileobj, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    except (OSError, EOFError, ValueError) as e:
+        raise SnapshotError(f"Snapshot ilegível: {e}") from e
+
+
+def load_snapshot(session: Session, fileobj: BinaryIO, replace: bool = False, batch_size: int = SNAPSHOT_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Carrega um snapshot numa única transação: ou o catálogo inteiro entra, ou nada muda.
+
+    Sem `replace` o catálogo de destino precisa estar vazio; com `replace` ele é apagado
+    na mesma transação antes da carga. Devolve as linhas carregadas por tabela.
+    """
+    tables = {table.name: table for table in snapshot_tables()}
+    rollups = set(ROLLUP_TABLES.values())
+    dialect = session.get_bind().dialect.name
+    lines = _read_lines(fileobj)
+
+    header = next(lines, None)
+    if not isinstance(header, dict) or header.get("formato") != SNAPSHOT_FORMAT:
+        raise SnapshotError("Arquivo não é um snapshot do infogrid")
+    if header.get("versao") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Versão de snapshot não suportada: {header.get('versao')}")
+
+    try:
+        if dialect == "postgresql":
+            # FKs DEFERRABLE: a checagem roda uma vez no commit, não a cada linha
+            session.execute(text("SET CONSTRAINTS ALL DEFERRED"))
+        if replace:
+            _clear_catalog(session)
+        elif not _catalog_is_empty(session):
+            raise CatalogNotEmptyError("O catálogo de destino não está vazio; use replace para substituí-lo")
+
+        counts: Dict[str, int] = {}
+        loader: Optional[_TableLoader] = None
+        finished = None
+        for line in lines:
+            if isinstance(line, list):
+                if loader is None:
+                    raise SnapshotError("Linha de dados antes do cabeçalho de uma tabela")
+                loader.add(line)
+                continue
+            if loader is not None:
+                loader.flush()
+                counts[loader.table.name] = loader.count
+                loader = None
+            if line.get("fim"):
+                finished = line
+                break
+            if line.get("tabela") not in tables:
+                raise SnapshotError(f"Tabela desconhecida no snapshot: {line.get('tabela')}")
+            table = tables[line["tabela"]]
+            if table in rollups:
+                # Descarta o que os triggers somaram na carga de registros_acesso: o snapshot traz os totais
+                session.execute(delete(table))
+            loader = _TableLoader(session, table, line["colunas"], batch_size)
+
+        if finished is None:
+            raise SnapshotError("Snapshot truncado: marcador de fim ausente")
+        if finished.get("linhas") != counts:
+            raise SnapshotError(f"Contagem de linhas não confere: esperado {finished.get('linhas')}, carregado {counts}")
+        if dialect == "postgresql":
+            _reset_sequences(session)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    # Caches e índices em memória de todos os workers foram feitos para o catálogo anterior
+    publish_reload_sync(session)
+    logger.info(f"Snapshot importado: {sum(counts.values())} linhas em {len(counts)} tabelas")
+    return counts
+
+
+def import_snapshot(fileobj: BinaryIO, replace: bool = False, batch_size: int = SNAPSHOT_BATCH_SIZE) -> Dict[str, int]:
+    with Session(database.engine, expire_on_commit=False) as session:
+        return load_snapshot(session, fileobj, replace, batch_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+    export_parser = subparsers.add_parser("export", help="grava o catálogo inteiro num arquivo .jsonl.gz")
+    export_parser.add_argument("arquivo")
+    import_parser = subparsers.add_parser("import", help="carrega um snapshot no catálogo")
+    import_parser.add_argument("arquivo")
+    import_parser.add_argument("--replace", action="store_true", help="apaga o catálogo atual antes da carga")
+    for subparser in (export_parser, import_parser):
+        subparser.add_argument("--batch", type=int, default=SNAPSHOT_BATCH_SIZE, help="linhas por lote")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.comando == "export":
+            counts = export_snapshot(args.arquivo, args.batch)
+        else:
+            with open(args.arquivo, "rb") as f:
+                counts = import_snapshot(f, args.replace, args.batch)
+    except SnapshotError as e:
+        print(f"Erro: {e}")
+        return 1
+    for tabela, linhas in counts.items():
+        print(f"{tabela}: {linhas}")
+    print(f"{sum(counts.values())} linhas {'exportadas' if args.comando == 'export' else 'importadas'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
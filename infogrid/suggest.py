@@ -0,0 +1,134 @@
+import logging
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from infogrid.models import Coluna, Database, Responsavel, Tabela, TopicoKafka
+
+logger = logging.getLogger("app_logger")
+
+# tipo -> model cujos nomes entram no índice de sugestões
+SUGGEST_TARGETS = {
+    "database": Database,
+    "tabela": Tabela,
+    "coluna": Coluna,
+    "topicokafka": TopicoKafka,
+    "responsavel": Responsavel,
+}
+
+# Separadores de palavra em nomes técnicos (snake_case, pontos, hífens, espaços)
+_TOKEN_BOUNDARY = re.compile(r"[\s_.\-/]+")
+
+
+def normalize(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def index_keys(nome: str) -> List[str]:
+    """
+    Chaves de um nome: o nome inteiro e cada sufixo que começa numa palavra,
+    para que "fat" sugira tanto "fatura" quanto "cliente_fatura".
+    """
+    key = normalize(nome).strip()
+    keys = [key]
+    for match in _TOKEN_BOUNDARY.finditer(key):
+        suffix = key[match.end():]
+        if suffix:
+            keys.append(suffix)
+    return list(dict.fromkeys(keys))
+
+
+class PrefixIndex:
+    """
+    Índice de prefixos em memória: um array ordenado de (chave, tipo, id, nome) consultado com bisect.
+
+    Construído no startup e mantido pelos handlers de criação/atualização/exclusão.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: list = []
+        self._keys_by_entity: dict = {}
+
+    def __len__(self):
+        return len(self._keys_by_entity)
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+            self._keys_by_entity = {}
+
+    def replace_all(self, rows: Iterable[tuple]):
+        """
+        Reconstrói o índice a partir de (tipo, id, nome) de uma vez (ordenação única, sem insort).
+        """
+        entries, keys_by_entity = [], {}
+        for tipo, entity_id, nome in rows:
+            entity_entries = [(key, tipo, entity_id, nome) for key in index_keys(nome)]
+            entries.extend(entity_entries)
+            keys_by_entity[(tipo, entity_id)] = entity_entries
+        entries.sort()
+        with self._lock:
+            self._entries = entries
+            self._keys_by_entity = keys_by_entity
+
+    def _remove_locked(self, tipo: str, entity_id: int):
+        for entry in self._keys_by_entity.pop((tipo, entity_id), ()):
+            position = bisect_left(self._entries, entry)
+            if position < len(self._entries) and self._entries[position] == entry:
+                del self._entries[position]
+
+    def add(self, tipo: str, entity_id: int, nome: str):
+        """
+        Insere ou atualiza (remove as chaves antigas) o nome de uma entidade.
+        """
+        entity_entries = [(key, tipo, entity_id, nome) for key in index_keys(nome)]
+        with self._lock:
+            self._remove_locked(tipo, entity_id)
+            for entry in entity_entries:
+                insort(self._entries, entry)
+            self._keys_by_entity[(tipo, entity_id)] = entity_entries
+
+    def remove(self, tipo: str, entity_id: int):
+        with self._lock:
+            self._remove_locked(tipo, entity_id)
+
+    def suggest(self, prefix: str, limit: int = 10, tipos: Optional[Iterable[str]] = None) -> List[dict]:
+        prefix = normalize(prefix).strip()
+        tipos = set(tipos) if tipos else None
+        results, seen = [], set()
+        with self._lock:
+            entries = self._entries
+            position = bisect_left(entries, (prefix,))
+            while position < len(entries) and len(results) < limit:
+                key, tipo, entity_id, nome = entries[position]
+                if not key.startswith(prefix):
+                    break
+                position += 1
+                if (tipos is not None and tipo not in tipos) or (tipo, entity_id) in seen:
+                    continue
+                seen.add((tipo, entity_id))
+                results.append({"tipo": tipo, "id": entity_id, "nome": nome})
+        return results
+
+    def load(self, session: Session, batch_size: int = 10000):
+        """
+        Carrega id/nome de todas as entidades do catálogo (só as duas colunas, em lotes).
+        """
+        def rows():
+            for tipo, model in SUGGEST_TARGETS.items():
+                stmt = select(model.id, model.nome).execution_options(yield_per=batch_size)
+                for entity_id, nome in session.execute(stmt):
+                    yield tipo, entity_id, nome
+
+        self.replace_all(rows())
+        logger.info(f"Índice de sugestões carregado com {len(self)} entidades")
+
+
+suggest_index = PrefixIndex()
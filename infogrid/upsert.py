@@ -0,0 +1,152 @@
+import logging
+from typing import List, Sequence
+
+from sqlalchemy import or_, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from infogrid.models import Coluna, ColunaTopicoKafka, Database, Responsavel, Tabela, TopicoKafka
+
+logger = logging.getLogger("app_logger")
+
+# tipo -> (model, chave natural). Cada chave tem constraint única (ON CONFLICT precisa dela).
+UPSERT_TARGETS = {
+    "database": (Database, ("nome",)),
+    "tabela": (Tabela, ("database_id", "nome")),
+    "topicokafka": (TopicoKafka, ("nome",)),
+    "responsavel": (Responsavel, ("email",)),
+    "coluna": (Coluna, ("tabela_id", "nome")),
+    "colunatopicokafka": (ColunaTopicoKafka, ("topico_kafka_id", "nome")),
+}
+
+# tipo -> (campo do pai, model do pai), verificado antes do upsert
+UPSERT_PARENTS = {
+    "tabela": ("database_id", Database),
+    "coluna": ("tabela_id", Tabela),
+    "colunatopicokafka": ("topico_kafka_id", TopicoKafka),
+}
+
+# Linhas por INSERT ... ON CONFLICT; todos os lotes rodam na mesma transação
+UPSERT_BATCH_SIZE = 1000
+SYNC_MAX_ROWS = 50000
+
+CREATED = "created"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+PARENT_NOT_FOUND = "parent_not_found"
+
+_DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def _key(row: dict, keys: Sequence[str]) -> tuple:
+    return tuple(row[key] for key in keys)
+
+
+def _upsert_batch(session: Session, model, keys: Sequence[str], rows: List[dict]) -> dict:
+    """
+    Um lote: busca as chaves que já existem e faz o upsert, devolvendo chave -> (id, status).
+
+    O DO UPDATE só reescreve linhas em que algum valor mudou (IS DISTINCT FROM): um sync
+    noturno que reenvia o catálogo inteiro não gera uma versão nova de cada linha.
+    """
+    table = model.__table__
+    key_columns = [table.c[key] for key in keys]
+    key_values = [_key(row, keys) for row in rows]
+    existing = {
+        tuple(found[:-1]): found[-1]
+        for found in session.execute(select(*key_columns, table.c.id).where(tuple_(*key_columns).in_(key_values)))
+    }
+
+    insert = _DIALECT_INSERTS[session.get_bind().dialect.name]
+    stmt = insert(table)
+    value_columns = [column for column in rows[0] if column not in keys]
+    if value_columns:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={column: stmt.excluded[column] for column in value_columns},
+            where=or_(*(table.c[column].is_distinct_from(stmt.excluded[column]) for column in value_columns)),
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=key_columns)
+    written = session.execute(stmt.returning(*key_columns, table.c.id), rows)
+
+    outcomes = {}
+    for found in written:
+        key = tuple(found[:-1])
+        outcomes[key] = (found[-1], UPDATED if key in existing else CREATED)
+    for key, entity_id in existing.items():
+        outcomes.setdefault(key, (entity_id, UNCHANGED))
+    return outcomes
+
+
+def upsert_rows(session: Session, tipo: str, rows: Sequence[dict], batch_size: int = UPSERT_BATCH_SIZE, commit: bool = True) -> List[dict]:
+    """
+    Upsert idempotente por chave natural, em lotes de INSERT ... ON CONFLICT DO UPDATE ... RETURNING.
+
+    Roda numa Session síncrona (via `run_sync`) e numa única transação. Linhas repetidas
+    no corpo valem pela última ocorrência; só as colunas presentes em cada linha são
+    atualizadas. Linhas cujo pai (UPSERT_PARENTS) não existe ficam de fora, com status
+    parent_not_found, como em bulk.insert_children. Devolve id e status de cada linha,
+    na ordem recebida.
+
+    Um pai excluído entre a consulta e o upsert faz a transação falhar com IntegrityError
+    (chave estrangeira), tratada pelos handlers.
+    """
+    model, keys = UPSERT_TARGETS[tipo]
+    latest = {}
+    for row in rows:
+        latest[_key(row, keys)] = row
+
+    missing_parents = set()
+    if tipo in UPSERT_PARENTS:
+        parent_field, parent_model = UPSERT_PARENTS[tipo]
+        parent_ids = {row[parent_field] for row in latest.values() if row.get(parent_field) is not None}
+        found = set(session.scalars(select(parent_model.id).where(parent_model.id.in_(parent_ids)))) if parent_ids else set()
+        missing_parents = parent_ids - found
+        latest = {key: row for key, row in latest.items() if row.get(parent_field) not in missing_parents}
+
+    # Um INSERT precisa das mesmas colunas em todas as linhas: agrupa pelo conjunto de campos
+    groups = {}
+    for row in latest.values():
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+
+    outcomes = {}
+    for group in groups.values():
+        for start in range(0, len(group), batch_size):
+            outcomes.update(_upsert_batch(session, model, keys, group[start:start + batch_size]))
+    if commit:
+        session.commit()
+
+    results = []
+    for indice, row in enumerate(rows):
+        entity_id, status = outcomes.get(_key(row, keys), (None, PARENT_NOT_FOUND))
+        results.append({"indice": indice, "id": entity_id, "status": status})
+    logger.info(f"Sync de {tipo}: {len(rows)} linhas, {sum(s == CREATED for _, s in outcomes.values())} criadas")
+    return results
+
+
+def sync_summary(results: List[dict]) -> dict:
+    counts = {status: 0 for status in (CREATED, UPDATED, UNCHANGED, PARENT_NOT_FOUND)}
+    for result in results:
+        counts[result["status"]] += 1
+    return {
+        "criados": counts[CREATED],
+        "atualizados": counts[UPDATED],
+        "inalterados": counts[UNCHANGED],
+        "rejeitados": counts[PARENT_NOT_FOUND],
+        "resultados": results,
+    }
+
+
+def changed_entities(rows: Sequence[dict], results: List[dict], name_field: str = "nome") -> List[tuple]:
+    """
+    (id, nome) das linhas criadas ou atualizadas, para publish_changes.
+    """
+    return list({
+        result["id"]: row.get(name_field)
+        for row, result in zip(rows, results)
+        if result["status"] in (CREATED, UPDATED)
+    }.items())
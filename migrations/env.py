@@ -23,6 +23,20 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+
+# Índices criados à mão nas migrations (tsvector, trigram, prefixo) que não existem nos models
+MANAGED_INDEX_SUFFIXES = ("_search_vector", "_trgm", "_prefix")
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Ignora no autogenerate as colunas tsvector da busca textual e os índices de expressão."""
+    if type_ == "column" and name == "search_vector":
+        return False
+    if type_ == "index" and name.endswith(MANAGED_INDEX_SUFFIXES):
+        return False
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -47,6 +61,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -68,7 +83,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
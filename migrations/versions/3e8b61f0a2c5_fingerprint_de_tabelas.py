@@ -0,0 +1,63 @@
+"""Fingerprint de tabelas para o sync incremental de schemas
+
+Revision ID: 3e8b61f0a2c5
+Revises: 9a4f2c7d1e38
+Create Date: 2026-10-17 12:05:12.734021
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e8b61f0a2c5'
+down_revision: Union[str, None] = '9a4f2c7d1e38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Qualquer escrita em colunas fora do sync (API, bulk, SQL manual) invalida o fingerprint
+# da tabela, para que a próxima coleta compare as colunas dela de novo. Triggers por
+# comando (FOR EACH STATEMENT) com transition tables: um bulk de 5000 colunas gera um
+# único UPDATE em tabelas, não 5000.
+TRANSITION_TRIGGERS = [
+    ('INSERT', 'REFERENCING NEW TABLE AS new_rows'),
+    ('UPDATE', 'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+    ('DELETE', 'REFERENCING OLD TABLE AS old_rows'),
+]
+
+
+def upgrade() -> None:
+    op.add_column('tabelas', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+    op.execute("""
+        CREATE OR REPLACE FUNCTION limpar_fingerprint_tabelas() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE tabelas SET fingerprint = NULL
+                WHERE fingerprint IS NOT NULL AND id IN (SELECT tabela_id FROM new_rows);
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE tabelas SET fingerprint = NULL
+                WHERE fingerprint IS NOT NULL AND id IN (SELECT tabela_id FROM old_rows);
+            ELSE
+                UPDATE tabelas SET fingerprint = NULL
+                WHERE fingerprint IS NOT NULL
+                  AND id IN (SELECT tabela_id FROM old_rows UNION SELECT tabela_id FROM new_rows);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for event, referencing in TRANSITION_TRIGGERS:
+        op.execute(
+            f"CREATE TRIGGER colunas_limpar_fingerprint_{event.lower()} AFTER {event} ON colunas "
+            f"{referencing} FOR EACH STATEMENT EXECUTE FUNCTION limpar_fingerprint_tabelas()"
+        )
+
+
+def downgrade() -> None:
+    for event, _ in TRANSITION_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS colunas_limpar_fingerprint_{event.lower()} ON colunas")
+    op.execute("DROP FUNCTION IF EXISTS limpar_fingerprint_tabelas()")
+    op.drop_column('tabelas', 'fingerprint')
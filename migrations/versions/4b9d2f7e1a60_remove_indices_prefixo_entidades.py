@@ -0,0 +1,44 @@
+"""Remove os indices de prefixo dos filtros de entidades
+
+Revision ID: 4b9d2f7e1a60
+Revises: c5e1b8d3f027
+Create Date: 2026-10-17 22:15:41.308127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b9d2f7e1a60'
+down_revision: Union[str, None] = 'c5e1b8d3f027'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Termos curtos voltaram a ser busca por substring (lower(coluna) LIKE '%termo%'), que um
+# btree text_pattern_ops não atende: os índices só custavam nas escritas
+PREFIX_COLUMNS = [
+    ('responsaveis', 'nome'),
+    ('responsaveis', 'email'),
+    ('databases', 'nome'),
+    ('databases', 'tecnologia'),
+    ('tabelas', 'nome'),
+    ('topicos_kafka', 'nome'),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, column in PREFIX_COLUMNS:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_{column}_prefix")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, column in PREFIX_COLUMNS:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_{column}_prefix "
+                f"ON {table} (lower({column}) text_pattern_ops)"
+            )
@@ -0,0 +1,73 @@
+"""Busca textual com tsvector e indices GIN
+
+Revision ID: 5c060831dca6
+Revises: c82eb372e4f5
+Create Date: 2026-10-17 09:12:40.518233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c060831dca6'
+down_revision: Union[str, None] = 'c82eb372e4f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Cada tabela recebe uma coluna tsvector gerada (mantida pelo próprio Postgres em
+# INSERT/UPDATE) combinando o dicionário português (stemming) e o simple (nomes técnicos)
+SEARCH_VECTORS = {
+    'databases': """
+        setweight(to_tsvector('simple', coalesce(nome, '')), 'A') ||
+        setweight(to_tsvector('portuguese', coalesce(nome, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(tecnologia, '')), 'C') ||
+        setweight(to_tsvector('portuguese', coalesce(descricao, '')), 'B')
+    """,
+    'tabelas': """
+        setweight(to_tsvector('simple', coalesce(nome, '')), 'A') ||
+        setweight(to_tsvector('portuguese', coalesce(nome, '')), 'A') ||
+        setweight(to_tsvector('portuguese', coalesce(descricao, '')), 'B')
+    """,
+    'colunas': """
+        setweight(to_tsvector('simple', coalesce(nome, '')), 'A') ||
+        setweight(to_tsvector('portuguese', coalesce(nome, '')), 'A') ||
+        setweight(to_tsvector('portuguese', coalesce(descricao, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(tipo_dado, '')), 'D')
+    """,
+    'topicos_kafka': """
+        setweight(to_tsvector('simple', coalesce(nome, '')), 'A') ||
+        setweight(to_tsvector('portuguese', coalesce(nome, '')), 'A') ||
+        setweight(to_tsvector('portuguese', coalesce(descricao, '')), 'B')
+    """,
+    'colunas_topicos_kafka': """
+        setweight(to_tsvector('simple', coalesce(nome, '')), 'A') ||
+        setweight(to_tsvector('portuguese', coalesce(nome, '')), 'A') ||
+        setweight(to_tsvector('portuguese', coalesce(descricao, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(tipo_dado, '')), 'D')
+    """,
+    'responsaveis': """
+        setweight(to_tsvector('simple', coalesce(nome, '')), 'A') ||
+        setweight(to_tsvector('portuguese', coalesce(nome, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(email, '')), 'B') ||
+        setweight(to_tsvector('portuguese', coalesce(cargo, '')), 'C')
+    """,
+}
+
+
+def upgrade() -> None:
+    for table, expression in SEARCH_VECTORS.items():
+        op.execute(
+            f"ALTER TABLE {table} ADD COLUMN search_vector tsvector "
+            f"GENERATED ALWAYS AS ({expression}) STORED"
+        )
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    for table in SEARCH_VECTORS:
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        op.drop_column(table, 'search_vector')
@@ -0,0 +1,66 @@
+"""Indices trigram para os filtros de entidades
+
+Revision ID: 71356ab0cc9d
+Revises: 5c060831dca6
+Create Date: 2026-10-17 10:03:18.226954
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '71356ab0cc9d'
+down_revision: Union[str, None] = '5c060831dca6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Colunas filtradas por substring em infogrid/routers/entidades.py
+TRIGRAM_COLUMNS = [
+    ('responsaveis', 'nome'),
+    ('responsaveis', 'email'),
+    ('databases', 'nome'),
+    ('databases', 'tecnologia'),
+    ('tabelas', 'nome'),
+    ('tabelas', 'descricao'),
+    ('topicos_kafka', 'nome'),
+    ('topicos_kafka', 'descricao'),
+]
+
+# Termos curtos (< 3 caracteres) viram busca por prefixo, atendida por btree text_pattern_ops.
+# As colunas Text (descricao) ficam de fora: valores longos estouram o limite de linha do btree.
+PREFIX_COLUMNS = [
+    ('responsaveis', 'nome'),
+    ('responsaveis', 'email'),
+    ('databases', 'nome'),
+    ('databases', 'tecnologia'),
+    ('tabelas', 'nome'),
+    ('topicos_kafka', 'nome'),
+]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CONCURRENTLY para não bloquear escrita no catálogo enquanto os índices são criados
+    with op.get_context().autocommit_block():
+        for table, column in TRIGRAM_COLUMNS:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_{column}_trgm "
+                f"ON {table} USING gin (lower({column}) gin_trgm_ops)"
+            )
+        for table, column in PREFIX_COLUMNS:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_{column}_prefix "
+                f"ON {table} (lower({column}) text_pattern_ops)"
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, column in PREFIX_COLUMNS:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_{column}_prefix")
+        for table, column in TRIGRAM_COLUMNS:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_{column}_trgm")
@@ -0,0 +1,50 @@
+"""Chaves naturais unicas para o upsert em lote
+
+Revision ID: 9a4f2c7d1e38
+Revises: 71356ab0cc9d
+Create Date: 2026-10-17 11:20:41.502113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4f2c7d1e38'
+down_revision: Union[str, None] = '71356ab0cc9d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (constraint, tabela, colunas) — alvos do ON CONFLICT em infogrid/upsert.py
+UNIQUE_KEYS = [
+    ('uq_tabelas_database_id_nome', 'tabelas', ('database_id', 'nome')),
+    ('uq_topicos_kafka_nome', 'topicos_kafka', ('nome',)),
+    ('uq_colunas_tabela_id_nome', 'colunas', ('tabela_id', 'nome')),
+    ('uq_colunas_topicos_kafka_topico_kafka_id_nome', 'colunas_topicos_kafka', ('topico_kafka_id', 'nome')),
+]
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    for name, table, columns in UNIQUE_KEYS:
+        cols = ', '.join(columns)
+        duplicates = connection.execute(sa.text(
+            f"SELECT count(*) FROM (SELECT {cols} FROM {table} GROUP BY {cols} HAVING count(*) > 1) d"
+        )).scalar()
+        if duplicates:
+            raise RuntimeError(f"{table} tem {duplicates} chaves ({cols}) repetidas; remova as duplicatas antes de aplicar {name}")
+
+    # Índice único criado sem bloquear escrita e depois promovido a constraint (lock curto)
+    with op.get_context().autocommit_block():
+        for name, table, columns in UNIQUE_KEYS:
+            op.execute(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+    for name, table, columns in UNIQUE_KEYS:
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}")
+
+
+def downgrade() -> None:
+    for name, table, columns in UNIQUE_KEYS:
+        op.drop_constraint(name, table, type_='unique')
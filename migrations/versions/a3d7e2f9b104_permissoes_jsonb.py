@@ -0,0 +1,48 @@
+"""permissoes_concedidas em JSONB com indice GIN
+
+Revision ID: a3d7e2f9b104
+Revises: f2c8a4d6e913
+Create Date: 2026-10-17 19:36:02.118540
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d7e2f9b104'
+down_revision: Union[str, None] = 'f2c8a4d6e913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# jsonb_path_ops: índice menor e mais rápido, atende só @> (o filtro de /registroacesso/busca/)
+INDEX = 'ix_registros_acesso_permissoes_concedidas'
+
+
+def upgrade() -> None:
+    # Linhas gravadas quando a coluna era TEXT ficaram como string JSON ("[\"leitura\"]"):
+    # são decodificadas para a lista; NULL vira lista vazia
+    op.execute(
+        """
+        ALTER TABLE registros_acesso
+        ALTER COLUMN permissoes_concedidas TYPE JSONB
+        USING CASE
+            WHEN permissoes_concedidas IS NULL THEN '[]'::jsonb
+            WHEN json_typeof(permissoes_concedidas) = 'string' THEN (permissoes_concedidas #>> '{}')::jsonb
+            ELSE permissoes_concedidas::jsonb
+        END
+        """
+    )
+    op.execute("ALTER TABLE registros_acesso ALTER COLUMN permissoes_concedidas SET DEFAULT '[]'::jsonb")
+    op.execute("ALTER TABLE registros_acesso ALTER COLUMN permissoes_concedidas SET NOT NULL")
+    # Tabela particionada: o índice no pai cria um em cada partição (sem CONCURRENTLY)
+    op.execute(f"CREATE INDEX {INDEX} ON registros_acesso USING gin (permissoes_concedidas jsonb_path_ops)")
+
+
+def downgrade() -> None:
+    op.execute(f"DROP INDEX IF EXISTS {INDEX}")
+    op.execute("ALTER TABLE registros_acesso ALTER COLUMN permissoes_concedidas DROP NOT NULL")
+    op.execute("ALTER TABLE registros_acesso ALTER COLUMN permissoes_concedidas DROP DEFAULT")
+    op.execute("ALTER TABLE registros_acesso ALTER COLUMN permissoes_concedidas TYPE JSON USING permissoes_concedidas::json")
@@ -0,0 +1,44 @@
+"""FKs adiáveis para a importação de snapshots
+
+Revision ID: b7d2e9c4a1f6
+Revises: 3e8b61f0a2c5
+Create Date: 2026-10-17 14:20:41.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e9c4a1f6'
+down_revision: Union[str, None] = '3e8b61f0a2c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (tabela, coluna) de cada FK; os nomes são os gerados pelo Postgres em 0bbf3875f68b.
+# DEFERRABLE INITIALLY IMMEDIATE não muda nada para a aplicação: só permite que uma
+# transação peça SET CONSTRAINTS ALL DEFERRED e cheque as FKs uma vez no commit.
+FOREIGN_KEYS = [
+    ('tabelas', 'database_id'),
+    ('colunas', 'tabela_id'),
+    ('colunas_topicos_kafka', 'topico_kafka_id'),
+    ('registros_acesso', 'usuario_id'),
+    ('responsaveis_databases', 'responsavel_id'),
+    ('responsaveis_databases', 'database_id'),
+    ('responsaveis_tabelas', 'responsavel_id'),
+    ('responsaveis_tabelas', 'tabela_id'),
+    ('responsaveis_topicos_kafka', 'responsavel_id'),
+    ('responsaveis_topicos_kafka', 'topico_kafka_id'),
+]
+
+
+def upgrade() -> None:
+    for table, column in FOREIGN_KEYS:
+        op.execute(f"ALTER TABLE {table} ALTER CONSTRAINT {table}_{column}_fkey DEFERRABLE INITIALLY IMMEDIATE")
+
+
+def downgrade() -> None:
+    for table, column in FOREIGN_KEYS:
+        op.execute(f"ALTER TABLE {table} ALTER CONSTRAINT {table}_{column}_fkey NOT DEFERRABLE")
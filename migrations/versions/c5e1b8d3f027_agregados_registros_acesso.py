@@ -0,0 +1,96 @@
+"""Agregados por hora e por dia de registros_acesso mantidos por triggers
+
+Revision ID: c5e1b8d3f027
+Revises: a3d7e2f9b104
+Create Date: 2026-10-17 20:44:19.615302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e1b8d3f027'
+down_revision: Union[str, None] = 'a3d7e2f9b104'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# tabela -> unidade do date_trunc
+ROLLUPS = {
+    'registros_acesso_por_hora': 'hour',
+    'registros_acesso_por_dia': 'day',
+}
+
+ROW = "data_solicitacao, conjunto_dados, coalesce(usuario_id, 0) AS usuario_id, coalesce(status, '') AS status"
+
+# Triggers por comando com tabelas de transição: um INSERT/COPY de N linhas faz um upsert
+# por grupo (período, conjunto, usuário, status), e não N. Transition tables só admitem um
+# evento por trigger, daí uma função por operação.
+OPERATIONS = {
+    'insert': ("REFERENCING NEW TABLE AS novos", f"SELECT {ROW}, 1 AS delta FROM novos"),
+    'update': (
+        "REFERENCING OLD TABLE AS antigos NEW TABLE AS novos",
+        f"SELECT {ROW}, -1 AS delta FROM antigos UNION ALL SELECT {ROW}, 1 AS delta FROM novos",
+    ),
+    'delete': ("REFERENCING OLD TABLE AS antigos", f"SELECT {ROW}, -1 AS delta FROM antigos"),
+}
+
+
+def _upsert(table: str, unit: str, source: str) -> str:
+    # ORDER BY: grupos sempre travados na mesma ordem, sem deadlock entre escritas concorrentes
+    return (
+        f"INSERT INTO {table} AS r (periodo, conjunto_dados, usuario_id, status, quantidade) "
+        f"SELECT date_trunc('{unit}', data_solicitacao), conjunto_dados, usuario_id, status, sum(delta) "
+        f"FROM {source} GROUP BY 1, 2, 3, 4 HAVING sum(delta) <> 0 ORDER BY 1, 2, 3, 4 "
+        f"ON CONFLICT (periodo, conjunto_dados, usuario_id, status) "
+        f"DO UPDATE SET quantidade = r.quantidade + excluded.quantidade"
+    )
+
+
+def upgrade() -> None:
+    for table in ROLLUPS:
+        op.execute(
+            f"""
+            CREATE TABLE {table} (
+                periodo timestamp without time zone NOT NULL,
+                conjunto_dados varchar(255) NOT NULL,
+                usuario_id integer NOT NULL,
+                status varchar(50) NOT NULL,
+                quantidade integer NOT NULL,
+                PRIMARY KEY (periodo, conjunto_dados, usuario_id, status)
+            )
+            """
+        )
+        op.execute(f"CREATE INDEX ix_{table}_conjunto_dados_periodo ON {table} (conjunto_dados, periodo)")
+
+    # Carga inicial e triggers com as escritas bloqueadas, para nenhuma linha ficar de fora
+    op.execute("LOCK TABLE registros_acesso IN SHARE MODE")
+    for table, unit in ROLLUPS.items():
+        op.execute(_upsert(table, unit, f"(SELECT {ROW}, 1 AS delta FROM registros_acesso) d"))
+
+    for operation, (referencing, delta) in OPERATIONS.items():
+        statements = ";\n".join(_upsert(table, unit, f"({delta}) d") for table, unit in ROLLUPS.items())
+        op.execute(
+            f"""
+            CREATE FUNCTION registros_acesso_rollup_{operation}() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                {statements};
+                RETURN NULL;
+            END
+            $$
+            """
+        )
+        op.execute(
+            f"CREATE TRIGGER registros_acesso_rollup_{operation} AFTER {operation.upper()} ON registros_acesso "
+            f"{referencing} FOR EACH STATEMENT EXECUTE FUNCTION registros_acesso_rollup_{operation}()"
+        )
+
+
+def downgrade() -> None:
+    for operation in OPERATIONS:
+        op.execute(f"DROP TRIGGER IF EXISTS registros_acesso_rollup_{operation} ON registros_acesso")
+        op.execute(f"DROP FUNCTION IF EXISTS registros_acesso_rollup_{operation}()")
+    for table in ROLLUPS:
+        op.execute(f"DROP TABLE {table}")
@@ -0,0 +1,63 @@
+"""Constraints para escritas em um comando (INSERT/UPDATE/DELETE ... RETURNING)
+
+Revision ID: d41f7a3b8c25
+Revises: b7d2e9c4a1f6
+Create Date: 2026-10-17 15:42:08.501376
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41f7a3b8c25'
+down_revision: Union[str, None] = 'b7d2e9c4a1f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# O POST de registro de acesso recusava repetidos com um SELECT antes do INSERT; agora quem
+# recusa é a constraint (sem a corrida entre a verificação e a inserção)
+REGISTRO_ACESSO_KEY = ('uq_registros_acesso_usuario_id_conjunto_dados_data_solicitacao', 'registros_acesso', ('usuario_id', 'conjunto_dados', 'data_solicitacao'))
+
+# (tabela, coluna, tabela referenciada) das associações: o DELETE direto de um responsável
+# ou alvo leva junto as associações, como o ORM fazia pelo relationship(secondary=...)
+ASSOCIATION_FKS = [
+    ('responsaveis_databases', 'responsavel_id', 'responsaveis'),
+    ('responsaveis_databases', 'database_id', 'databases'),
+    ('responsaveis_tabelas', 'responsavel_id', 'responsaveis'),
+    ('responsaveis_tabelas', 'tabela_id', 'tabelas'),
+    ('responsaveis_topicos_kafka', 'responsavel_id', 'responsaveis'),
+    ('responsaveis_topicos_kafka', 'topico_kafka_id', 'topicos_kafka'),
+]
+
+
+def _recreate_association_fks(ondelete):
+    for table, column, referent in ASSOCIATION_FKS:
+        name = f"{table}_{column}_fkey"
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, referent, [column], ['id'], ondelete=ondelete, deferrable=True, initially='IMMEDIATE')
+
+
+def upgrade() -> None:
+    name, table, columns = REGISTRO_ACESSO_KEY
+    cols = ', '.join(columns)
+    duplicates = op.get_bind().execute(sa.text(
+        f"SELECT count(*) FROM (SELECT {cols} FROM {table} GROUP BY {cols} HAVING count(*) > 1) d"
+    )).scalar()
+    if duplicates:
+        raise RuntimeError(f"{table} tem {duplicates} chaves ({cols}) repetidas; remova as duplicatas antes de aplicar {name}")
+
+    with op.get_context().autocommit_block():
+        op.execute(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({cols})")
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}")
+
+    _recreate_association_fks('CASCADE')
+
+
+def downgrade() -> None:
+    _recreate_association_fks(None)
+    name, table, _ = REGISTRO_ACESSO_KEY
+    op.drop_constraint(name, table, type_='unique')
@@ -0,0 +1,46 @@
+"""Indices para FKs sem cobertura e para a paginacao de registros de acesso
+
+Revision ID: e6b3f1a9c2d4
+Revises: d41f7a3b8c25
+Create Date: 2026-10-17 16:58:13.204417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b3f1a9c2d4'
+down_revision: Union[str, None] = 'd41f7a3b8c25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (índice, tabela, colunas). As FKs tabelas.database_id, colunas.tabela_id,
+# colunas_topicos_kafka.topico_kafka_id e registros_acesso.usuario_id já são a coluna inicial
+# das constraints únicas (9a4f2c7d1e38, d41f7a3b8c25), que também cobrem
+# (usuario_id, conjunto_dados, data_solicitacao); faltavam:
+INDEXES = [
+    # Lado reverso das associações: a PK (responsavel_id, alvo_id) não atende "responsáveis
+    # do alvo Y" nem o ON DELETE CASCADE ao apagar o alvo. Com responsavel_id no índice a
+    # consulta é index-only.
+    ('ix_responsaveis_databases_database_id', 'responsaveis_databases', ('database_id', 'responsavel_id')),
+    ('ix_responsaveis_tabelas_tabela_id', 'responsaveis_tabelas', ('tabela_id', 'responsavel_id')),
+    ('ix_responsaveis_topicos_kafka_topico_kafka_id', 'responsaveis_topicos_kafka', ('topico_kafka_id', 'responsavel_id')),
+    # Keyset de /registroacesso/pagined/?order_by=... ordena por (coluna, id)
+    ('ix_registros_acesso_data_solicitacao_id', 'registros_acesso', ('data_solicitacao', 'id')),
+    ('ix_registros_acesso_conjunto_dados_id', 'registros_acesso', ('conjunto_dados', 'id')),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
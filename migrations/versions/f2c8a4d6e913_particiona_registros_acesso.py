@@ -0,0 +1,103 @@
+"""Particiona registros_acesso por mes de data_solicitacao
+
+Revision ID: f2c8a4d6e913
+Revises: e6b3f1a9c2d4
+Create Date: 2026-10-17 18:21:47.930215
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8a4d6e913'
+down_revision: Union[str, None] = 'e6b3f1a9c2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Partições criadas à frente do mês atual; depois disso quem cria é o job de
+# infogrid/partitions.py (python -m infogrid.partitions), que também arquiva as antigas
+MONTHS_AHEAD = 3
+
+COLUMNS = """
+    id integer NOT NULL,
+    usuario_id integer,
+    conjunto_dados varchar(255) NOT NULL,
+    data_solicitacao timestamp without time zone NOT NULL,
+    finalidade_uso text NOT NULL,
+    permissoes_concedidas json,
+    status varchar(50)
+"""
+
+# Índices e constraints recriados na tabela nova. Numa tabela particionada a PK e as
+# constraints únicas precisam conter a chave de partição: a PK passa a ser (id, data_solicitacao)
+CONSTRAINTS = [
+    "ALTER TABLE registros_acesso ADD CONSTRAINT registros_acesso_pkey PRIMARY KEY (id, data_solicitacao)",
+    "ALTER TABLE registros_acesso ADD CONSTRAINT uq_registros_acesso_usuario_id_conjunto_dados_data_solicitacao "
+    "UNIQUE (usuario_id, conjunto_dados, data_solicitacao)",
+    "ALTER TABLE registros_acesso ADD CONSTRAINT registros_acesso_usuario_id_fkey FOREIGN KEY (usuario_id) "
+    "REFERENCES usuarios (id) DEFERRABLE INITIALLY IMMEDIATE",
+    "CREATE INDEX ix_registros_acesso_id ON registros_acesso (id)",
+    "CREATE INDEX ix_registros_acesso_data_solicitacao_id ON registros_acesso (data_solicitacao, id)",
+    "CREATE INDEX ix_registros_acesso_conjunto_dados_id ON registros_acesso (conjunto_dados, id)",
+]
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _replace_table(create_sql: str, extra_sql: Sequence[str] = ()):
+    """
+    Copia registros_acesso para uma tabela nova e troca as duas. A sequence dos ids é
+    desvinculada da tabela antiga antes do DROP e passa a pertencer à nova.
+    """
+    op.execute(create_sql)
+    for sql in extra_sql:
+        op.execute(sql)
+    op.execute("INSERT INTO registros_acesso_nova SELECT id, usuario_id, conjunto_dados, data_solicitacao, "
+               "finalidade_uso, permissoes_concedidas, status FROM registros_acesso")
+    op.execute("ALTER SEQUENCE registros_acesso_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE registros_acesso")
+    op.execute("ALTER TABLE registros_acesso_nova RENAME TO registros_acesso")
+    op.execute("ALTER TABLE registros_acesso ALTER COLUMN id SET DEFAULT nextval('registros_acesso_id_seq')")
+    op.execute("ALTER SEQUENCE registros_acesso_id_seq OWNED BY registros_acesso.id")
+    for sql in CONSTRAINTS:
+        op.execute(sql)
+
+
+def upgrade() -> None:
+    # Escritas em registros_acesso ficam bloqueadas durante a cópia (ACCESS EXCLUSIVE no DROP)
+    op.execute("LOCK TABLE registros_acesso IN EXCLUSIVE MODE")
+    oldest = op.get_bind().execute(sa.text("SELECT min(data_solicitacao) FROM registros_acesso")).scalar()
+    current = date.today().replace(day=1)
+    month = oldest.date().replace(day=1) if oldest is not None else current
+
+    partitions = [
+        "CREATE TABLE registros_acesso_padrao PARTITION OF registros_acesso_nova DEFAULT",
+    ]
+    while month <= _add_months(current, MONTHS_AHEAD):
+        following = _add_months(month, 1)
+        partitions.append(
+            f"CREATE TABLE registros_acesso_p{month:%Y_%m} PARTITION OF registros_acesso_nova "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+        )
+        month = following
+
+    _replace_table(
+        f"CREATE TABLE registros_acesso_nova ({COLUMNS}) PARTITION BY RANGE (data_solicitacao)",
+        partitions,
+    )
+
+
+def downgrade() -> None:
+    # Só volta o que ainda está anexado: partições já arquivadas pelo job não retornam
+    op.execute("LOCK TABLE registros_acesso IN EXCLUSIVE MODE")
+    _replace_table(f"CREATE TABLE registros_acesso_nova ({COLUMNS})")
+    op.execute("ALTER TABLE registros_acesso DROP CONSTRAINT registros_acesso_pkey")
+    op.execute("ALTER TABLE registros_acesso ADD CONSTRAINT registros_acesso_pkey PRIMARY KEY (id)")
@@ -0,0 +1,70 @@
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import asyncio  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from sqlalchemy.pool import NullPool, StaticPool  # noqa: E402
+
+from infogrid import database  # noqa: E402
+from infogrid.app import app  # noqa: E402
+from infogrid.models import table_registry  # noqa: E402
+from infogrid.cache import response_cache  # noqa: E402
+from infogrid.suggest import suggest_index  # noqa: E402
+from infogrid.acl import access_index  # noqa: E402
+
+
+@pytest.fixture
+def engine(request, monkeypatch, tmp_path):
+    """
+    Banco dos testes. Por padrão os handlers usam a Session síncrona no threadpool; com
+    `pytest.mark.parametrize("engine", ["sync", "async"], indirect=True)` o teste roda também
+    com ASYNC_DATABASE ligado (AsyncSession sobre aiosqlite), no mesmo arquivo SQLite que a
+    fixture `session` enxerga.
+    """
+    mode = getattr(request, "param", "sync")
+    if mode == "async":
+        path = tmp_path / "infogrid.db"
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        # Cada requisição do TestClient roda num event loop próprio: sem pool, nenhuma
+        # conexão aiosqlite passa de um loop para outro
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    else:
+        engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        async_engine = None
+    table_registry.metadata.create_all(engine)
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "async_engine", async_engine)
+    yield engine
+    if async_engine is not None:
+        asyncio.run(async_engine.dispose())
+    table_registry.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+
+
+@pytest.fixture
+def client(engine):
+    return TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clear_in_memory_state():
+    yield
+    suggest_index.clear()
+    access_index.clear()
+    response_cache.clear()
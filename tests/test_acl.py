@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+
+from infogrid.acl import AccessIndex, access_index
+from infogrid.changes import handle_notification
+from infogrid.models import RegistroAcesso, Usuario
+
+
+def test_indice_combina_registros_aprovados_e_refaz_a_mascara_quando_um_sai():
+    index = AccessIndex()
+    index.replace_all([(1, 7, "vendas", ["leitura"]), (2, 7, "vendas", ["escrita"]), (3, 8, "rh", ["leitura"])])
+
+    assert index.check(7, "vendas", ["leitura", "escrita"])
+    assert not index.check(7, "rh", ["leitura"])
+    assert not index.check(7, "vendas", ["admin"])
+
+    index.remove(2)
+    assert index.check(7, "vendas", ["leitura"]) and not index.check(7, "vendas", ["escrita"])
+    index.put(1, 7, "vendas", ["leitura"], "Negado")
+    assert not index.check(7, "vendas", ["leitura"])
+    index.put(3, 8, "financeiro", ["leitura", "admin"], "Aprovado")
+    assert not index.check(8, "rh", ["leitura"])
+    assert index.check(8, "financeiro", ["leitura", "admin"]) and not index.check(8, "financeiro", ["escrita"])
+
+
+def test_check_acompanha_as_escritas_e_os_avisos_de_outros_workers(client, session):
+    session.add(Usuario(nome="Ana", email="ana@empresa.com"))
+    session.add(RegistroAcesso(usuario_id=1, conjunto_dados="vendas", data_solicitacao=datetime(2026, 9, 1), finalidade_uso="BI", permissoes_concedidas=["leitura"], status="Aprovado"))
+    session.commit()
+    access_index.load(session)
+
+    def check(conjunto, permissao):
+        params = {"usuario_id": 1, "conjunto_dados": conjunto, "permissao": permissao}
+        return client.get("/api/v1/acesso/check", params=params).json()["permitido"]
+
+    assert check("vendas", "leitura") and not check("rh", "leitura")
+
+    payload = {"usuario_id": 1, "conjunto_dados": "rh", "data_solicitacao": "2026-09-02T00:00:00", "finalidade_uso": "BI", "permissoes_concedidas": ["leitura"], "status": "Pendente"}
+    registro_id = client.post("/api/v1/registroacesso/", json=payload).json()["id"]
+    assert not check("rh", "leitura")
+    client.patch(f"/api/v1/registroacesso/{registro_id}", json={"status": "Aprovado"})
+    assert check("rh", "leitura")
+    client.delete("/api/v1/registroacesso/1")
+    assert not check("vendas", "leitura")
+
+    acesso = {"usuario_id": 1, "conjunto_dados": "estoque", "permissoes_concedidas": ["escrita"], "status": "Aprovado"}
+    handle_notification(json.dumps({"origin": "outro-worker", "tipo": "registroacesso", "id": 99, "nome": None, "deleted": False, "acesso": acesso}))
+    verificacoes = [
+        {"usuario_id": 1, "conjunto_dados": "estoque", "permissoes": ["escrita"]},
+        {"usuario_id": 1, "conjunto_dados": "rh", "permissoes": ["leitura", "escrita"]},
+        {"usuario_id": 2, "conjunto_dados": "rh", "permissoes": ["leitura"]},
+    ]
+    assert client.post("/api/v1/acesso/check/batch", json=verificacoes).json() == [{"permitido": True}, {"permitido": False}, {"permitido": False}]
+
+
+def test_recarga_que_renumera_os_bits_troca_bits_e_mascaras_juntos():
+    index = AccessIndex()
+    index.replace_all([(1, 7, "vendas", ["leitura"]), (2, 8, "vendas", ["escrita"])])
+    bits, masks = index._view  # o que uma verificação em andamento já leu
+
+    # Na recarga "escrita" vem primeiro e fica com o bit que era de "leitura"
+    index.replace_all([(2, 8, "vendas", ["escrita"]), (3, 9, "rh", ["leitura"])])
+
+    assert bits["leitura"] & masks[7]["vendas"] and not bits["escrita"] & masks[7]["vendas"]
+    assert not index.check(7, "vendas", ["leitura"]) and not index.check(8, "vendas", ["leitura"])
+    assert index.check(8, "vendas", ["escrita"]) and index.check(9, "rh", ["leitura"])
@@ -0,0 +1,107 @@
+import sqlite3
+from http import HTTPStatus
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from infogrid.models import Coluna, Database, Responsavel, Tabela, TopicoKafka, responsaveis_tabelas, table_registry
+from infogrid.relationships import add_pairs
+from infogrid.suggest import suggest_index
+
+
+def coluna(nome, tabela_id=1, tipo_dado="text"):
+    return {"nome": nome, "tipo_dado": tipo_dado, "descricao": None, "tabela_id": tabela_id}
+
+
+def test_bulk_de_colunas_reporta_resultado_por_linha(client, session):
+    session.add(Database(nome="vendas", tecnologia="postgres"))
+    session.add(Tabela(nome="pedidos", database_id=1))
+    session.add(Coluna(nome="id", tipo_dado="int", tabela_id=1))
+    session.commit()
+
+    payload = [coluna("valor"), coluna("id"), coluna("valor"), coluna("cliente", tabela_id=99), coluna("  "), coluna("data_pedido")]
+    response = client.post("/api/v1/coluna/bulk", json=payload)
+
+    assert response.status_code == HTTPStatus.OK
+    body = response.json()
+    assert [item["status"] for item in body["resultados"]] == ["created", "exists", "duplicate", "parent_not_found", "invalid", "created"]
+    assert (body["criados"], body["rejeitados"]) == (2, 4)
+    assert body["resultados"][1]["id"] == 1
+    assert [c["nome"] for c in client.get("/api/v1/coluna/").json()] == ["id", "valor", "data_pedido"]
+    assert {s["nome"] for s in suggest_index.suggest("pedido")} == {"data_pedido"}
+
+
+def test_bulk_de_colunas_com_pai_excluido_durante_a_insercao_responde_400(client, session, monkeypatch):
+    def pai_excluido(session, *args):
+        raise IntegrityError("INSERT INTO colunas ...", {}, sqlite3.IntegrityError("FOREIGN KEY constraint failed"))
+
+    monkeypatch.setattr("infogrid.routers.coluna.insert_children", pai_excluido)
+    response = client.post("/api/v1/coluna/bulk", json=[coluna("valor")])
+
+    assert (response.status_code, response.json()["detail"]) == (HTTPStatus.BAD_REQUEST, "Tabela não encontrada; nenhuma coluna foi criada")
+
+
+def test_bulk_de_colunas_de_topico(client, session):
+    session.add(TopicoKafka(nome="pedidos"))
+    session.commit()
+
+    payload = [{"nome": f"campo_{i}", "tipo_dado": "string", "descricao": None, "topico_kafka_id": 1} for i in range(1500)]
+    body = client.post("/api/v1/colunatopicokafka/bulk", json=payload).json()
+
+    assert body["criados"] == 1500
+    assert len({item["id"] for item in body["resultados"]}) == 1500
+    assert client.get("/api/v1/colunatopicokafka/colunastopicoskafka").json() == {"quantidade": 1500}
+
+
+def test_associacao_em_lote_de_responsaveis_a_tabelas(client, session):
+    session.add(Database(nome="vendas", tecnologia="postgres"))
+    session.add_all([Tabela(nome=f"t{i}", database_id=1) for i in range(3)])
+    session.add(Responsavel(nome="Dados", email="dados@empresa.com"))
+    session.commit()
+    client.post("/api/v1/relacionamentos/responsaveis_tabelas/?responsavel_id=1&tabela_id=1")
+
+    pares = [{"responsavel_id": 1, "tabela_id": i} for i in (1, 2, 3, 3, 99)] + [{"responsavel_id": 7, "tabela_id": 1}]
+    response = client.post("/api/v1/relacionamentos/responsaveis_tabelas/batch", json=pares)
+
+    assert response.status_code == HTTPStatus.OK
+    body = response.json()
+    assert [p["tabela_id"] for p in body["novos"]] == [2, 3]
+    assert body["existentes"] == [{"responsavel_id": 1, "tabela_id": 1}]
+    assert body["ausentes"] == [{"responsavel_id": 1, "tabela_id": 99}, {"responsavel_id": 7, "tabela_id": 1}]
+    assert session.query(responsaveis_tabelas).count() == 3
+
+    response = client.request("DELETE", "/api/v1/relacionamentos/responsaveis_tabelas/batch", json=pares[:2] + [{"responsavel_id": 1, "tabela_id": 99}])
+    assert response.json() == {
+        "removidos": [{"responsavel_id": 1, "tabela_id": 1}, {"responsavel_id": 1, "tabela_id": 2}],
+        "ausentes": [{"responsavel_id": 1, "tabela_id": 99}],
+    }
+    assert session.query(responsaveis_tabelas).count() == 1
+
+
+def test_alvo_excluido_durante_a_associacao_vai_para_ausentes(tmp_path):
+    path = tmp_path / "infogrid.db"
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", lambda connection, _: connection.execute("PRAGMA foreign_keys=ON"))
+    table_registry.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Database(nome="vendas", tecnologia="postgres"))
+        session.add_all([Tabela(nome=f"t{i}", database_id=1) for i in range(2)])
+        session.add(Responsavel(nome="Dados", email="dados@empresa.com"))
+        session.commit()
+
+        # Outra conexão exclui a tabela 2 entre as consultas e o primeiro INSERT de associação
+        def exclui_tabela(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("INSERT INTO responsaveis_tabelas") and not excluidas:
+                with sqlite3.connect(path) as outra:
+                    outra.execute("DELETE FROM tabelas WHERE id = 2")
+                excluidas.append(2)
+
+        excluidas = []
+        event.listen(engine, "before_cursor_execute", exclui_tabela)
+        resultado = add_pairs(session, "responsaveis_tabelas", [(1, 1), (1, 2)])
+
+    assert excluidas == [2]
+    assert resultado["novos"] == [{"responsavel_id": 1, "tabela_id": 1}]
+    assert resultado["ausentes"] == [{"responsavel_id": 1, "tabela_id": 2}]
+    engine.dispose()
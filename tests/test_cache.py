@@ -0,0 +1,48 @@
+from http import HTTPStatus
+
+from infogrid.cache import response_cache
+
+
+def test_get_devolve_etag_e_304_sem_executar_o_handler(client, monkeypatch):
+    first = client.get("/api/v1/coluna/")
+    etag = first.headers["ETag"]
+    assert first.status_code == HTTPStatus.OK
+
+    # Com o ETag atual o handler nem é chamado
+    monkeypatch.setattr("infogrid.routers.coluna.select", None)
+    not_modified = client.get("/api/v1/coluna/", headers={"If-None-Match": etag})
+    assert not_modified.status_code == HTTPStatus.NOT_MODIFIED
+    assert not_modified.headers["ETag"] == etag
+
+    cached = client.get("/api/v1/coluna/")
+    assert cached.json() == first.json()
+    assert response_cache.stats()["hits"] == 1
+
+
+def test_escrita_invalida_respostas_dependentes(client):
+    payload = {"nome": "vendas", "tecnologia": "postgres", "descricao": None, "responsaveis": []}
+    etag = client.get("/api/v1/database/").headers["ETag"]
+    coluna_etag = client.get("/api/v1/coluna/").headers["ETag"]
+
+    client.post("/api/v1/database/", json=payload)
+
+    response = client.get("/api/v1/database/", headers={"If-None-Match": etag})
+    assert response.status_code == HTTPStatus.OK
+    assert [d["nome"] for d in response.json()] == ["vendas"]
+    assert response.headers["ETag"] != etag
+    assert client.get("/api/v1/coluna/", headers={"If-None-Match": coluna_etag}).status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_relacionamento_invalida_lista_de_databases(client, session):
+    client.post("/api/v1/database/", json={"nome": "vendas", "tecnologia": "postgres", "descricao": None, "responsaveis": []})
+    client.post("/api/v1/responsavel/", json={"nome": "Ana", "email": "ana@x.com", "cargo": None, "telefone": None})
+    assert client.get("/api/v1/database/").json()[0]["responsaveis"] == []
+
+    client.post("/api/v1/relacionamentos/responsaveis_databases/?responsavel_id=1&database_id=1")
+    assert [r["nome"] for r in client.get("/api/v1/database/").json()[0]["responsaveis"]] == ["Ana"]
+
+
+def test_exportacao_e_erros_nao_sao_cacheados(client):
+    assert "ETag" not in client.get("/api/v1/coluna/", headers={"Accept": "application/x-ndjson"}).headers
+    assert "ETag" not in client.get("/api/v1/coluna/999").headers
+    assert response_cache.stats()["entries"] == 0
@@ -0,0 +1,47 @@
+import json
+
+from infogrid.cache import response_cache
+from infogrid.changes import ORIGIN, handle_notification, invalidate_all
+from infogrid.suggest import suggest_index
+
+
+def notification(**change):
+    return json.dumps({"origin": "outro-worker", "id": None, "nome": None, "deleted": False, **change})
+
+
+def test_aviso_de_outro_worker_invalida_cache_e_indice():
+    handle_notification(notification(tipo="tabela", id=7, nome="faturamento"))
+    assert suggest_index.suggest("fat") == [{"tipo": "tabela", "id": 7, "nome": "faturamento"}]
+    assert response_cache.stats()["versions"] == {"tabela": 1}
+
+    handle_notification(notification(tipo="tabela", id=7, deleted=True))
+    assert suggest_index.suggest("fat") == []
+    assert response_cache.stats()["versions"] == {"tabela": 2}
+
+
+def test_avisos_do_proprio_worker_e_invalidos_sao_ignorados():
+    handle_notification(json.dumps({"origin": ORIGIN, "tipo": "tabela", "id": 1, "nome": "x", "deleted": False}))
+    handle_notification("não é json")
+    assert response_cache.stats()["versions"] == {}
+
+
+def test_avisos_durante_a_carga_sobrevivem_a_troca_do_indice(engine, monkeypatch):
+    suggest_index.add("tabela", 1, "antiga")
+    load = suggest_index.load
+
+    def load_com_aviso_no_meio(session):
+        # A leitura já passou quando a tabela 7 é criada e a 1 excluída em outro worker
+        rows = [("tabela", 1, "antiga")]
+        handle_notification(notification(tipo="tabela", id=7, nome="faturamento"))
+        handle_notification(notification(tipo="tabela", id=1, deleted=True))
+        suggest_index.replace_all(rows)
+
+    monkeypatch.setattr(suggest_index, "load", load_com_aviso_no_meio)
+    invalidate_all()
+    assert suggest_index.suggest("fat") == [{"tipo": "tabela", "id": 7, "nome": "faturamento"}]
+    assert suggest_index.suggest("antiga") == []
+
+    # Terminada a carga, nada fica guardado para a próxima
+    monkeypatch.setattr(suggest_index, "load", load)
+    invalidate_all()
+    assert suggest_index.suggest("fat") == []
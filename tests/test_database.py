@@ -0,0 +1,54 @@
+from http import HTTPStatus
+
+from infogrid.database import async_database_url
+
+
+def test_async_database_url_troca_driver():
+    assert async_database_url("postgresql+psycopg2://u:s@localhost/db") == "postgresql+asyncpg://u:s@localhost/db"
+    assert async_database_url("sqlite:///infogrid.db") == "sqlite+aiosqlite:///infogrid.db"
+
+
+def test_crud_database_em_handlers_async(client):
+    payload = {"nome": "vendas", "tecnologia": "postgres", "descricao": None, "responsaveis": []}
+    response = client.post("/api/v1/database/", json=payload)
+    assert response.status_code == HTTPStatus.CREATED
+    database_id = response.json()["id"]
+
+    response = client.put(f"/api/v1/database/{database_id}", json={**payload, "descricao": "ERP"})
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["descricao"] == "ERP"
+
+    assert client.get("/api/v1/database/").json()[0]["nome"] == "vendas"
+    assert client.delete(f"/api/v1/database/{database_id}").status_code == HTTPStatus.NO_CONTENT
+    assert client.get("/api/v1/database/databases").json() == {"quantidade": 0}
+
+
+def test_pool_instrumentado_conta_esperas(tmp_path):
+    import threading
+    import time
+
+    from sqlalchemy import create_engine
+
+    from infogrid.pool import InstrumentedQueuePool, pool_stats
+
+    engine = create_engine(f"sqlite:///{tmp_path}/pool.db", poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0)
+    ocupada = engine.connect()
+    espera = threading.Thread(target=lambda: engine.connect().close())
+    espera.start()
+    time.sleep(0.1)
+    ocupada.close()
+    espera.join()
+
+    stats = pool_stats(engine.pool)
+    assert stats["checkouts"] == 2
+    assert stats["waits"] == 1
+    assert stats["checked_out"] == 0
+    engine.dispose()
+
+
+def test_admin_pool_stats(client):
+    response = client.get("/api/v1/admin/pool")
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["mode"] == "sync"
+    assert response.json()["config"]["pool_size"] == 5
+    assert "status" in response.json()["sync"]
@@ -0,0 +1,66 @@
+from http import HTTPStatus
+
+import pytest
+
+from infogrid.models import Database, Tabela
+
+# CRUD pelos dois caminhos de sessão: Session síncrona no threadpool e AsyncSession (aiosqlite)
+pytestmark = pytest.mark.parametrize("engine", ["sync", "async"], indirect=True)
+
+
+def nomes(response):
+    return sorted(item["nome"] for item in response.json())
+
+
+def test_filtro_ignora_maiusculas_e_trata_curingas_como_texto(client, session):
+    session.add_all([Tabela(nome=n, database_id=1) for n in ("Cliente_Fatura", "clienteXfatura", "pedido_100%")])
+    session.commit()
+
+    assert nomes(client.get("/api/v1/entidades/tabelas/", params={"nome": "CLIENTE_fat"})) == ["Cliente_Fatura"]
+    assert nomes(client.get("/api/v1/entidades/tabelas/", params={"nome": "100%"})) == ["pedido_100%"]
+
+
+def test_termo_curto_tambem_busca_substring_e_termo_vazio_nao_filtra(client, session):
+    session.add_all([Tabela(nome=n, database_id=1) for n in ("vendas", "eventos")])
+    session.commit()
+
+    assert nomes(client.get("/api/v1/entidades/tabelas/", params={"nome": "ve"})) == ["eventos", "vendas"]
+    assert nomes(client.get("/api/v1/entidades/tabelas/", params={"nome": "ven"})) == ["eventos", "vendas"]
+    assert nomes(client.get("/api/v1/entidades/tabelas/", params={"nome": "   "})) == ["eventos", "vendas"]
+    assert client.get("/api/v1/entidades/tabelas/", params={"nome": "xy"}).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_escritas_de_coluna_usam_a_constraint_e_devolvem_a_linha(client, session):
+    session.add(Database(nome="vendas", tecnologia="postgres"))
+    session.add_all([Tabela(nome="pedidos", database_id=1), Tabela(nome="clientes", database_id=1)])
+    session.commit()
+
+    payload = {"nome": "id", "tipo_dado": "int", "descricao": None, "tabela_id": 1}
+    assert client.post("/api/v1/coluna/", json=payload).json()["id"] == 1
+    # mesmo nome em outra tabela é outra coluna; na mesma tabela é repetida
+    assert client.post("/api/v1/coluna/", json={**payload, "tabela_id": 2}).status_code == HTTPStatus.CREATED
+    repetida = client.post("/api/v1/coluna/", json=payload)
+    assert (repetida.status_code, repetida.json()["detail"]) == (HTTPStatus.BAD_REQUEST, "Coluna already exists")
+
+    atualizada = client.put("/api/v1/coluna/1", json={**payload, "tipo_dado": "bigint"})
+    assert atualizada.json()["tipo_dado"] == "bigint"
+    assert client.put("/api/v1/coluna/99", json=payload).status_code == HTTPStatus.NOT_FOUND
+    assert client.delete("/api/v1/coluna/1").status_code == HTTPStatus.NO_CONTENT
+    assert client.delete("/api/v1/coluna/1").status_code == HTTPStatus.NOT_FOUND
+
+
+def test_patch_altera_so_os_campos_enviados(client, session):
+    session.add(Database(nome="vendas", tecnologia="postgres"))
+    session.add(Tabela(nome="pedidos", descricao="itens", database_id=1, estado_atual="Pendente", conformidade=False))
+    session.commit()
+
+    response = client.patch("/api/v1/tabela/1", json={"conformidade": True, "estado_atual": None})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        "id": 1, "nome": "pedidos", "descricao": "itens", "database_id": 1,
+        "estado_atual": None, "qualidade": None, "conformidade": True,
+    }
+    assert client.patch("/api/v1/tabela/1", json={}).status_code == HTTPStatus.BAD_REQUEST
+    assert client.patch("/api/v1/tabela/99", json={"conformidade": True}).status_code == HTTPStatus.NOT_FOUND
+    assert client.patch("/api/v1/database/1", json={"descricao": "ERP"}).json()["descricao"] == "ERP"
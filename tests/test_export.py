@@ -0,0 +1,39 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from infogrid import export
+from infogrid.models import Coluna, RegistroAcesso
+
+
+def test_export_ndjson_em_lotes(client, session, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 7)
+    session.add_all([Coluna(nome=f"col{i}", tipo_dado="text", tabela_id=1) for i in range(25)])
+    session.commit()
+
+    response = client.get("/api/v1/coluna/", headers={"Accept": export.NDJSON})
+
+    assert response.headers["content-type"].startswith(export.NDJSON)
+    linhas = [json.loads(linha) for linha in response.text.splitlines()]
+    assert [linha["id"] for linha in linhas] == list(range(1, 26))
+    assert linhas[0] == {"id": 1, "nome": "col0", "tipo_dado": "text", "descricao": None, "tabela_id": 1}
+
+
+def test_export_csv(client, session):
+    session.add(RegistroAcesso(usuario_id=1, conjunto_dados="vendas", data_solicitacao=datetime(2025, 1, 2), finalidade_uso="bi", permissoes_concedidas=["leitura", "escrita"], status="Aprovado"))
+    session.commit()
+
+    response = client.get("/api/v1/registroacesso/", headers={"Accept": export.CSV})
+
+    assert response.headers["content-type"].startswith(export.CSV)
+    linhas = list(csv.reader(io.StringIO(response.text)))
+    assert linhas[0] == ["id", "usuario_id", "conjunto_dados", "data_solicitacao", "finalidade_uso", "permissoes_concedidas", "status"]
+    assert linhas[1][2] == "vendas"
+    assert json.loads(linhas[1][5]) == ["leitura", "escrita"]
+
+
+def test_sem_accept_de_exportacao_responde_json(client, session):
+    session.add(Coluna(nome="col", tipo_dado="text", tabela_id=1))
+    session.commit()
+    assert client.get("/api/v1/coluna/").json()[0]["nome"] == "col"
@@ -0,0 +1,47 @@
+from sqlalchemy import create_engine, text
+
+from infogrid.harvester import harvest, main
+from infogrid.models import Coluna, Database, Tabela
+
+
+def criar_banco_fonte(path, ddl):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        for statement in ddl:
+            conn.execute(text(statement))
+    engine.dispose()
+    return f"sqlite:///{path}"
+
+
+def test_harvest_grava_tabelas_e_colunas_de_varios_bancos(session, tmp_path):
+    vendas = criar_banco_fonte(tmp_path / "vendas.db", [
+        "CREATE TABLE pedidos (id INTEGER PRIMARY KEY, valor NUMERIC(10, 2), cliente VARCHAR(80))",
+        "CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT)",
+    ])
+    rh = criar_banco_fonte(tmp_path / "rh.db", ["CREATE TABLE funcionarios (id INTEGER PRIMARY KEY, salario REAL)"])
+    session.add_all([Database(nome="vendas", tecnologia="sqlite"), Database(nome="rh", tecnologia="sqlite")])
+    session.commit()
+
+    progresso = []
+    report = harvest({"vendas": vendas, "rh": rh, "legado": "sqlite:///nao/existe.db"}, max_workers=2,
+                     progress=lambda done, total, result: progresso.append((done, total, result.nome)))
+
+    por_banco = {banco.nome: banco for banco in report.bancos}
+    assert (por_banco["vendas"].tabelas, por_banco["vendas"].colunas) == (2, 5)
+    assert (por_banco["rh"].tabelas_criadas, por_banco["rh"].colunas_criadas) == (1, 2)
+    assert por_banco["legado"].erro == "Database não cadastrado no catálogo"
+    assert sorted(done for done, _, _ in progresso) == [1, 2, 3]
+
+    colunas = {(c.tabela_id, c.nome): c.tipo_dado for c in session.query(Coluna)}
+    pedidos = session.query(Tabela).filter_by(nome="pedidos", database_id=1).one()
+    assert colunas[(pedidos.id, "valor")] == "NUMERIC(10, 2)"
+
+    # Segunda coleta não duplica nada
+    again = harvest({"vendas": vendas}, progress=None)
+    assert again.bancos[0].tabelas_criadas == 0
+    assert session.query(Coluna).count() == 7
+
+
+def test_cli_retorna_erro_quando_algum_banco_falha(engine, tmp_path, capsys):
+    assert main(["--url", f"vendas=sqlite:///{tmp_path}/vendas.db", "--json"]) == 1
+    assert '"falhas": 1' in capsys.readouterr().out
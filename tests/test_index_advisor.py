@@ -0,0 +1,25 @@
+from http import HTTPStatus
+
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, Table
+
+from infogrid.index_advisor import unindexed_foreign_keys
+
+
+def test_todas_as_fks_do_catalogo_tem_indice(client):
+    response = client.get("/api/v1/admin/indices")
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["fks_sem_indice"] == []
+
+
+def test_fk_sem_indice_vira_sugestao(engine):
+    metadata = MetaData()
+    Table("pais", metadata, Column("id", Integer, primary_key=True))
+    Table("filhos", metadata, Column("id", Integer, primary_key=True), Column("pai_id", Integer, ForeignKey("pais.id")))
+    metadata.create_all(engine)
+
+    with engine.connect() as connection:
+        missing = unindexed_foreign_keys(connection)
+
+    assert [(fk["tabela"], fk["colunas"]) for fk in missing] == [("filhos", ["pai_id"])]
+    assert missing[0]["sugestao"] == "CREATE INDEX CONCURRENTLY ix_filhos_pai_id ON filhos (pai_id)"
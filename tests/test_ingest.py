@@ -0,0 +1,101 @@
+import asyncio
+from datetime import datetime
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from infogrid import database
+from infogrid.acl import access_index
+from infogrid.app import app
+from infogrid.ingest import AccessWriteBuffer, BufferFullError, insert_access_records
+from infogrid.models import RegistroAcesso, Usuario
+
+
+def registro(dia: int, usuario_id=1, status="Aprovado"):
+    return {"usuario_id": usuario_id, "conjunto_dados": "vendas", "data_solicitacao": f"2026-09-{dia:02d}T00:00:00", "finalidade_uso": "BI", "permissoes_concedidas": ["leitura"], "status": status}
+
+
+def test_ingestao_grava_em_lote_e_descarrega_o_buffer_no_shutdown(engine, session):
+    session.add(Usuario(nome="Ana", email="ana@empresa.com"))
+    session.commit()
+
+    with TestClient(app) as client:
+        criado = client.post("/api/v1/registroacesso/ingest/", json=registro(1))
+        assert criado.status_code == HTTPStatus.CREATED and criado.json()["status"] == "created"
+        repetido = client.post("/api/v1/registroacesso/ingest/", json=registro(1))
+        assert repetido.status_code == HTTPStatus.OK and repetido.json() == {"status": "exists", "id": criado.json()["id"]}
+        assert client.post("/api/v1/registroacesso/ingest/", json=registro(2, usuario_id=9)).status_code == HTTPStatus.BAD_REQUEST
+        assert client.post("/api/v1/registroacesso/ingest/?ack=talvez", json=registro(2)).status_code == HTTPStatus.BAD_REQUEST
+        assert access_index.check(1, "vendas", ["leitura"])
+
+        for dia in range(2, 7):
+            resposta = client.post("/api/v1/registroacesso/ingest/?ack=enqueue", json=registro(dia))
+            assert resposta.status_code == HTTPStatus.ACCEPTED and resposta.json() == {"status": "queued", "id": None}
+
+    # O shutdown grava o que foi confirmado só na entrada do buffer
+    assert session.scalar(select(func.count()).select_from(RegistroAcesso)) == 6
+
+
+def test_buffer_cheio_recusa_e_lote_sai_ao_atingir_o_tamanho(monkeypatch):
+    gravados = []
+
+    async def flush(batch):
+        gravados.append(len(batch))
+        for _, future, _ in batch:
+            if future is not None:
+                future.set_result({"status": "created"})
+
+    async def main():
+        buffer = AccessWriteBuffer(batch_size=2, flush_interval=60, max_pending=3)
+        monkeypatch.setattr(buffer, "_flush", flush)
+        futures = [buffer.submit({"n": n}, wait=True) for n in range(3)]
+        with pytest.raises(BufferFullError):
+            buffer.submit({"n": 3}, wait=False)
+        await asyncio.wait_for(futures[1], 1)  # lote cheio não espera o intervalo
+        await buffer.stop()
+        assert futures[2].result() == {"status": "created"}
+
+    asyncio.run(main())
+    assert gravados == [2, 1]
+
+
+def test_horario_com_fuso_e_gravado_em_utc_e_reconhecido_como_criado(engine, session):
+    session.add(Usuario(nome="Ana", email="ana@empresa.com"))
+    session.commit()
+
+    with TestClient(app) as client:
+        resposta = client.post("/api/v1/registroacesso/ingest/", json={**registro(1), "data_solicitacao": "2026-09-01T00:00:00Z"})
+        assert resposta.status_code == HTTPStatus.CREATED and resposta.json()["status"] == "created"
+        assert access_index.check(1, "vendas", ["leitura"])
+
+    results = insert_access_records(session, [{**registro(2), "data_solicitacao": datetime.fromisoformat("2026-09-01T21:00:00-03:00")}])
+    assert results[0]["status"] == "created" and results[0]["registro"]["data_solicitacao"] == datetime(2026, 9, 2)
+
+
+def test_falha_fora_da_gravacao_chega_a_quem_espera_e_o_buffer_continua(engine, session, monkeypatch):
+    session.add(Usuario(nome="Ana", email="ana@empresa.com"))
+    session.commit()
+    session_scope = database.session_scope
+    chamadas = []
+
+    def falha_na_primeira():
+        chamadas.append(1)
+        if len(chamadas) == 1:
+            raise RuntimeError("sem conexão")
+        return session_scope()
+
+    monkeypatch.setattr(database, "session_scope", falha_na_primeira)
+
+    async def main():
+        buffer = AccessWriteBuffer(batch_size=1, flush_interval=60, max_pending=10)
+        primeiro = buffer.submit({**registro(1), "data_solicitacao": datetime(2026, 9, 1)}, wait=True)
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(primeiro, 1)
+        segundo = buffer.submit({**registro(2), "data_solicitacao": datetime(2026, 9, 2)}, wait=True)
+        assert (await asyncio.wait_for(segundo, 1))["status"] == "created"
+        await buffer.stop()
+        assert buffer.stats()["falhas"] == 1
+
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+import json
+import zipfile
+
+from infogrid.kafka_import import import_schemas, main, parse_schema_file
+from infogrid.models import ColunaTopicoKafka, TopicoKafka
+
+PEDIDO_AVRO = {
+    "type": "record",
+    "name": "Pedido",
+    "namespace": "loja",
+    "doc": "Pedidos da loja",
+    "fields": [
+        {"name": "id", "type": "long"},
+        {"name": "criado_em", "type": {"type": "long", "logicalType": "timestamp-millis"}},
+        {"name": "cliente", "type": ["null", {
+            "type": "record", "name": "Cliente",
+            "fields": [{"name": "nome", "type": "string", "doc": "Nome completo"}],
+        }]},
+        {"name": "itens", "type": {"type": "array", "items": {
+            "type": "record", "name": "Item", "fields": [{"name": "sku", "type": "string"}],
+        }}},
+        {"name": "indicado_por", "type": ["null", "Cliente"]},
+    ],
+}
+
+PAGAMENTO_JSON_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "description": "Pagamentos aprovados",
+    "definitions": {"Valor": {"type": "object", "properties": {"centavos": {"type": "integer"}}}},
+    "type": "object",
+    "properties": {
+        "id": {"type": "string", "format": "uuid"},
+        "valor": {"$ref": "#/definitions/Valor"},
+        "tags": {"type": "array", "items": {"type": "string"}},
+    },
+}
+
+
+def test_parse_achata_records_aninhados_com_nomes_pontuados():
+    [topico] = parse_schema_file("pedidos.avsc", json.dumps(PEDIDO_AVRO).encode())
+
+    colunas = {coluna["nome"]: coluna["tipo_dado"] for coluna in topico.colunas}
+    assert topico.nome == "pedidos"
+    assert topico.descricao == "Pedidos da loja"
+    assert colunas == {
+        "id": "long",
+        "criado_em": "timestamp-millis",
+        "cliente": "record",
+        "cliente.nome": "string",
+        "itens": "array<record>",
+        "itens[].sku": "string",
+        "indicado_por": "record",
+        "indicado_por.nome": "string",
+    }
+
+    [pagamento] = parse_schema_file("pagamentos.json", json.dumps(PAGAMENTO_JSON_SCHEMA).encode())
+    assert {c["nome"]: c["tipo_dado"] for c in pagamento.colunas} == {
+        "id": "uuid", "valor": "object", "valor.centavos": "integer", "tags": "array<string>",
+    }
+
+
+def test_importa_arquivo_zip_de_forma_idempotente(session, tmp_path):
+    registry = [
+        {"subject": "pagamentos-value", "schemaType": "JSON", "schema": json.dumps(PAGAMENTO_JSON_SCHEMA)},
+        {"subject": "pagamentos-key", "schemaType": "AVRO", "schema": '"string"'},
+    ]
+    arquivo = tmp_path / "export.zip"
+    with zipfile.ZipFile(arquivo, "w") as zf:
+        zf.writestr("loja/pedidos.avsc", json.dumps(PEDIDO_AVRO))
+        zf.writestr("registry.json", json.dumps(registry))
+        zf.writestr("quebrado.json", "{")
+    session.add(TopicoKafka(nome="pedidos", estado_atual="ativo"))
+    session.commit()
+
+    report = import_schemas(str(arquivo), workers=2)
+
+    assert (report.arquivos, report.topicos, report.topicos_criados) == (3, 2, 1)
+    assert (report.colunas, report.colunas_criadas) == (12, 12)
+    assert [erro["arquivo"] for erro in report.erros] == ["quebrado.json"]
+    pedidos = session.query(TopicoKafka).filter_by(nome="pedidos").one()
+    assert (pedidos.estado_atual, pedidos.descricao) == ("ativo", "Pedidos da loja")
+    assert session.query(ColunaTopicoKafka).filter_by(topico_kafka_id=pedidos.id).count() == 8
+
+    again = import_schemas(str(arquivo), workers=1)
+    assert (again.topicos_criados, again.colunas_criadas, again.colunas_atualizadas) == (0, 0, 0)
+    assert session.query(ColunaTopicoKafka).count() == 12
+
+
+def test_cli_importa_diretorio(engine, tmp_path, capsys):
+    (tmp_path / "pedidos.avsc").write_text(json.dumps(PEDIDO_AVRO))
+    assert main([str(tmp_path), "--workers", "1", "--json"]) == 0
+    assert '"topicos_criados": 1' in capsys.readouterr().out
@@ -0,0 +1,54 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from infogrid.models import Database, Responsavel, Tabela, TopicoKafka
+
+
+@contextmanager
+def count_statements(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def popular_catalogo(session, quantidade):
+    responsaveis = [Responsavel(nome=f"resp {i}", email=f"resp{i}@infogrid.dev") for i in range(3)]
+    for i in range(quantidade):
+        database = Database(nome=f"db {i}", tecnologia="postgres", responsaveis=responsaveis[: i % 3 + 1])
+        session.add(database)
+        session.flush()
+        session.add(Tabela(nome=f"tabela {i}", database_id=database.id, responsaveis=responsaveis[: i % 3]))
+        session.add(TopicoKafka(nome=f"topico {i}", responsaveis=responsaveis[:1]))
+    session.commit()
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/api/v1/database/",
+        "/api/v1/database/pagined/?limit=50",
+        "/api/v1/tabela/",
+        "/api/v1/tabela/pagined/?limit=50",
+        "/api/v1/topicokafka/",
+        "/api/v1/topicokafka/pagined/?limit=50",
+    ],
+)
+@pytest.mark.parametrize("quantidade", [2, 40])
+def test_listagens_usam_numero_constante_de_consultas(client, engine, session, url, quantidade):
+    popular_catalogo(session, quantidade)
+
+    with count_statements(engine) as statements:
+        response = client.get(url)
+
+    assert response.status_code == 200
+    assert len(response.json()) == quantidade
+    assert len(statements) == 2  # linhas pai + responsáveis em lote
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from http import HTTPStatus
+
+from infogrid.models import Coluna, RegistroAcesso
+from infogrid.pagination import NEXT_CURSOR_HEADER
+
+
+def percorrer(client, url, **params):
+    vistos, cursor = [], None
+    while True:
+        response = client.get(url, params={**params, "cursor": cursor} if cursor else params)
+        assert response.status_code == HTTPStatus.OK
+        vistos.extend(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return vistos
+
+
+def test_cursor_percorre_todas_as_colunas_sem_repetir(client, session):
+    session.add_all([Coluna(nome=f"col{i % 4}", tipo_dado="int", tabela_id=i // 4 + 1) for i in range(11)])
+    session.commit()
+
+    ids = [c["id"] for c in percorrer(client, "/api/v1/coluna/pagined/", limit=3)]
+    assert ids == list(range(1, 12))
+
+    ordenadas = percorrer(client, "/api/v1/coluna/pagined/", limit=3, order_by="nome")
+    assert [(c["nome"], c["id"]) for c in ordenadas] == sorted((c["nome"], c["id"]) for c in ordenadas)
+    assert len(ordenadas) == 11
+
+
+def test_cursor_em_coluna_de_data(client, session):
+    inicio = datetime(2025, 1, 1)
+    session.add_all([
+        RegistroAcesso(usuario_id=1, conjunto_dados="vendas", data_solicitacao=inicio - timedelta(days=i), finalidade_uso="bi", permissoes_concedidas=["leitura"])
+        for i in range(5)
+    ])
+    session.commit()
+
+    registros = percorrer(client, "/api/v1/registroacesso/pagined/", limit=2, order_by="data_solicitacao")
+    assert [r["id"] for r in registros] == [5, 4, 3, 2, 1]
+
+
+def test_cursor_invalido_ou_de_outra_ordenacao(client, session):
+    session.add_all([Coluna(nome=f"c{i}", tipo_dado="int", tabela_id=1) for i in range(3)])
+    session.commit()
+    cursor = client.get("/api/v1/coluna/pagined/?limit=1").headers[NEXT_CURSOR_HEADER]
+
+    assert client.get("/api/v1/coluna/pagined/", params={"cursor": "???"}).status_code == HTTPStatus.BAD_REQUEST
+    assert client.get("/api/v1/coluna/pagined/", params={"cursor": cursor, "order_by": "nome"}).status_code == HTTPStatus.BAD_REQUEST
+    assert client.get("/api/v1/coluna/pagined/?order_by=descricao").status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_skip_continua_funcionando(client, session):
+    session.add_all([Coluna(nome=f"c{i}", tipo_dado="int", tabela_id=1) for i in range(4)])
+    session.commit()
+    response = client.get("/api/v1/coluna/pagined/?limit=2&skip=2")
+    assert [c["id"] for c in response.json()] == [3, 4]
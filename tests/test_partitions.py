@@ -0,0 +1,29 @@
+from datetime import date, datetime
+
+from infogrid.models import RegistroAcesso, Usuario
+from infogrid.partitions import add_months, months_to_archive, months_to_create, partition_month, partition_name
+
+
+def test_planeja_particoes_futuras_e_as_que_sairam_da_retencao():
+    hoje = date(2026, 11, 17)
+    existentes = [date(2025, m, 1) for m in range(9, 13)] + [date(2026, m, 1) for m in range(1, 13)]
+
+    assert months_to_create(existentes, hoje, ahead=3) == [date(2027, 1, 1), date(2027, 2, 1)]
+    # 12 meses de retenção: de dez/2025 a nov/2026 ficam
+    assert months_to_archive(existentes, hoje, retention_months=12) == [date(2025, 9, 1), date(2025, 10, 1), date(2025, 11, 1)]
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert partition_month(partition_name(date(2026, 2, 1))) == date(2026, 2, 1)
+    assert partition_month("registros_acesso_padrao") is None
+
+
+def test_periodo_filtra_listagem_e_contagem(client, session):
+    session.add(Usuario(nome="Ana", email="ana@empresa.com"))
+    for dia in (datetime(2026, 8, 31, 23), datetime(2026, 9, 1), datetime(2026, 9, 30, 12), datetime(2026, 10, 1)):
+        session.add(RegistroAcesso(usuario_id=1, conjunto_dados="vendas", data_solicitacao=dia, finalidade_uso="BI", permissoes_concedidas=["leitura"]))
+    session.commit()
+
+    periodo = {"desde": "2026-09-01T00:00:00", "ate": "2026-10-01T00:00:00"}
+    registros = client.get("/api/v1/registroacesso/", params=periodo).json()
+    assert [r["data_solicitacao"] for r in registros] == ["2026-09-01T00:00:00", "2026-09-30T12:00:00"]
+    assert client.get("/api/v1/registroacesso/registrosacesso", params=periodo).json() == {"quantidade": 2}
+    assert client.get("/api/v1/registroacesso/registrosacesso").json() == {"quantidade": 4}
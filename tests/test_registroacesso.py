@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+from infogrid.models import RegistroAcesso, Usuario
+from infogrid.rollups import ROLLUP_TABLES, backfill
+
+
+def test_busca_por_permissoes_usuario_e_conjunto(client, session):
+    session.add_all([Usuario(nome="Ana", email="ana@empresa.com"), Usuario(nome="Rui", email="rui@empresa.com")])
+    registros = [
+        (1, "vendas", ["leitura", "escrita"], "Aprovado"),
+        (1, "rh", ["escrita"], "Aprovado"),
+        (2, "vendas", ["leitura"], "Aprovado"),
+        (2, "vendas", ["escrita", "admin"], "Negado"),
+    ]
+    for dia, (usuario_id, conjunto, permissoes, status) in enumerate(registros, start=1):
+        session.add(RegistroAcesso(usuario_id=usuario_id, conjunto_dados=conjunto, data_solicitacao=datetime(2026, 9, dia), finalidade_uso="BI", permissoes_concedidas=permissoes, status=status))
+    session.commit()
+
+    def ids(**params):
+        return [r["id"] for r in client.get("/api/v1/registroacesso/busca/", params=params).json()]
+
+    assert ids(permissao="escrita", conjunto_dados="vendas") == [1, 4]
+    assert ids(permissao=["escrita", "admin"]) == [4]
+    assert ids(permissao="escrita", status="Aprovado", usuario_id=1) == [1, 2]
+    assert ids(conjunto_dados="vendas", limit=2) == [1, 3]
+
+
+def test_estatisticas_vem_dos_agregados_mantidos_nas_escritas(client, session):
+    session.add(Usuario(nome="Ana", email="ana@empresa.com"))
+    session.commit()
+    for hora, conjunto in ((9, "vendas"), (10, "vendas"), (10, "rh")):
+        payload = {"usuario_id": 1, "conjunto_dados": conjunto, "data_solicitacao": f"2026-09-01T{hora:02d}:30:00", "finalidade_uso": "BI", "permissoes_concedidas": ["leitura"], "status": "Pendente"}
+        client.post("/api/v1/registroacesso/", json=payload)
+    client.patch("/api/v1/registroacesso/1", json={"status": "Aprovado"})
+    client.delete("/api/v1/registroacesso/3")
+
+    por_status = client.get("/api/v1/registroacesso/estatisticas/", params={"agrupar_por": ["periodo", "status"]}).json()
+    assert [(c["periodo"], c["status"], c["quantidade"]) for c in por_status] == [
+        ("2026-09-01T00:00:00", "Aprovado", 1),
+        ("2026-09-01T00:00:00", "Pendente", 1),
+    ]
+    por_hora = client.get("/api/v1/registroacesso/estatisticas/", params={"granularidade": "hora", "conjunto_dados": "vendas"}).json()
+    assert [(c["periodo"], c["quantidade"]) for c in por_hora] == [("2026-09-01T09:00:00", 1), ("2026-09-01T10:00:00", 1)]
+    assert client.get("/api/v1/registroacesso/estatisticas/", params={"agrupar_por": "finalidade_uso"}).status_code == 400
+
+    # A recarga a partir do log chega aos mesmos agregados mantidos pelos triggers
+    # (grupos zerados por UPDATE/DELETE ficam com quantidade 0 e não aparecem nas consultas)
+    mantidos = {table.name: session.execute(select(table).where(table.c.quantidade > 0).order_by(*table.primary_key)).all() for table in ROLLUP_TABLES.values()}
+    assert backfill(session) == {"registros_acesso_por_hora": 2, "registros_acesso_por_dia": 2}
+    assert {table.name: session.execute(select(table).where(table.c.quantidade > 0).order_by(*table.primary_key)).all() for table in ROLLUP_TABLES.values()} == mantidos
+
+
+def test_escritas_gravam_data_com_fuso_em_utc_sem_fuso(client, session):
+    session.add(Usuario(nome="Ana", email="ana@empresa.com"))
+    session.commit()
+    registro = {"usuario_id": 1, "conjunto_dados": "vendas", "finalidade_uso": "BI", "permissoes_concedidas": ["leitura"], "status": "Aprovado"}
+
+    criado = client.post("/api/v1/registroacesso/", json={**registro, "data_solicitacao": "2026-09-01T09:00:00-03:00"})
+    assert criado.json()["data_solicitacao"] == "2026-09-01T12:00:00"
+    # O mesmo instante em outro fuso é o mesmo registro
+    repetido = client.post("/api/v1/registroacesso/", json={**registro, "data_solicitacao": "2026-09-01T12:00:00Z"})
+    assert repetido.json()["detail"] == "Registro de Acesso already exists for the given criteria"
+
+    atualizado = client.put("/api/v1/registroacesso/1", json={**registro, "data_solicitacao": "2026-09-02T00:30:00+01:00"})
+    assert atualizado.json()["data_solicitacao"] == "2026-09-01T23:30:00"
+    parcial = client.patch("/api/v1/registroacesso/1", json={"data_solicitacao": "2026-09-03T00:00:00Z"})
+    assert parcial.json()["data_solicitacao"] == "2026-09-03T00:00:00"
+    assert session.scalar(select(RegistroAcesso.data_solicitacao)) == datetime(2026, 9, 3)
@@ -0,0 +1,62 @@
+from sqlalchemy import event, select
+
+from infogrid.models import Coluna, Database, Tabela
+from infogrid.schema_sync import TableSnapshot, sync_schema
+
+
+def snapshot(**tabelas):
+    return [
+        TableSnapshot(nome=nome, descricao=None, colunas=[{"nome": c, "tipo_dado": t, "descricao": None} for c, t in colunas])
+        for nome, colunas in tabelas.items()
+    ]
+
+
+def test_sync_aplica_apenas_o_delta(session):
+    session.add(Database(nome="vendas", tecnologia="postgres"))
+    session.commit()
+    sync_schema(session, 1, snapshot(pedidos=[("id", "INTEGER"), ("valor", "NUMERIC")], clientes=[("id", "INTEGER")], legado=[("x", "TEXT")]))
+
+    delta = sync_schema(session, 1, snapshot(
+        pedidos=[("id", "BIGINT"), ("valor", "NUMERIC"), ("data", "DATE")],
+        clientes=[("id", "INTEGER")],
+        produtos=[("sku", "TEXT")],
+    ))
+
+    assert delta.resumo() == {
+        "tabelas_criadas": 1, "tabelas_alteradas": 1, "tabelas_removidas": 1, "tabelas_inalteradas": 1,
+        "colunas_criadas": 2, "colunas_atualizadas": 1, "colunas_removidas": 0,
+    }
+    pedidos = session.scalar(select(Tabela).where(Tabela.nome == "pedidos"))
+    colunas = {c.nome: c.tipo_dado for c in session.scalars(select(Coluna).where(Coluna.tabela_id == pedidos.id))}
+    assert colunas == {"id": "BIGINT", "valor": "NUMERIC", "data": "DATE"}
+    assert session.scalar(select(Tabela).where(Tabela.nome == "legado")) is None
+    assert session.scalar(select(Coluna).where(Coluna.nome == "x")) is None
+
+
+def test_schema_sem_mudancas_custa_uma_consulta(session, engine):
+    session.add(Database(nome="vendas", tecnologia="postgres"))
+    session.commit()
+    tabelas = snapshot(**{f"t{i}": [("id", "INTEGER"), ("nome", "TEXT")] for i in range(200)})
+    sync_schema(session, 1, tabelas)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    delta = sync_schema(session, 1, tabelas)
+
+    assert delta.vazio and delta.tabelas_inalteradas == 200
+    assert len(statements) == 1 and statements[0].startswith("SELECT")
+
+
+def test_escrita_em_coluna_fora_do_sync_invalida_o_fingerprint(client, session):
+    session.add(Database(nome="vendas", tecnologia="postgres"))
+    session.commit()
+    sync_schema(session, 1, snapshot(pedidos=[("id", "INTEGER")], clientes=[("id", "INTEGER")]))
+    assert all(session.scalars(select(Tabela.fingerprint)))
+
+    client.post("/api/v1/coluna/", json={"nome": "valor", "tipo_dado": "NUMERIC", "descricao": None, "tabela_id": 1})
+
+    session.expire_all()
+    fingerprints = dict(session.execute(select(Tabela.nome, Tabela.fingerprint)).all())
+    assert fingerprints["pedidos"] is None and fingerprints["clientes"] is not None
+    # A próxima coleta volta a comparar as colunas de pedidos e remove a criada fora do sync
+    assert sync_schema(session, 1, snapshot(pedidos=[("id", "INTEGER")], clientes=[("id", "INTEGER")])).resumo()["colunas_removidas"] == 1
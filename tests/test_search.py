@@ -0,0 +1,48 @@
+from http import HTTPStatus
+
+from sqlalchemy.dialects import postgresql
+
+from infogrid.models import Coluna, Database, Responsavel, Tabela
+from infogrid.search import build_search_query
+
+
+def test_busca_retorna_resultados_tipados_de_varias_entidades(client, session):
+    session.add(Database(nome="vendas", tecnologia="postgres", descricao="ERP"))
+    session.add(Tabela(nome="pedidos", descricao="pedidos de vendas", database_id=1))
+    session.add(Coluna(nome="valor_venda", tipo_dado="numeric", tabela_id=1))
+    session.add(Responsavel(nome="Vendas Ana", email="ana@empresa.com"))
+    session.commit()
+
+    # "vend" é começo de palavra em todos: casa tanto pelo prefixo do Postgres quanto pela substring
+    response = client.get("/api/v1/search/", params={"q": "vend"})
+
+    assert response.status_code == HTTPStatus.OK
+    hits = {(hit["tipo"], hit["id"]) for hit in response.json()}
+    assert hits == {("database", 1), ("tabela", 1), ("coluna", 1), ("responsavel", 1)}
+    coluna = next(hit for hit in response.json() if hit["tipo"] == "coluna")
+    assert coluna["parent_id"] == 1
+
+
+def test_busca_filtra_por_tipo_e_valida_tipos(client, session):
+    session.add(Database(nome="vendas", tecnologia="postgres"))
+    session.add(Tabela(nome="vendas", database_id=1))
+    session.commit()
+
+    response = client.get("/api/v1/search/", params={"q": "vendas", "tipos": ["tabela"]})
+    assert [hit["tipo"] for hit in response.json()] == ["tabela"]
+    assert client.get("/api/v1/search/", params={"q": "vendas", "tipos": ["x"]}).status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_consulta_postgres_usa_tsvector():
+    sql = str(build_search_query("vendas", "postgresql", ["database", "coluna"]).compile(dialect=postgresql.dialect()))
+    assert "databases.search_vector @@" in sql
+    assert "colunas.search_vector @@" in sql
+    assert "UNION ALL" in sql
+    assert "ILIKE" not in sql.upper()
+
+
+def test_consulta_postgres_casa_palavras_por_prefixo():
+    stmt = build_search_query("valor vend", "postgresql", ["coluna"])
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    assert "to_tsquery('portuguese', '''valor'':* & ''vend'':*')" in sql
+    assert "websearch_to_tsquery" not in sql
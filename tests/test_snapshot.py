@@ -0,0 +1,66 @@
+import gzip
+from datetime import datetime
+from http import HTTPStatus
+
+from infogrid.models import Database, RegistroAcesso, Responsavel, Tabela, Usuario, registros_acesso_por_dia, responsaveis_databases
+from infogrid.snapshot import main
+
+
+def popular_catalogo(session):
+    session.add(Database(nome="vendas", tecnologia="postgres", descricao="linha 1\nlinha\t2"))
+    session.add(Tabela(nome="pedidos", database_id=1))
+    session.add(Responsavel(nome="Dados", email="dados@empresa.com"))
+    session.add(Usuario(nome="Ana", email="ana@empresa.com"))
+    session.add(RegistroAcesso(usuario_id=1, conjunto_dados="vendas", data_solicitacao=datetime(2024, 5, 1, 9, 30), finalidade_uso="BI", permissoes_concedidas=["leitura"]))
+    session.commit()
+    session.execute(responsaveis_databases.insert().values(responsavel_id=1, database_id=1))
+    session.commit()
+
+
+def test_snapshot_exporta_e_substitui_o_catalogo(client, session):
+    popular_catalogo(session)
+    snapshot = client.get("/api/v1/admin/snapshot").content
+    assert gzip.decompress(snapshot).startswith(b'{"formato":"infogrid-snapshot"')
+
+    session.add(Database(nome="legado", tecnologia="oracle"))
+    session.commit()
+    response = client.post("/api/v1/admin/snapshot", content=snapshot)
+    assert response.status_code == HTTPStatus.CONFLICT
+
+    response = client.post("/api/v1/admin/snapshot?replace=true", content=snapshot)
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["linhas"]["databases"] == 1
+    session.expire_all()
+    assert [d.nome for d in session.query(Database)] == ["vendas"]
+    assert session.get(Database, 1).descricao == "linha 1\nlinha\t2"
+    registro = session.get(RegistroAcesso, 1)
+    assert (registro.data_solicitacao, registro.permissoes_concedidas) == (datetime(2024, 5, 1, 9, 30), ["leitura"])
+    assert session.query(responsaveis_databases).count() == 1
+
+
+def test_snapshot_truncado_nao_altera_o_catalogo(client, session, tmp_path, capsys):
+    popular_catalogo(session)
+    arquivo = tmp_path / "catalogo.jsonl.gz"
+    assert main(["export", str(arquivo)]) == 0
+
+    linhas = gzip.decompress(arquivo.read_bytes()).splitlines(keepends=True)
+    truncado = tmp_path / "truncado.jsonl.gz"
+    truncado.write_bytes(gzip.compress(b"".join(linhas[:-1])))
+    assert main(["import", str(truncado), "--replace"]) == 1
+    assert "marcador de fim ausente" in capsys.readouterr().out
+    assert session.query(Database).count() == 1
+
+
+def test_snapshot_preserva_os_agregados_de_particoes_arquivadas(client, session):
+    popular_catalogo(session)
+    # Contagem de um mês cujos registros já foram arquivados (não estão em registros_acesso)
+    session.execute(registros_acesso_por_dia.insert().values(periodo=datetime(2023, 1, 10), conjunto_dados="vendas", usuario_id=1, status="", quantidade=5))
+    session.commit()
+    estatisticas = {"agrupar_por": ["conjunto_dados"]}
+    assert [c["quantidade"] for c in client.get("/api/v1/registroacesso/estatisticas/", params=estatisticas).json()] == [6]
+
+    snapshot = client.get("/api/v1/admin/snapshot").content
+    response = client.post("/api/v1/admin/snapshot?replace=true", content=snapshot)
+
+    assert response.json()["linhas"]["registros_acesso_por_dia"] == 2
+    assert [c["quantidade"] for c in client.get("/api/v1/registroacesso/estatisticas/", params=estatisticas).json()] == [6]
@@ -0,0 +1,38 @@
+from http import HTTPStatus
+
+from infogrid.models import Coluna, Database
+from infogrid.suggest import PrefixIndex, suggest_index
+
+
+def test_prefix_index_casa_inicio_de_palavras_e_ignora_acentos():
+    index = PrefixIndex()
+    index.replace_all([("tabela", 1, "cliente_fatura"), ("tabela", 2, "Faturamento"), ("coluna", 3, "Situação")])
+
+    assert [s["id"] for s in index.suggest("fat")] == [1, 2]
+    assert index.suggest("situa") == [{"tipo": "coluna", "id": 3, "nome": "Situação"}]
+    assert index.suggest("fat", tipos=["coluna"]) == []
+
+    index.add("tabela", 1, "pedidos")
+    assert [s["id"] for s in index.suggest("fat")] == [2]
+    index.remove("tabela", 2)
+    assert index.suggest("fat") == []
+
+
+def test_indice_carregado_do_banco_e_atualizado_pelos_handlers(client, session):
+    session.add(Database(nome="vendas", tecnologia="postgres"))
+    session.add(Coluna(nome="valor_venda", tipo_dado="numeric", tabela_id=1))
+    session.commit()
+    suggest_index.load(session)
+
+    assert {(s["tipo"], s["nome"]) for s in client.get("/api/v1/suggest/?q=vend").json()} == {("database", "vendas"), ("coluna", "valor_venda")}
+
+    payload = {"nome": "venda_diaria", "tecnologia": "postgres", "descricao": None, "responsaveis": []}
+    database_id = client.post("/api/v1/database/", json=payload).json()["id"]
+    assert "venda_diaria" in [s["nome"] for s in client.get("/api/v1/suggest/?q=diaria").json()]
+
+    client.put(f"/api/v1/database/{database_id}", json={**payload, "nome": "estoque"})
+    assert client.get("/api/v1/suggest/?q=diaria").json() == []
+
+    client.delete(f"/api/v1/database/{database_id}")
+    assert client.get("/api/v1/suggest/?q=estoque").json() == []
+    assert client.get("/api/v1/suggest/?q=x&tipos=usuario").status_code == HTTPStatus.BAD_REQUEST
@@ -0,0 +1,53 @@
+import sqlite3
+from http import HTTPStatus
+
+from sqlalchemy.exc import IntegrityError
+
+from infogrid.models import Database, Tabela
+
+
+def database(nome, tecnologia="postgres", descricao=None):
+    return {"nome": nome, "tecnologia": tecnologia, "descricao": descricao, "responsaveis": []}
+
+
+def test_sync_cria_atualiza_e_mantem_por_chave_natural(client):
+    client.post("/api/v1/database/", json=database("vendas"))
+    client.post("/api/v1/database/", json=database("estoque"))
+
+    payload = [database("vendas"), database("estoque", descricao="WMS"), database("rh")]
+    response = client.post("/api/v1/database/sync", json=payload)
+
+    assert response.status_code == HTTPStatus.OK
+    body = response.json()
+    assert [(r["id"], r["status"]) for r in body["resultados"]] == [(1, "unchanged"), (2, "updated"), (3, "created")]
+    assert (body["criados"], body["atualizados"], body["inalterados"]) == (1, 1, 1)
+    assert {d["nome"]: d["descricao"] for d in client.get("/api/v1/database/").json()} == {"vendas": None, "estoque": "WMS", "rh": None}
+
+    # Reenviar o mesmo catálogo é idempotente
+    again = client.post("/api/v1/database/sync", json=payload).json()
+    assert again["inalterados"] == 3
+
+
+def test_sync_de_tabelas_usa_database_id_e_nome(client, session):
+    session.add_all([Database(nome="vendas", tecnologia="postgres"), Database(nome="rh", tecnologia="postgres")])
+    session.add(Tabela(nome="pedidos", database_id=1))
+    session.commit()
+    tabela = {"descricao": None, "responsaveis": [], "estado_atual": None, "qualidade": "Alta", "conformidade": None}
+
+    payload = [{**tabela, "nome": "pedidos", "database_id": 1}, {**tabela, "nome": "pedidos", "database_id": 2}, {**tabela, "nome": "pedidos", "database_id": 9}]
+    body = client.post("/api/v1/tabela/sync", json=payload).json()
+
+    assert [(r["id"], r["status"]) for r in body["resultados"]] == [(1, "updated"), (2, "created"), (None, "parent_not_found")]
+    assert (body["criados"], body["atualizados"], body["rejeitados"]) == (1, 1, 1)
+    assert session.query(Tabela).count() == 2
+
+
+def test_sync_com_pai_excluido_durante_o_upsert_responde_400(client, monkeypatch):
+    def pai_excluido(session, *args):
+        raise IntegrityError("INSERT INTO colunas ...", {}, sqlite3.IntegrityError("FOREIGN KEY constraint failed"))
+
+    monkeypatch.setattr("infogrid.routers.coluna.upsert_rows", pai_excluido)
+    payload = [{"nome": "id", "tipo_dado": "int", "descricao": None, "tabela_id": 1}]
+    response = client.post("/api/v1/coluna/sync", json=payload)
+
+    assert (response.status_code, response.json()["detail"]) == (HTTPStatus.BAD_REQUEST, "Colunas sync failed: referência a registro inexistente")